@@ -1,102 +1,444 @@
+import asyncio
+import base64
+import json
 import os
-import uuid
-import httpx
-from pathlib import Path
-from typing import List
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from sqlalchemy.orm import Session
-from PIL import Image as PILImage
+from datetime import datetime, timezone
+from typing import AsyncIterator, Awaitable, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError as PydanticValidationError
+from sqlalchemy import insert, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, load_only
 
 from app.core.database import get_db
 from app.core.config import settings
+from app.core.concurrency import run_blocking
+from app.core.metrics import stage
 from app.models.image import Image
 from app.schemas.image import (
     ImageCreate,
     ImageResponse,
     ImageUploadResponse,
-    ConfigResponse
+    BulkUrlCreate,
+    BulkUploadItem,
+    BulkUploadResponse,
+    ConfigResponse,
+    StatsResponse
 )
 from app.services.validation import ImageValidator, ValidationError
+from app.services.stats import StatsService
 from app.services.storage import StorageService
-from app.tasks.image_processing import process_image
+from app.services.thumbnails import ThumbnailService
+from app.services.events import RESYNC_EVENT, get_event_hub, publish_status
+from app.services.fetcher import FetchError, get_fetcher
+from app.services.uploads import UploadWriter, iter_multipart, new_filename, store_staged_file
+from app.tasks.image_processing import process_image, enqueue_for_batch
 
 router = APIRouter()
 
+# Outcome of ingesting one bulk item: (row values, error message)
+IngestResult = Tuple[Optional[dict], Optional[str]]
 
-@router.post("/upload/file", response_model=ImageUploadResponse)
+# Record for an upload: (id, status, existing); existing means the same
+# bytes were uploaded before and that record is returned instead, with
+# nothing to process (a failed record is queued again, as not existing)
+RecordRef = Tuple[int, str, bool]
+
+EXISTING_MESSAGE = "Identical image already uploaded; returning the existing record"
+
+# Columns loaded for ImageResponse; listings never read embeddings or hashes
+RESPONSE_COLUMNS = [getattr(Image, name) for name in ImageResponse.model_fields]
+
+MAX_PAGE_SIZE = 500
+
+
+def _multipart_body(field: str, many: bool = False) -> dict:
+    """
+    OpenAPI request body for endpoints that parse multipart uploads
+    themselves (see _stream_files) instead of declaring UploadFile params.
+    """
+    schema = {"type": "string", "format": "binary"}
+    if many:
+        schema = {"type": "array", "items": schema}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {field: schema},
+                        "required": [field],
+                    }
+                }
+            },
+        }
+    }
+
+
+def _insert_records(db: Session, rows: List[dict]) -> List[RecordRef]:
+    """
+    Insert Image rows, deduplicated by content_hash.
+    
+    Rows whose bytes are already stored (in the database, or earlier in
+    rows) are not inserted; they resolve to the existing record. New rows
+    are inserted with one bulk INSERT. If a concurrent upload of the same
+    bytes wins the unique index, the lookup is repeated.
+    
+    An existing record whose processing failed is reset to pending and
+    reported like a new one, so the caller queues it again: the failure
+    may have been transient, and it would otherwise never be retried.
+    
+    The transaction is finished before returning, so the request does not
+    hold a pooled connection while it awaits further work.
+    
+    Returns:
+        one (id, status, existing) per row
+    """
+    hashes = {row["content_hash"] for row in rows}
+    with stage("db_insert"):
+        for attempt in range(3):
+            known: Dict[str, Tuple[int, str]] = {
+                content_hash: (image_id, status)
+                for content_hash, image_id, status in db.execute(
+                    select(Image.content_hash, Image.id, Image.status)
+                    .where(Image.content_hash.in_(hashes))
+                )
+            }
+            new_rows: Dict[str, dict] = {}
+            for row in rows:
+                if row["content_hash"] not in known:
+                    new_rows.setdefault(row["content_hash"], row)
+            failed_ids = [image_id for image_id, status in known.values() if status == "failed"]
+            
+            try:
+                ids = list(db.scalars(
+                    insert(Image).returning(Image.id, sort_by_parameter_order=True),
+                    list(new_rows.values())
+                )) if new_rows else []
+                # Guarded on status, so a concurrent upload resets each only once
+                retried = set(db.scalars(
+                    update(Image)
+                    .where(Image.id.in_(failed_ids), Image.status == "failed")
+                    .values(status="pending", error_message=None)
+                    .returning(Image.id)
+                )) if failed_ids else set()
+                StatsService.record(db, ((None, row) for row in new_rows.values()))
+                StatsService.record(db, (
+                    ({"status": "failed"}, {"status": "pending"}) for _ in retried
+                ))
+                db.commit()
+                break
+            except IntegrityError:
+                db.rollback()
+                if attempt == 2:
+                    raise
+    
+    created = dict(zip(new_rows, ids))
+    publish_status(
+        [(image_id, new_rows[content_hash]["status"]) for content_hash, image_id in created.items()]
+        + [(image_id, "pending") for image_id in retried]
+    )
+    for content_hash, (image_id, _) in known.items():
+        if image_id in retried:
+            created[content_hash] = image_id
+    refs = []
+    for row in rows:
+        content_hash = row["content_hash"]
+        if content_hash in created:
+            # Later repeats within rows resolve to this new (or retried) record
+            image_id = created.pop(content_hash)
+            status = "pending" if image_id in retried else row["status"]
+            known[content_hash] = (image_id, status)
+            refs.append((image_id, status, False))
+        else:
+            refs.append((*known[content_hash], True))
+    return refs
+
+
+def _upload_response(values: dict, ref: RecordRef) -> ImageUploadResponse:
+    image_id, status, existing = ref
+    if existing:
+        return ImageUploadResponse(
+            id=image_id,
+            filename=values["filename"],
+            status=status,
+            existing=True,
+            message=EXISTING_MESSAGE
+        )
+    return ImageUploadResponse(id=image_id, filename=values["filename"], status=status)
+
+
+def _enqueue_upload(request: Request, image_id: int) -> None:
+    """
+    Start processing a single upload: on the interactive queue when its
+    X-Upload-Origin is in INTERACTIVE_UPLOAD_ORIGINS (the dashboard sends
+    "dashboard"), otherwise batched on the bulk queue like /upload/bulk.
+    """
+    origin = request.headers.get("X-Upload-Origin", "").strip().lower()
+    with stage("enqueue"):
+        if origin in settings.INTERACTIVE_UPLOAD_ORIGINS:
+            process_image.delay(image_id)
+        else:
+            enqueue_for_batch([image_id])
+
+
+async def _stream_files(
+    request: Request,
+    field: str,
+    max_files: int,
+    fail_fast: bool = False
+) -> Tuple[List[str], List[IngestResult]]:
+    """
+    Stream every file part named field to a staging file as it arrives,
+    then commit the staged files to storage once the whole body is read.
+    
+    A rejected file's remaining bytes are skipped. With fail_fast the first
+    rejection is raised instead, without reading the rest of the body. Files
+    are only committed once the request as a whole is accepted: a request
+    rejected partway (too many files, fail_fast, a dropped connection)
+    leaves nothing in storage.
+    
+    Returns:
+        (original filenames, one IngestResult per file)
+    """
+    sources: List[str] = []
+    # Per file, in order: a finished writer to commit, or the rejection
+    staged: List[Tuple[Optional[UploadWriter], Optional[str]]] = []
+    writer: Optional[UploadWriter] = None
+    error: Optional[str] = None
+    
+    try:
+        async for kind, value in iter_multipart(request):
+            if kind == "part":
+                name, filename = value
+                if name != field or filename is None:
+                    continue
+                if len(sources) >= max_files:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"At most {max_files} files per request"
+                    )
+                sources.append(filename)
+                writer, error = UploadWriter(), None
+            
+            elif kind == "data" and writer is not None and error is None:
+                try:
+                    await writer.write(value)
+                except ValidationError as e:
+                    await writer.abort()
+                    if fail_fast:
+                        raise
+                    error = str(e)
+            
+            elif kind == "end" and writer is not None:
+                if error is None:
+                    try:
+                        await writer.finish()
+                        staged.append((writer, None))
+                    except ValidationError as e:
+                        await writer.abort()
+                        if fail_fast:
+                            raise
+                        staged.append((None, str(e)))
+                else:
+                    staged.append((None, error))
+                writer = None
+        
+        results: List[IngestResult] = [
+            (await finished.commit(), None) if finished else (None, error)
+            for finished, error in staged
+        ]
+    except BaseException:
+        # Staged files not committed yet (commit consumes them)
+        if writer is not None:
+            await writer.abort()
+        for finished, _ in staged:
+            if finished is not None:
+                await finished.abort()
+        raise
+    
+    return sources, results
+
+
+async def _ingest_url(url: str) -> IngestResult:
+    """Download one URL, then validate and store it."""
+    try:
+        url = str(ImageCreate(url=url).url)
+    except PydanticValidationError:
+        return None, f"Invalid URL: {url}"
+    
+    staged_path = StorageService.staging_path(new_filename())
+    try:
+        with stage("fetch"):
+            file_size, content_hash = await get_fetcher().fetch(
+                url, staged_path, header_check=ImageValidator.check_header
+            )
+    except FetchError as e:
+        return None, f"Failed to download image: {str(e)}"
+    except ValidationError as e:
+        return None, str(e)
+    
+    try:
+        values = await run_blocking(store_staged_file, staged_path, file_size, content_hash, url)
+        return values, None
+    except ValidationError as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f"Upload failed: {str(e)}"
+
+
+async def _bounded(semaphore: asyncio.Semaphore, work: Awaitable[IngestResult]) -> IngestResult:
+    async with semaphore:
+        return await work
+
+
+def _register_uploads(
+    db: Session,
+    sources: List[str],
+    results: List[IngestResult]
+) -> BulkUploadResponse:
+    """
+    Insert every accepted item with one bulk INSERT, queue the new ones for
+    batched processing and build the per-item response. Items whose bytes
+    were uploaded before resolve to the existing record and queue nothing.
+    """
+    rows = [values for values, _ in results if values is not None]
+    refs = _insert_records(db, rows) if rows else []
+    with stage("enqueue"):
+        enqueue_for_batch([image_id for image_id, _, existing in refs if not existing])
+    
+    items = []
+    row_refs = iter(refs)
+    for index, (source, (values, error)) in enumerate(zip(sources, results)):
+        if values is None:
+            items.append(BulkUploadItem(index=index, source=source, status="rejected", error=error))
+        else:
+            image_id, status, existing = next(row_refs)
+            items.append(BulkUploadItem(
+                index=index, source=source, id=image_id, status=status, existing=existing
+            ))
+    
+    existing_count = sum(1 for _, _, existing in refs if existing)
+    return BulkUploadResponse(
+        accepted=len(refs) - existing_count,
+        existing=existing_count,
+        rejected=len(items) - len(refs),
+        items=items
+    )
+
+
+def _check_bulk_size(count: int) -> None:
+    if count > settings.BULK_UPLOAD_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BULK_UPLOAD_MAX_ITEMS} items per bulk upload"
+        )
+
+
+async def _iter_ndjson_urls(request: Request) -> AsyncIterator[str]:
+    """
+    Yield URLs from an NDJSON body as lines arrive. Each line is a JSON
+    string, an object with a "url" key, or a bare URL.
+    """
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_ndjson_line(line)
+    if buffer.strip():
+        yield _parse_ndjson_line(buffer)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _as_utc(value: datetime) -> datetime:
+    """
+    value converted to UTC, the zone timestamps are stored in; naive values
+    are taken to be UTC already. SQLite keeps timestamps as text without an
+    offset, so a bound datetime in another zone would compare wrongly.
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _encode_cursor(image: Image) -> str:
+    """Opaque cursor for the position after image in (created_at, id) order."""
+    position = json.dumps([image.created_at.isoformat(), image.id])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, image_id = json.loads(base64.urlsafe_b64decode(padded))
+        return _as_utc(datetime.fromisoformat(created_at)), int(image_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _parse_ndjson_line(line: bytes) -> str:
+    text = line.decode("utf-8", errors="replace").strip()
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return text
+    if isinstance(value, dict):
+        return str(value.get("url", ""))
+    return str(value)
+
+
+@router.post("/upload/file", response_model=ImageUploadResponse, openapi_extra=_multipart_body("file"))
 async def upload_image_file(
-    file: UploadFile = File(...),
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """
     Upload an image file for processing.
     Validates the image and enqueues a processing job.
-    """
-    # Generate unique filename
-    file_ext = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_ext}"
-    temp_path = f"/tmp/{unique_filename}"
     
+    The file is streamed straight into storage; an invalid or oversized
+    file is rejected as soon as its header or size gives it away.
+    """
     try:
-        # Save uploaded file temporarily
-        with open(temp_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Get file size
-        file_size = len(content)
-        
-        # Open and validate image
-        img = PILImage.open(temp_path)
-        validator = ImageValidator()
-        
         try:
-            validator.validate_image(img, file_size)
+            _, results = await _stream_files(request, "file", max_files=1, fail_fast=True)
         except ValidationError as e:
-            os.remove(temp_path)
             raise HTTPException(status_code=400, detail=str(e))
+        if not results:
+            raise HTTPException(status_code=422, detail="Missing file field \"file\"")
+        values, _ = results[0]
         
-        # Save to configured storage
-        storage_path = StorageService.save_image(temp_path, unique_filename)
+        ref = (await run_blocking(_insert_records, db, [values]))[0]
         
-        # Create database record
-        image_record = Image(
-            filename=unique_filename,
-            original_url=None,
-            storage_path=storage_path,
-            file_size=file_size,
-            width=img.width,
-            height=img.height,
-            format=img.format,
-            status="pending"
-        )
-        db.add(image_record)
-        db.commit()
-        db.refresh(image_record)
+        # Enqueue processing job, unless these bytes were already uploaded
+        if not ref[2]:
+            await run_blocking(_enqueue_upload, request, ref[0])
         
-        # Enqueue processing job
-        process_image.delay(image_record.id)
-        
-        # Clean up temp file if different from storage
-        if temp_path != storage_path and os.path.exists(temp_path):
-            os.remove(temp_path)
-        
-        return ImageUploadResponse(
-            id=image_record.id,
-            filename=image_record.filename,
-            status=image_record.status
-        )
+        return _upload_response(values, ref)
         
     except HTTPException:
         raise
     except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
 @router.post("/upload/url", response_model=ImageUploadResponse)
 async def upload_image_url(
+    request: Request,
     image_data: ImageCreate,
     db: Session = Depends(get_db)
 ):
@@ -106,87 +448,197 @@ async def upload_image_url(
     """
     url = str(image_data.url)
     
-    # Generate unique filename
-    unique_filename = f"{uuid.uuid4()}.jpg"
-    temp_path = f"/tmp/{unique_filename}"
+    staged_path = StorageService.staging_path(new_filename())
     
     try:
-        # Download image
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=30.0)
-            response.raise_for_status()
-            
-            with open(temp_path, "wb") as f:
-                f.write(response.content)
-        
-        file_size = len(response.content)
-        
-        # Open and validate image
-        img = PILImage.open(temp_path)
-        validator = ImageValidator()
-        
+        # Download image next to storage (streamed and hashed; aborted once
+        # over MAX_FILE_SIZE_MB or as soon as the header is rejected), then
+        # move it into content-addressed storage and create the record
         try:
-            validator.validate_image(img, file_size)
+            with stage("fetch"):
+                file_size, content_hash = await get_fetcher().fetch(
+                    url, staged_path, header_check=ImageValidator.check_header
+                )
+            values = await run_blocking(store_staged_file, staged_path, file_size, content_hash, url)
         except ValidationError as e:
-            os.remove(temp_path)
             raise HTTPException(status_code=400, detail=str(e))
         
-        # Save to configured storage
-        storage_path = StorageService.save_image(temp_path, unique_filename)
-        
-        # Create database record
-        image_record = Image(
-            filename=unique_filename,
-            original_url=url,
-            storage_path=storage_path,
-            file_size=file_size,
-            width=img.width,
-            height=img.height,
-            format=img.format,
-            status="pending"
-        )
-        db.add(image_record)
-        db.commit()
-        db.refresh(image_record)
-        
-        # Enqueue processing job
-        process_image.delay(image_record.id)
+        ref = (await run_blocking(_insert_records, db, [values]))[0]
         
-        # Clean up temp file if different from storage
-        if temp_path != storage_path and os.path.exists(temp_path):
-            os.remove(temp_path)
+        # Enqueue processing job, unless these bytes were already uploaded
+        if not ref[2]:
+            await run_blocking(_enqueue_upload, request, ref[0])
         
-        return ImageUploadResponse(
-            id=image_record.id,
-            filename=image_record.filename,
-            status=image_record.status
-        )
+        return _upload_response(values, ref)
         
     except HTTPException:
         raise
-    except httpx.HTTPError as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+    except FetchError as e:
         raise HTTPException(status_code=400, detail=f"Failed to download image: {str(e)}")
     except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 
+@router.post("/upload/bulk", response_model=BulkUploadResponse, openapi_extra=_multipart_body("files", many=True))
+async def upload_images_bulk(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Upload many image files in one multipart request.
+    Each file is streamed into storage as it arrives and validated from its
+    header; accepted ones are inserted with a single bulk insert and queued
+    for batched processing. Returns one item per file; invalid files are
+    rejected without failing the request.
+    """
+    try:
+        sources, results = await _stream_files(
+            request, "files", max_files=settings.BULK_UPLOAD_MAX_ITEMS
+        )
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await run_blocking(_register_uploads, db, sources, results)
+
+
+@router.post("/upload/urls", response_model=BulkUploadResponse)
+async def upload_images_urls(
+    request: Request,
+    db: Session = Depends(get_db)
+):
+    """
+    Ingest many images by URL.
+    Accepts either a JSON body {"urls": [...]} or an NDJSON stream
+    (Content-Type: application/x-ndjson) with one URL per line; NDJSON
+    downloads start as lines arrive. URLs are downloaded through the shared
+    fetcher and validated in parallel, then handled like /upload/bulk.
+    """
+    semaphore = asyncio.Semaphore(settings.BULK_UPLOAD_CONCURRENCY)
+    sources: List[str] = []
+    tasks: List[asyncio.Task] = []
+    
+    def start(url: str) -> None:
+        _check_bulk_size(len(sources) + 1)
+        sources.append(url)
+        tasks.append(asyncio.ensure_future(_bounded(semaphore, _ingest_url(url))))
+    
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            async for url in _iter_ndjson_urls(request):
+                start(url)
+        else:
+            try:
+                body = BulkUrlCreate.model_validate(await request.json())
+            except (ValueError, PydanticValidationError) as e:
+                raise HTTPException(status_code=422, detail=f"Invalid request body: {str(e)}")
+            _check_bulk_size(len(body.urls))
+            for url in body.urls:
+                start(url)
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+    
+    return await run_blocking(_register_uploads, db, sources, list(results))
+
+
 @router.get("/images", response_model=List[ImageResponse])
 def list_images(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    status: Optional[str] = None,
+    is_compliant: Optional[bool] = None,
+    is_duplicate: Optional[bool] = None,
+    cluster_id: Optional[str] = None,
+    min_quality: Optional[float] = None,
+    max_quality: Optional[float] = None,
+    updated_since: Optional[datetime] = Query(
+        None, description="Only images created or changed at or after this time"
+    ),
+    skip: int = Query(0, ge=0, deprecated=True, description="Use cursor instead"),
     db: Session = Depends(get_db)
 ):
     """
-    List all images with their processing results.
+    List images with their processing results, newest first.
+    
+    Pages are keyset-paginated on (created_at, id): when there are more
+    results, the X-Next-Cursor response header holds the cursor for the
+    next page. Fetching a page costs the same at any depth, unlike skip,
+    which makes the database count past every skipped row.
+    
+    Dashboards following GET /events fetch what changed with updated_since
+    instead of reloading whole pages.
     """
-    images = db.query(Image).order_by(Image.created_at.desc()).offset(skip).limit(limit).all()
+    query = db.query(Image).options(load_only(*RESPONSE_COLUMNS))
+    
+    if status is not None:
+        query = query.filter(Image.status == status)
+    if is_compliant is not None:
+        query = query.filter(Image.is_compliant == is_compliant)
+    if is_duplicate is not None:
+        query = query.filter(Image.is_duplicate == is_duplicate)
+    if cluster_id is not None:
+        query = query.filter(Image.cluster_id == cluster_id)
+    if min_quality is not None:
+        query = query.filter(Image.quality_score >= min_quality)
+    if max_quality is not None:
+        query = query.filter(Image.quality_score <= max_quality)
+    if updated_since is not None:
+        updated_since = _as_utc(updated_since)
+        query = query.filter(or_(
+            Image.updated_at >= updated_since, Image.created_at >= updated_since
+        ))
+    if cursor:
+        query = query.filter(tuple_(Image.created_at, Image.id) < _decode_cursor(cursor))
+    
+    # One extra row tells whether there is a next page
+    images = (
+        query.order_by(Image.created_at.desc(), Image.id.desc())
+        .offset(skip)
+        .limit(limit + 1)
+        .all()
+    )
+    if len(images) > limit:
+        images = images[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(images[-1])
     return images
 
 
+@router.get("/events", response_class=StreamingResponse)
+async def image_events():
+    """
+    Server-sent events for image status transitions (uploads, processing,
+    completion, failure).
+    
+    - `status`: data is a JSON list of {"id", "status"}
+    - `resync`: messages may have been missed; fetch
+      GET /images?updated_since=<last sync> to catch up
+    
+    Every stream starts with a resync, so clients that reconnect catch up
+    on what they missed. Idle streams get a keepalive comment every
+    EVENTS_KEEPALIVE seconds.
+    """
+    async def stream() -> AsyncIterator[str]:
+        async with get_event_hub().subscribe() as queue:
+            yield "retry: 3000\n\n"
+            yield RESYNC_EVENT
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), settings.EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # No proxy buffering or caching of the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/images/{image_id}", response_model=ImageResponse)
 def get_image(
     image_id: int,
@@ -195,12 +647,74 @@ def get_image(
     """
     Get details for a specific image.
     """
-    image = db.query(Image).filter(Image.id == image_id).first()
+    image = (
+        db.query(Image)
+        .options(load_only(*RESPONSE_COLUMNS))
+        .filter(Image.id == image_id)
+        .first()
+    )
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
     return image
 
 
+@router.get(
+    "/images/{image_id}/thumbnail",
+    response_class=Response,
+    responses={200: {"content": {ThumbnailService.MEDIA_TYPE: {}}}, 304: {"description": "Not modified"}}
+)
+def get_thumbnail(
+    image_id: int,
+    request: Request,
+    width: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get a WebP thumbnail of an image, one of THUMBNAIL_WIDTHS wide
+    (default: the smallest).
+    
+    Thumbnails never change once written, so they are served with a strong
+    ETag and a long max-age; a matching If-None-Match is answered with 304
+    without touching storage.
+    """
+    width = width or min(settings.THUMBNAIL_WIDTHS)
+    if width not in settings.THUMBNAIL_WIDTHS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"width must be one of {', '.join(map(str, settings.THUMBNAIL_WIDTHS))}"
+        )
+    
+    image = db.query(Image.filename, Image.storage_path).filter(Image.id == image_id).first()
+    if not image or not image.storage_path:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    etag = ThumbnailService.etag(image.filename, width)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.THUMBNAIL_MAX_AGE}"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    try:
+        data = ThumbnailService.load(image.storage_path, image.filename, width)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Image file not found")
+    return Response(content=data, media_type=ThumbnailService.MEDIA_TYPE, headers=headers)
+
+
+@router.get("/stats", response_model=StatsResponse)
+def get_stats(
+    top_clusters: int = Query(10, ge=0, le=100, description="Largest clusters to list"),
+    db: Session = Depends(get_db)
+):
+    """
+    Catalog statistics: counts per status, compliance and duplicate rates,
+    quality score histogram and the largest similarity clusters.
+    
+    Read from counters maintained alongside every image change, so the
+    cost does not grow with the catalog.
+    """
+    return StatsService.read(db, top_clusters)
+
+
 @router.get("/config", response_model=ConfigResponse)
 def get_config():
     """
@@ -0,0 +1,220 @@
+"""
+Administrative commands, run inside the api or a worker container (the
+services that mount the similarity_index volume; rebuild-index and
+compact-index write the snapshot the workers load):
+
+    python -m app.cli migrate-schema
+    python -m app.cli migrate-embeddings [--batch-size N]
+    python -m app.cli rebuild-index [--batch-size N]
+    python -m app.cli compact-index
+    python -m app.cli create-bucket
+    python -m app.cli rebuild-stats
+    python -m app.cli reprocess [--stage NAME ...] [--chunk-size N] [--dry-run]
+    python -m app.cli rescore [--chunk-size N] [--dry-run]
+"""
+import argparse
+import sys
+import time
+from app.core.config import settings
+
+
+def migrate_schema_command(args: argparse.Namespace) -> None:
+    from app.core.database import engine
+    from app.core.migrations import ensure_schema
+    
+    for change in ensure_schema(engine) or ["schema is up to date"]:
+        print(change)
+
+
+def migrate_embeddings_command(args: argparse.Namespace) -> None:
+    from app.core.database import engine
+    from app.core.migrations import ensure_schema, migrate_embeddings
+    
+    ensure_schema(engine)
+    converted = migrate_embeddings(
+        engine,
+        batch_size=args.batch_size,
+        progress=lambda n: print(f"\r{n} embeddings converted", end="", file=sys.stderr)
+    )
+    print(file=sys.stderr)
+    print(f"Converted {converted} embeddings")
+
+
+def rebuild_index_command(args: argparse.Namespace) -> None:
+    from app.tasks.index_maintenance import rebuild_index
+    
+    started = time.monotonic()
+    
+    def report(indexed: int, total: int) -> None:
+        rate = indexed / max(time.monotonic() - started, 1e-9)
+        print(f"\r{indexed}/{total} vectors ({rate:,.0f}/s)", end="", file=sys.stderr)
+    
+    result = rebuild_index(batch_size=args.batch_size, progress=report)
+    print(file=sys.stderr)
+    print(result)
+
+
+def compact_index_command(args: argparse.Namespace) -> None:
+    from app.tasks.index_maintenance import compact_similarity_index
+    
+    print(compact_similarity_index(min_records=1))
+
+
+def create_bucket_command(args: argparse.Namespace) -> None:
+    from app.services.storage import get_backend
+    
+    backend = get_backend("s3")
+    if not backend.configured():
+        print("AWS_S3_BUCKET is not set")
+        sys.exit(1)
+    created = backend.ensure_bucket()
+    print(f"{'Created' if created else 'Found'} bucket {settings.AWS_S3_BUCKET}")
+
+
+def rebuild_stats_command(args: argparse.Namespace) -> None:
+    from app.core.database import Base, engine
+    from app.models.stats import ClusterSize, ImageStat
+    from app.services.stats import StatsService
+    
+    Base.metadata.create_all(engine, tables=[ImageStat.__table__, ClusterSize.__table__])
+    print(StatsService.rebuild(engine))
+
+
+def reprocess_command(args: argparse.Namespace) -> None:
+    from app.core.database import engine
+    from app.core.migrations import ensure_schema
+    from app.services.stages import STAGES, AnalysisStages
+    from app.tasks.image_processing import reprocess_images
+    
+    ensure_schema(engine)
+    stages = [name for name in STAGES if name in (args.stage or STAGES)]
+    for name in stages:
+        print(
+            f"{name}: version {STAGES[name].version}, "
+            f"{AnalysisStages.count_stale(engine, name)} images stale"
+        )
+    if args.dry_run:
+        return
+    
+    images = tasks = 0
+    for ids in AnalysisStages.iter_stale_ids(engine, stages, args.chunk_size):
+        reprocess_images.delay(ids, stages)
+        images += len(ids)
+        tasks += 1
+        print(f"\r{images} images queued", end="", file=sys.stderr)
+    print(file=sys.stderr)
+    print(f"Queued {images} images in {tasks} tasks on the {settings.CELERY_REPROCESS_QUEUE} queue")
+    if images and "embedding" in stages:
+        print("Run rebuild-index once they are done, so searches use the new embeddings")
+
+
+def rescore_command(args: argparse.Namespace) -> None:
+    from app.core.database import Base, engine
+    from app.models.features import ImageFeatures
+    from app.services.features import FeatureService
+    
+    Base.metadata.create_all(engine, tables=[ImageFeatures.__table__])
+    started = time.monotonic()
+    
+    def report(totals) -> None:
+        rate = totals["images"] / max(time.monotonic() - started, 1e-9)
+        print(f"\r{totals['images']} images ({rate:,.0f}/s)", end="", file=sys.stderr)
+    
+    result = FeatureService.rescore(
+        engine, chunk_size=args.chunk_size, dry_run=args.dry_run, progress=report
+    )
+    print(file=sys.stderr)
+    print(result)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    schema = subparsers.add_parser(
+        "migrate-schema",
+        help="Add columns and indexes missing from existing tables"
+    )
+    schema.set_defaults(func=migrate_schema_command, needs_index=False)
+    
+    embeddings = subparsers.add_parser(
+        "migrate-embeddings",
+        help="Convert JSON embedding_vector values to packed binary embeddings"
+    )
+    embeddings.add_argument("--batch-size", type=int, default=1000)
+    embeddings.set_defaults(func=migrate_embeddings_command, needs_index=False)
+    
+    rebuild = subparsers.add_parser(
+        "rebuild-index",
+        help="Rebuild the similarity index from the images table"
+    )
+    rebuild.add_argument(
+        "--batch-size",
+        type=int,
+        default=settings.SIMILARITY_INDEX_REBUILD_BATCH_SIZE,
+        help="Rows fetched per database round trip"
+    )
+    rebuild.set_defaults(func=rebuild_index_command, needs_index=True)
+    
+    compact = subparsers.add_parser(
+        "compact-index",
+        help="Fold the similarity index append log into a new snapshot"
+    )
+    compact.set_defaults(func=compact_index_command, needs_index=True)
+    
+    bucket = subparsers.add_parser(
+        "create-bucket",
+        help="Create the S3 bucket (e.g. on a local MinIO) if it does not exist"
+    )
+    bucket.set_defaults(func=create_bucket_command, needs_index=False)
+    
+    stats = subparsers.add_parser(
+        "rebuild-stats",
+        help="Recompute the statistics counters from the images table"
+    )
+    stats.set_defaults(func=rebuild_stats_command, needs_index=False)
+    
+    reprocess = subparsers.add_parser(
+        "reprocess",
+        help="Recompute analysis results stored by an older stage version"
+    )
+    reprocess.add_argument(
+        "--stage",
+        action="append",
+        choices=["quality", "compliance", "embedding"],
+        help="Only this stage (repeatable); default all"
+    )
+    reprocess.add_argument(
+        "--chunk-size",
+        type=int,
+        default=settings.PROCESS_BATCH_SIZE,
+        help="Images per task"
+    )
+    reprocess.add_argument("--dry-run", action="store_true", help="Only count stale images")
+    reprocess.set_defaults(func=reprocess_command, needs_index=False)
+    
+    rescore = subparsers.add_parser(
+        "rescore",
+        help="Recompute quality and compliance verdicts from stored features"
+    )
+    rescore.add_argument(
+        "--chunk-size",
+        type=int,
+        default=settings.RESCORE_CHUNK_SIZE,
+        help="Images per transaction"
+    )
+    rescore.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only count the verdicts that would change"
+    )
+    rescore.set_defaults(func=rescore_command, needs_index=False)
+    
+    args = parser.parse_args(argv)
+    if args.needs_index and not settings.SIMILARITY_INDEX_DIR:
+        parser.error("SIMILARITY_INDEX_DIR is not set")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
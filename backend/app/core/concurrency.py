@@ -0,0 +1,47 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+from .config import settings
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Return the thread pool for blocking work done by async request handlers.
+    
+    It is separate from the pool FastAPI runs sync endpoints and dependencies
+    in, so a burst of uploads cannot starve the read endpoints.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BLOCKING_THREADS,
+            thread_name_prefix="blocking"
+        )
+    return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run blocking disk, CPU or database work without blocking the event loop,
+    in a copy of the caller's context (like asyncio.to_thread), so trace
+    spans and the tasks it queues stay in the request's trace.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(), functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def shutdown_executor() -> None:
+    """Wait for queued blocking work to finish and stop the pool."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -45,6 +45,50 @@ class Settings(BaseSettings):
     def celery_result_backend(self) -> str:
         return self.CELERY_RESULT_BACKEND or self.REDIS_URL
     
+    # Work queues, highest priority first: interactive (dashboard uploads,
+    # one image per task), maintenance (periodic tasks), bulk (batched
+    # imports and API uploads) and reprocess (re-analysis of stored images)
+    CELERY_INTERACTIVE_QUEUE: str = "interactive"
+    CELERY_MAINTENANCE_QUEUE: str = "maintenance"
+    CELERY_BULK_QUEUE: str = "bulk"
+    CELERY_REPROCESS_QUEUE: str = "reprocess"
+    CELERY_PREFETCH_MULTIPLIER: int = 1  # tasks a worker process holds, including the running one
+    
+    # X-Upload-Origin values whose single uploads go to the interactive
+    # queue; other single uploads are batched like bulk imports
+    INTERACTIVE_UPLOAD_ORIGINS: List[str] = ["dashboard"]
+    
+    # Batch processing: ids queued for batching are coalesced into
+    # process_image_batch tasks of up to PROCESS_BATCH_SIZE images
+    PROCESS_BATCH_SIZE: int = 64
+    PENDING_IMAGES_KEY: str = "images:pending"
+    PENDING_DRAIN_INTERVAL: float = 2.0  # seconds between flushes of partial batches
+    
+    # Batch pipeline: process_image_batch reads originals and stores
+    # thumbnails on PIPELINE_IO_THREADS threads per worker process while
+    # the process decodes and analyzes; size worker concurrency to cores
+    PIPELINE_IO_THREADS: int = 4
+    PIPELINE_PREFETCH: int = 4  # originals read ahead / thumbnail writes queued per task
+    
+    # Push updates (GET /events): status transitions are published on a
+    # Redis pub/sub channel and relayed to dashboards as server-sent events
+    IMAGE_EVENTS_CHANNEL: str = "images:events"
+    EVENTS_KEEPALIVE: float = 15.0  # seconds between keepalive comments on idle streams
+    EVENTS_CLIENT_QUEUE: int = 100  # messages buffered per stream before it is told to resync
+    EVENTS_RECONNECT_DELAY: float = 1.0  # seconds before resubscribing after a Redis error
+    
+    # Catalog statistics (GET /stats): counters updated in the same
+    # transactions as the images, each spread over this many rows to keep
+    # concurrent writers from queueing on one row lock
+    STATS_COUNTER_SHARDS: int = 16
+    
+    # Observability: Prometheus metrics at GET /metrics on the API and on
+    # WORKER_METRICS_PORT of every worker (pool processes share theirs
+    # through the PROMETHEUS_MULTIPROC_DIR environment variable), and
+    # OpenTelemetry traces exported over OTLP (OTEL_EXPORTER_OTLP_ENDPOINT)
+    WORKER_METRICS_PORT: int = 9100  # 0 disables
+    TRACING_ENABLED: bool = False
+    
     # Storage (Cloudinary/S3)
     CLOUDINARY_CLOUD_NAME: Optional[str] = None
     CLOUDINARY_API_KEY: Optional[str] = None
@@ -54,11 +98,59 @@ class Settings(BaseSettings):
     AWS_SECRET_ACCESS_KEY: Optional[str] = None
     AWS_S3_BUCKET: Optional[str] = None
     AWS_REGION: str = "us-east-1"
+    AWS_S3_ENDPOINT_URL: Optional[str] = None  # S3-compatible stores (MinIO, moto server)
+    AWS_S3_ADDRESSING_STYLE: str = "auto"  # "path" for most S3-compatible stores
+    
+    # S3 client: one pooled client per process, botocore retries with
+    # exponential backoff, multipart uploads for large files
+    S3_MAX_POOL_CONNECTIONS: int = 32
+    S3_CONNECT_TIMEOUT: float = 5.0
+    S3_READ_TIMEOUT: float = 30.0
+    S3_RETRY_MODE: str = "standard"  # "standard" or "adaptive" (client-side rate limiting)
+    S3_MAX_ATTEMPTS: int = 5
+    S3_MULTIPART_THRESHOLD_MB: int = 8
+    S3_MULTIPART_CHUNK_MB: int = 8
+    S3_UPLOAD_CONCURRENCY: int = 8  # parts in flight per multipart upload
+    S3_READ_CHUNK_SIZE: int = 262144
     
     # Storage mode: "local", "cloudinary", or "s3"
     STORAGE_MODE: str = "local"
     UPLOAD_DIR: str = "/tmp/uploads"
     
+    # Per-node LRU cache of files read from remote storage (originals and
+    # derived files), shared by all processes; empty to disable
+    STORAGE_CACHE_DIR: Optional[str] = "/tmp/storage_cache"
+    STORAGE_CACHE_MAX_MB: int = 2048
+    
+    # Thumbnails: WebP derivatives rendered by process_image from the image
+    # it already decoded (so widths should stay below ANALYSIS_MAX_SIDE)
+    THUMBNAIL_WIDTHS: List[int] = [160, 480]
+    THUMBNAIL_QUALITY: int = 80
+    THUMBNAIL_VERSION: int = 1  # bump to invalidate ETags after changing the settings above
+    THUMBNAIL_MAX_AGE: int = 604800  # Cache-Control max-age, seconds
+    
+    # Async upload handlers: blocking work (PIL, storage copies, DB commits,
+    # task enqueues) runs in a bounded thread pool
+    BLOCKING_THREADS: int = 16
+    UPLOAD_PROBE_BYTES: int = 262144  # max prefix buffered to find an image header (after JPEG EXIF/ICC)
+    
+    # Bulk ingestion (/upload/bulk, /upload/urls)
+    BULK_UPLOAD_MAX_ITEMS: int = 1000  # files or URLs per request
+    BULK_UPLOAD_CONCURRENCY: int = 16  # URLs downloaded and validated in parallel
+    
+    # URL fetching (shared pooled HTTP client)
+    FETCH_HTTP2: bool = True  # used when the h2 package is installed
+    FETCH_TIMEOUT: float = 30.0  # seconds per read/write
+    FETCH_CONNECT_TIMEOUT: float = 10.0
+    FETCH_MAX_CONNECTIONS: int = 100
+    FETCH_MAX_KEEPALIVE: int = 20
+    FETCH_KEEPALIVE_EXPIRY: float = 30.0
+    FETCH_MAX_PER_HOST: int = 8  # concurrent downloads per host
+    FETCH_RETRIES: int = 3
+    FETCH_BACKOFF: float = 0.5  # seconds, doubled per retry
+    FETCH_MAX_BACKOFF: float = 10.0
+    FETCH_CHUNK_SIZE: int = 65536
+    
     # Image validation thresholds
     MAX_FILE_SIZE_MB: int = 10
     MIN_WIDTH: int = 100
@@ -74,6 +166,48 @@ class Settings(BaseSettings):
     MIN_QUALITY_SCORE: float = 0.6
     MIN_RESOLUTION_THRESHOLD: int = 500
     MAX_COMPRESSION_ARTIFACTS: float = 0.3
+    ANALYSIS_MAX_SIDE: int = 1024  # images are decoded no larger than this for analysis
+    QUALITY_ANALYSIS_MAX_SIDE: int = 512  # downsample used by quality metrics
+    MIN_SHARPNESS: float = 100.0  # Laplacian variance below this is blurry
+    MAX_NOISE_SIGMA: float = 8.0  # gray levels
+    MIN_CONTRAST: float = 0.08  # RMS contrast, 0-1
+    MIN_BRIGHTNESS: float = 0.15  # mean luminance, 0-1
+    
+    # Compliance thresholds (placeholder e-commerce guidelines)
+    COMPLIANCE_MIN_WIDTH: int = 800
+    COMPLIANCE_MIN_HEIGHT: int = 800
+    COMPLIANCE_MIN_ASPECT_RATIO: float = 0.8  # width / height
+    COMPLIANCE_MAX_ASPECT_RATIO: float = 1.2
+    COMPLIANCE_MAX_TRANSPARENCY: float = 0.0  # fraction of pixels not fully opaque
+    
+    # Re-scoring stored features after threshold changes (python -m app.cli rescore)
+    RESCORE_CHUNK_SIZE: int = 20000
+    
+    # Similarity search / duplicate detection
+    EMBEDDING_DIM: int = 128
+    EMBEDDING_STORAGE_DTYPE: str = "float32"  # "float32" or "float16" (half the size)
+    # IVF snapshots are memory-mapped by workers; flat and HNSW snapshots
+    # are read into each process. Until IVF has enough vectors to train, its
+    # snapshot is exact (flat)
+    SIMILARITY_INDEX_TYPE: str = "ivf"  # "flat", "ivf", or "hnsw"
+    SIMILARITY_METRIC: str = "cosine"  # "cosine" or "l2"
+    DUPLICATE_SIMILARITY_THRESHOLD: float = 0.95  # min cosine similarity
+    DUPLICATE_L2_THRESHOLD: float = 0.1  # max squared L2 distance
+    HASH_MAX_DISTANCE: int = 3  # max pHash Hamming distance; values < 4 use the fast path
+    SIMILARITY_SEARCH_THREADS: int = 1  # single-query searches are faster without OpenMP
+    IVF_NLIST: int = 4096
+    IVF_NPROBE: int = 8
+    IVF_TRAINING_FACTOR: int = 39  # train IVF once nlist * factor vectors are buffered
+    HNSW_M: int = 32
+    HNSW_EF_CONSTRUCTION: int = 80
+    HNSW_EF_SEARCH: int = 64
+    
+    # Shared on-disk index (snapshot + append log); empty for a per-process index
+    SIMILARITY_INDEX_DIR: Optional[str] = "/tmp/similarity_index"
+    SIMILARITY_INDEX_COMPACT_INTERVAL: int = 300  # seconds
+    SIMILARITY_INDEX_COMPACT_MIN_RECORDS: int = 1000
+    SIMILARITY_INDEX_REBUILD_BATCH_SIZE: int = 10000  # rows fetched per round trip
+    SIMILARITY_INDEX_REBUILD_TIME_LIMIT: int = 6 * 60 * 60  # seconds, for the Celery task
     
     class Config:
         env_file = ".env"
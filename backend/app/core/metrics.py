@@ -0,0 +1,187 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Sequence
+import redis
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+from . import tracing
+from .config import settings
+from .redis_client import get_redis
+
+# Processes that share their metrics (Celery pool processes) write samples
+# to files here, summed at scrape time. prometheus_client reads the
+# variable at import, so it has to be in the environment the process
+# starts with
+MULTIPROCESS_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+if MULTIPROCESS_DIR:
+    os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+
+# Seconds, from header checks (~1 ms) to slow downloads
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = Histogram(
+    "imagesvc_stage_duration_seconds",
+    "Time spent in a stage of upload or processing, per image (per call for batch stages)",
+    ["stage"],
+    buckets=BUCKETS,
+)
+TASK_SECONDS = Histogram(
+    "imagesvc_task_duration_seconds",
+    "Celery task run time",
+    ["task", "state"],
+    buckets=BUCKETS,
+)
+TASKS_IN_PROGRESS = Gauge(
+    "imagesvc_tasks_in_progress",
+    "Celery tasks running",
+    ["task"],
+    multiprocess_mode="livesum",
+)
+INGESTED_BYTES = Counter(
+    "imagesvc_ingested_bytes",
+    "Bytes of images accepted into storage",
+    ["source"],
+)
+INGESTED_IMAGES = Counter(
+    "imagesvc_ingested_images",
+    "Images accepted into storage",
+    ["source"],
+)
+INDEX_VECTORS = Gauge(
+    "imagesvc_index_vectors",
+    "Vectors in the similarity index when last searched or added to",
+    multiprocess_mode="mostrecent",
+)
+INDEX_QUERY_SECONDS = Histogram(
+    "imagesvc_index_query_duration_seconds",
+    "Similarity index searches (one call per image or per batch)",
+    ["kind"],
+    buckets=BUCKETS,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "imagesvc_http_request_duration_seconds",
+    "API request time until the response starts",
+    ["method", "route", "status"],
+    buckets=BUCKETS,
+)
+
+_task_starts: Dict[str, float] = {}
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage into STAGE_SECONDS, in a trace span of the same name."""
+    with tracing.span(name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+
+
+def task_started(task_id: str, name: str) -> None:
+    """Count a Celery task as running (task_prerun)."""
+    _task_starts[task_id] = time.perf_counter()
+    TASKS_IN_PROGRESS.labels(name).inc()
+
+
+def task_finished(task_id: str, name: str, state: Optional[str]) -> None:
+    """Record a Celery task's run time (task_postrun)."""
+    TASKS_IN_PROGRESS.labels(name).dec()
+    start = _task_starts.pop(task_id, None)
+    if start is not None:
+        TASK_SECONDS.labels(name, state or "UNKNOWN").observe(time.perf_counter() - start)
+
+
+class QueueDepthCollector:
+    """
+    Messages waiting in each Celery queue and image ids waiting to be
+    batched, read from Redis at scrape time.
+
+    With priority_steps, kombu keeps one Redis list per queue and step:
+    the queue's name for step 0, "<queue>\\x06\\x16<step>" for the others.
+    """
+
+    SEPARATOR = "\x06\x16"
+
+    def __init__(self, queues: Sequence[str], priority_steps: Sequence[int]):
+        self.queues = list(queues)
+        self.priority_steps = list(priority_steps)
+        self._broker: Optional[redis.Redis] = None
+
+    def _keys(self, queue: str) -> list:
+        return [
+            f"{queue}{self.SEPARATOR}{step}" if step else queue
+            for step in self.priority_steps
+        ]
+
+    def collect(self):
+        depth = GaugeMetricFamily(
+            "imagesvc_queue_depth",
+            "Messages waiting in a Celery queue (pending: image ids waiting to be batched)",
+            labels=["queue"],
+        )
+        if self._broker is None:
+            self._broker = redis.Redis.from_url(settings.celery_broker_url)
+        try:
+            with self._broker.pipeline(transaction=False) as pipe:
+                for queue in self.queues:
+                    for key in self._keys(queue):
+                        pipe.llen(key)
+                lengths = iter(pipe.execute())
+            for queue in self.queues:
+                depth.add_metric([queue], sum(next(lengths) for _ in self.priority_steps))
+            depth.add_metric(["pending"], get_redis().llen(settings.PENDING_IMAGES_KEY))
+        except redis.RedisError:
+            return
+        yield depth
+
+
+def render(*collectors) -> bytes:
+    """
+    Metrics in the Prometheus text format: this process's, or every
+    process's in multiprocess mode, plus those of extra collectors.
+    """
+    registry = CollectorRegistry()
+    if MULTIPROCESS_DIR:
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(REGISTRY)
+    for collector in collectors:
+        registry.register(collector)
+    return generate_latest(registry)
+
+
+def start_worker_server() -> None:
+    """
+    Serve the metrics of a Celery worker and its pool processes on
+    WORKER_METRICS_PORT (0 disables). Runs in the worker's main process
+    before the pool starts, clearing the samples of a previous run.
+    """
+    if not settings.WORKER_METRICS_PORT:
+        return
+    registry = REGISTRY
+    if MULTIPROCESS_DIR:
+        for name in os.listdir(MULTIPROCESS_DIR):
+            os.remove(os.path.join(MULTIPROCESS_DIR, name))
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    start_http_server(settings.WORKER_METRICS_PORT, registry=registry)
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop the live gauges of an exited pool process."""
+    if MULTIPROCESS_DIR:
+        multiprocess.mark_process_dead(pid, MULTIPROCESS_DIR)
+
@@ -0,0 +1,122 @@
+from typing import Callable, List, Optional
+from sqlalchemy import DateTime, bindparam, inspect, null, select, text, update
+from sqlalchemy.engine import Engine
+from .database import Base
+
+
+def ensure_schema(engine: Engine) -> List[str]:
+    """
+    Add columns and indexes declared on the models but missing in the database.
+    
+    create_all only creates missing tables; this brings existing tables up to
+    date. New columns must be nullable. On SQLite, timestamps written by
+    CURRENT_TIMESTAMP (whole seconds) are rewritten in the microsecond format
+    SQLAlchemy binds, so that text comparisons with bound datetimes hold.
+    
+    Returns:
+        descriptions of the changes that were applied
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    changes = []
+    
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            
+            existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                ddl = (
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} "
+                    f"{column.type.compile(dialect=engine.dialect)}"
+                )
+                conn.execute(text(ddl))
+                changes.append(f"added column {table.name}.{column.name}")
+            
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    changes.append(f"created index {index.name}")
+            
+            if engine.dialect.name == "sqlite":
+                changes.extend(_normalize_sqlite_timestamps(conn, table, preparer))
+    
+    return changes
+
+
+def _normalize_sqlite_timestamps(conn, table, preparer) -> List[str]:
+    changes = []
+    for column in table.columns:
+        if not isinstance(column.type, DateTime):
+            continue
+        name = preparer.format_column(column)
+        result = conn.execute(text(
+            f"UPDATE {preparer.format_table(table)} "
+            f"SET {name} = strftime('%Y-%m-%d %H:%M:%f', {name}) || '000' "
+            f"WHERE length({name}) = 19"
+        ))
+        if result.rowcount:
+            changes.append(f"normalized {result.rowcount} timestamps in {table.name}.{column.name}")
+    return changes
+
+
+def migrate_embeddings(
+    engine: Engine,
+    batch_size: int = 1000,
+    progress: Optional[Callable[[int], None]] = None
+) -> int:
+    """
+    Convert legacy JSON embedding_vector values into packed binary embeddings.
+    
+    Works in id order in batches, each committed separately, so it can be
+    interrupted and resumed. The JSON value is cleared once converted.
+    
+    Returns:
+        number of rows converted
+    """
+    from app.models.image import Image as ImageModel
+    from app.services.embeddings import encode_embedding
+    
+    images = ImageModel.__table__
+    convert = (
+        update(images)
+        .where(images.c.id == bindparam("b_id"))
+        .values(embedding=bindparam("b_embedding"), embedding_vector=null())
+    )
+    
+    converted = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(images.c.id, images.c.embedding_vector)
+                .where(
+                    images.c.id > last_id,
+                    images.c.embedding.is_(None),
+                    images.c.embedding_vector.isnot(None)
+                )
+                .order_by(images.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            
+            params = [
+                {"b_id": image_id, "b_embedding": encode_embedding(vector)}
+                for image_id, vector in rows
+                if vector
+            ]
+            if params:
+                conn.execute(convert, params)
+        
+        last_id = rows[-1][0]
+        converted += len(params)
+        if progress:
+            progress(converted)
+    
+    return converted
@@ -0,0 +1,44 @@
+from contextlib import nullcontext
+from typing import Any, ContextManager, Optional
+from .config import settings
+
+_tracer: Optional[Any] = None
+
+
+def setup(service_name: str, app: Any = None) -> None:
+    """
+    Export OpenTelemetry spans from this process when TRACING_ENABLED.
+
+    Spans go over OTLP/HTTP to OTEL_EXPORTER_OTLP_ENDPOINT (and the other
+    standard OTEL_* variables). Celery publishing and execution are
+    instrumented, so the trace context travels in task headers and a
+    task's spans join the trace of the request that queued it; app, when
+    given, is the FastAPI app whose requests start those traces. Call it
+    after forking: the exporter's thread does not survive a fork.
+    """
+    global _tracer
+    if not settings.TRACING_ENABLED or _tracer is not None:
+        return
+
+    from opentelemetry import trace
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    from opentelemetry.instrumentation.celery import CeleryInstrumentor
+    from opentelemetry.sdk.resources import SERVICE_NAME, Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    provider = TracerProvider(resource=Resource.create({SERVICE_NAME: service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    CeleryInstrumentor().instrument()
+    if app is not None:
+        from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+        FastAPIInstrumentor.instrument_app(app, excluded_urls="/metrics,/api/v1/events")
+    _tracer = trace.get_tracer("app")
+
+
+def span(name: str) -> ContextManager:
+    """A span (child of the current one) while tracing, otherwise a no-op."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name)
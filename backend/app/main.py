@@ -1,11 +1,19 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from app.core import metrics, tracing
 from app.core.config import settings
+from app.core.concurrency import shutdown_executor
 from app.core.database import engine, Base
+from app.core.migrations import ensure_schema
 from app.api.routes import router
+from app.services.events import get_event_hub
+from app.services.fetcher import get_fetcher
+from app.worker import QUEUE_PRIORITIES, celery_app
 
-# Create database tables
+# Create database tables and add columns/indexes missing from existing ones
 Base.metadata.create_all(bind=engine)
+ensure_schema(engine)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -23,11 +31,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include API routes
 app.include_router(router, prefix=settings.API_V1_STR, tags=["images"])
 
+# Trace requests (and the tasks they queue) when TRACING_ENABLED
+tracing.setup("image-analysis-api", app)
+
+queue_depth = metrics.QueueDepthCollector(
+    QUEUE_PRIORITIES, celery_app.conf.broker_transport_options["priority_steps"]
+)
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Record request durations per route template (not per URL)."""
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.labels(
+        request.method, route.path if route else "unmatched", response.status_code
+    ).observe(time.perf_counter() - started)
+    return response
+
+
+@app.on_event("shutdown")
+async def close_fetcher():
+    """Close pooled connections of the shared URL fetcher."""
+    await get_fetcher().aclose()
+
+
+@app.on_event("shutdown")
+async def close_event_hub():
+    """Stop relaying image events to open streams."""
+    await get_event_hub().aclose()
+
+
+@app.on_event("shutdown")
+def close_executor():
+    """Let in-flight blocking upload work finish."""
+    shutdown_executor()
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus metrics: pipeline stages, ingestion, index and queue depths."""
+    return Response(metrics.render(queue_depth), media_type=metrics.CONTENT_TYPE_LATEST)
+
 
 @app.get("/")
 def root():
@@ -1,3 +1,5 @@
 from .image import Image
+from .features import ImageFeatures
+from .stats import ClusterSize, ImageStat
 
-__all__ = ["Image"]
+__all__ = ["Image", "ImageFeatures", "ImageStat", "ClusterSize"]
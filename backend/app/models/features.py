@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, REAL, SmallInteger
+from app.core.database import Base
+
+
+class ImageFeatures(Base):
+    """
+    Raw measurements behind an image's quality and compliance verdicts,
+    one narrow fixed-width row per image (see FeatureService).
+    
+    Verdicts are a function of these features and the thresholds in
+    settings, so after a threshold change they are recomputed for the
+    whole catalog from this table alone, without reading image files or
+    the wide images rows.
+    """
+    
+    __tablename__ = "image_features"
+    
+    image_id = Column(Integer, primary_key=True)
+    
+    # Compliance stage: original dimensions and QualityAnalyzer.transparency
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    transparency = Column(REAL, nullable=True)
+    
+    # Quality stage: QualityAnalyzer.measure metrics (NULL if not measurable)
+    sharpness = Column(REAL, nullable=True)
+    noise = Column(REAL, nullable=True)
+    compression_artifacts = Column(REAL, nullable=True)
+    brightness = Column(REAL, nullable=True)
+    contrast = Column(REAL, nullable=True)
+    clipped_shadows = Column(REAL, nullable=True)
+    clipped_highlights = Column(REAL, nullable=True)
+    entropy = Column(REAL, nullable=True)
+    colorfulness = Column(REAL, nullable=True)
+    
+    # Verdicts currently stored on the image, as QualityAnalyzer bitmasks;
+    # NULL until the stage has run
+    quality_code = Column(SmallInteger, nullable=True)
+    compliance_code = Column(SmallInteger, nullable=True)
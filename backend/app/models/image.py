@@ -1,12 +1,33 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Boolean
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, JSON, Boolean, LargeBinary, Index
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class Image(Base):
     """Image metadata and analysis results."""
     
     __tablename__ = "images"
+    __table_args__ = (
+        # Keyset pagination of GET /images: newest first, optionally within
+        # one status, cluster or duplicate flag. Other filters (compliance,
+        # quality range) are applied while walking ix_images_created_at_id
+        Index("ix_images_created_at_id", "created_at", "id"),
+        Index("ix_images_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_images_cluster_id_created_at_id", "cluster_id", "created_at", "id"),
+        Index("ix_images_is_duplicate_created_at_id", "is_duplicate", "created_at", "id"),
+        # GET /images?updated_since= (rows never updated match on created_at)
+        Index("ix_images_updated_at", "updated_at"),
+        # Reprocessing: rows with results from an old stage version, in id order
+        Index("ix_images_quality_version_id", "quality_version", "id"),
+        Index("ix_images_compliance_version_id", "compliance_version", "id"),
+        Index("ix_images_embedding_version_id", "embedding_version", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     filename = Column(String, nullable=False)
@@ -16,6 +37,7 @@ class Image(Base):
     width = Column(Integer, nullable=True)
     height = Column(Integer, nullable=True)
     format = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=True, unique=True, index=True)  # SHA-256 of the file bytes
     
     # Processing status
     status = Column(String, default="pending")  # pending, processing, completed, failed
@@ -32,11 +54,28 @@ class Image(Base):
     is_duplicate = Column(Boolean, default=False)
     duplicate_of_id = Column(Integer, nullable=True)
     cluster_id = Column(String, nullable=True)
-    embedding_vector = Column(JSON, nullable=True)  # Placeholder for actual vector
+    # Deferred: loaded only when accessed, never by listings or lookups
+    embedding = deferred(Column(LargeBinary, nullable=True))  # Packed float32/float16 vector
+    embedding_vector = deferred(Column(JSON, nullable=True))  # Legacy JSON vector, see migrate_embeddings
+    
+    # 64-bit perceptual hashes, stored as signed BIGINT (see hashing.to_signed64)
+    ahash = Column(BigInteger, nullable=True)
+    dhash = Column(BigInteger, nullable=True)
+    phash = Column(BigInteger, nullable=True)
+    whash = Column(BigInteger, nullable=True)
+    
+    # Version of the analysis stage that produced the results above (see
+    # services/stages.py); NULL for results from before versions were kept
+    quality_version = Column(Integer, nullable=True)
+    compliance_version = Column(Integer, nullable=True)
+    embedding_version = Column(Integer, nullable=True)
     
-    # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Timestamps. Set in Python, with microseconds, rather than by now():
+    # SQLite's CURRENT_TIMESTAMP has whole seconds and is stored as text, so
+    # comparing it to a bound datetime (a keyset cursor, updated_since)
+    # compares strings of different precision
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=utcnow)
     processed_at = Column(DateTime(timezone=True), nullable=True)
     
     # Error tracking
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, BigInteger, String
+from app.core.database import Base
+
+
+class ImageStat(Base):
+    """
+    Sharded counter of images, maintained in the transactions that change
+    them (see StatsService).
+    
+    Writers add to a random one of STATS_COUNTER_SHARDS rows per counter, so
+    concurrent workers rarely wait on each other's row locks; readers sum
+    the shards.
+    """
+    
+    __tablename__ = "image_stats"
+    
+    name = Column(String, primary_key=True)  # e.g. "status:completed", "quality:7"
+    shard = Column(Integer, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+class ClusterSize(Base):
+    """Number of completed images per similarity cluster."""
+    
+    __tablename__ = "cluster_sizes"
+    
+    cluster_id = Column(String, primary_key=True)
+    size = Column(Integer, nullable=False, default=0, index=True)
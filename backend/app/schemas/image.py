@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, HttpUrl
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
@@ -13,9 +13,33 @@ class ImageUploadResponse(BaseModel):
     id: int
     filename: str
     status: str
+    existing: bool = False  # identical bytes were already uploaded; id is that record
     message: str = "Image uploaded successfully and queued for processing"
 
 
+class BulkUrlCreate(BaseModel):
+    """Schema for bulk ingestion from a list of URLs."""
+    urls: List[str]
+
+
+class BulkUploadItem(BaseModel):
+    """Outcome for one file or URL of a bulk upload."""
+    index: int
+    source: str
+    id: Optional[int] = None
+    status: str
+    existing: bool = False
+    error: Optional[str] = None
+
+
+class BulkUploadResponse(BaseModel):
+    """Response after a bulk upload, with one item per file or URL."""
+    accepted: int  # new records queued for processing
+    existing: int = 0  # matched an already uploaded file, nothing queued
+    rejected: int
+    items: List[BulkUploadItem]
+
+
 class ProcessingResult(BaseModel):
     """Detailed processing results for an image."""
     quality_score: Optional[float] = None
@@ -54,6 +78,30 @@ class ImageResponse(BaseModel):
         from_attributes = True
 
 
+class QualityBucket(BaseModel):
+    """Completed images with min_score <= quality_score < max_score."""
+    min_score: float
+    max_score: float
+    count: int
+
+
+class ClusterSizeItem(BaseModel):
+    """A similarity cluster and its number of completed images."""
+    cluster_id: str
+    size: int
+
+
+class StatsResponse(BaseModel):
+    """Catalog-level statistics."""
+    total: int
+    by_status: Dict[str, int]
+    compliance_rate: Optional[float] = None  # of completed images with a compliance result
+    duplicate_rate: Optional[float] = None  # of completed images
+    quality_histogram: List[QualityBucket]
+    unscored: int = 0  # completed images without a quality score
+    top_clusters: List[ClusterSizeItem]
+
+
 class ConfigResponse(BaseModel):
     """Configuration thresholds for display."""
     max_file_size_mb: int
@@ -0,0 +1,169 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from app.core.config import settings
+
+
+class DiskCache:
+    """
+    Size-bounded LRU cache of files on local disk, shared by every process
+    on the node (API workers, Celery children).
+
+    Layout of the cache directory:
+    - <xx>/<sha256 of key>: entries, sharded by the first two hex digits
+    - .tmp/: entries being written
+    - .size: total bytes of all entries
+    - .lock: serializes inserts and eviction
+
+    Reads take no lock: a hit opens the entry and bumps its mtime, which is
+    the LRU clock. Entries are written under .tmp and renamed into place, so
+    readers never see a partial file, and an entry evicted while a reader
+    has it open stays readable through that handle. When an insert takes
+    the total over max_bytes, the least recently used entries are deleted
+    down to EVICT_TO of the limit.
+
+    Entries are never invalidated, so keys must name immutable content
+    (content-addressed storage paths, or derived data keyed by content
+    hash). Hit/miss/eviction counters are per process.
+    """
+
+    EVICT_TO = 0.9
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._tmp = self.directory / ".tmp"
+        self._tmp.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / digest
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(self.directory / ".lock", "a+b") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, key: str) -> Optional[BinaryIO]:
+        """Open the entry for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            entry = open(path, "rb")
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted since it was opened; the handle is still valid
+            pass
+        self.hits += 1
+        return entry
+
+    def fetch(self, key: str, fill: Callable[[BinaryIO], None]) -> BinaryIO:
+        """
+        Open the entry for key. On a miss fill(file) writes the content,
+        which is then inserted.
+
+        Returns:
+            the entry opened for reading; the caller closes it
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                fill(tmp)
+            entry = open(tmp_path, "rb")
+            try:
+                self._insert(tmp_path, self._path(key))
+            except BaseException:
+                entry.close()
+                raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return entry
+
+    def _insert(self, tmp_path: str, path: Path) -> None:
+        size = os.path.getsize(tmp_path)
+        if size > self.max_bytes * (1 - self.EVICT_TO):
+            # Would evict most of the cache for one entry; serve uncached
+            return
+
+        with self._locked():
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            path.parent.mkdir(exist_ok=True)
+            os.replace(tmp_path, path)
+
+            total = self._read_size()
+            total = size if total is None else total + size - replaced
+            if total > self.max_bytes:
+                total = self._evict()
+            (self.directory / ".size").write_text(str(total))
+
+    def _read_size(self) -> Optional[int]:
+        try:
+            return int((self.directory / ".size").read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for shard in os.scandir(self.directory):
+            if len(shard.name) != 2 or not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self) -> int:
+        """Delete least recently used entries; called with the lock held."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.EVICT_TO
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evictions += 1
+        return total
+
+    def stats(self) -> Dict[str, int]:
+        """This process's counters."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+_cache: Optional[DiskCache] = None
+
+
+def get_storage_cache() -> Optional[DiskCache]:
+    """Return the node's cache of remote files, or None if disabled."""
+    global _cache
+    if _cache is None and settings.STORAGE_CACHE_DIR:
+        _cache = DiskCache(settings.STORAGE_CACHE_DIR, settings.STORAGE_CACHE_MAX_MB * 1024 * 1024)
+    return _cache
@@ -0,0 +1,49 @@
+from typing import Optional, Sequence
+import numpy as np
+from app.core.config import settings
+
+# Storage dtypes keyed by bytes per component; blobs carry no header, the
+# dtype is recovered from the blob length
+_DTYPES = {4: np.dtype("<f4"), 2: np.dtype("<f2")}
+
+
+def encode_embedding(vector) -> bytes:
+    """Pack an embedding into little-endian EMBEDDING_STORAGE_DTYPE bytes."""
+    dtype = np.dtype(settings.EMBEDDING_STORAGE_DTYPE).newbyteorder("<")
+    return np.asarray(vector, dtype=dtype).tobytes()
+
+
+def decode_embedding(data: bytes, dimension: Optional[int] = None) -> np.ndarray:
+    """Unpack a stored embedding into a float32 vector."""
+    dimension = dimension or settings.EMBEDDING_DIM
+    dtype = _DTYPES.get(len(data) // dimension) if len(data) % dimension == 0 else None
+    if dtype is None:
+        raise ValueError(f"Embedding of {len(data)} bytes does not match dimension {dimension}")
+    return np.frombuffer(data, dtype=dtype).astype(np.float32)
+
+
+def decode_embeddings(blobs: Sequence[bytes], dimension: Optional[int] = None) -> np.ndarray:
+    """
+    Unpack many stored embeddings into a contiguous float32 (n, dimension) array.
+    
+    Blobs of a single storage dtype are decoded with one frombuffer call over
+    their concatenation.
+    """
+    dimension = dimension or settings.EMBEDDING_DIM
+    if not blobs:
+        return np.empty((0, dimension), dtype=np.float32)
+    
+    sizes = {len(blob) for blob in blobs}
+    if len(sizes) == 1:
+        size = sizes.pop()
+        dtype = _DTYPES.get(size // dimension) if size % dimension == 0 else None
+        if dtype is None:
+            raise ValueError(f"Embedding of {size} bytes does not match dimension {dimension}")
+        vectors = np.frombuffer(b"".join(blobs), dtype=dtype).reshape(len(blobs), dimension)
+        return vectors.astype(np.float32)
+    
+    # Mixed storage dtypes (EMBEDDING_STORAGE_DTYPE changed over time)
+    vectors = np.empty((len(blobs), dimension), dtype=np.float32)
+    for i, blob in enumerate(blobs):
+        vectors[i] = decode_embedding(blob, dimension)
+    return vectors
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable, Optional, Set, Tuple
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# A status transition: (image id, new status)
+StatusChange = Tuple[int, str]
+
+
+def format_event(event: str, data: object) -> str:
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Sent when a client may have missed messages (Redis reconnect, slow
+# client); it catches up with GET /images?updated_since=
+RESYNC_EVENT = format_event("resync", {})
+
+
+def publish_status(changes: Iterable[StatusChange]) -> None:
+    """
+    Announce status transitions on IMAGE_EVENTS_CHANNEL, as one message.
+
+    Best effort: a lost message only delays dashboards until their next
+    updated_since query, so Redis errors never fail an upload or a task.
+    """
+    payload = [{"id": image_id, "status": status} for image_id, status in changes]
+    if not payload:
+        return
+    try:
+        get_redis().publish(settings.IMAGE_EVENTS_CHANNEL, json.dumps(payload))
+    except redis.RedisError as e:
+        logger.warning("Could not publish image events: %s", e)
+
+
+class ImageEventHub:
+    """
+    Relays image events from Redis to the server-sent event streams of this
+    process.
+
+    One pub/sub connection per API process serves any number of open
+    dashboards. Each stream gets a bounded queue; a stream that falls
+    EVENTS_CLIENT_QUEUE messages behind has its backlog replaced by a
+    resync event instead of holding memory, and so does every stream when
+    the Redis connection drops.
+    """
+
+    def __init__(self):
+        self._queues: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def _broadcast(self, message: str) -> None:
+        for queue in self._queues:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_EVENT)
+
+    async def _relay(self) -> None:
+        client = aioredis.Redis.from_url(settings.REDIS_URL)
+        try:
+            while True:
+                try:
+                    async with client.pubsub() as pubsub:
+                        await pubsub.subscribe(settings.IMAGE_EVENTS_CHANNEL)
+                        # Anything published before now was missed
+                        self._broadcast(RESYNC_EVENT)
+                        async for message in pubsub.listen():
+                            if message["type"] == "message":
+                                self._broadcast(
+                                    format_event("status", json.loads(message["data"]))
+                                )
+                except (redis.RedisError, OSError) as e:
+                    logger.warning("Image event relay disconnected: %s", e)
+                    await asyncio.sleep(settings.EVENTS_RECONNECT_DELAY)
+        finally:
+            await client.aclose()
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        """Queue receiving formatted events until the context exits."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._relay())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.EVENTS_CLIENT_QUEUE)
+        self._queues.add(queue)
+        try:
+            yield queue
+        finally:
+            self._queues.discard(queue)
+
+    async def aclose(self) -> None:
+        """Stop relaying and close the Redis connection."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_hub: Optional[ImageEventHub] = None
+
+
+def get_event_hub() -> ImageEventHub:
+    """Return the process-wide event hub."""
+    global _hub
+    if _hub is None:
+        _hub = ImageEventHub()
+    return _hub
@@ -0,0 +1,165 @@
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import upsert_insert
+from app.models.features import ImageFeatures
+from app.models.image import Image
+from app.services.quality import QualityAnalyzer
+from app.services.stats import STATE_COLUMNS, StatsService
+
+FEATURE_COLUMNS = tuple(
+    column.name for column in ImageFeatures.__table__.columns if column.name != "image_id"
+)
+
+
+class FeatureService:
+    """
+    Raw analysis features (image_features) and re-scoring from them.
+
+    The analysis stages store what they measured next to the verdicts they
+    wrote to the image, with the verdicts as QualityAnalyzer codes.
+    rescore() recomputes the codes for the whole table with NumPy, chunk by
+    chunk, and writes only the verdicts that changed.
+    """
+
+    @staticmethod
+    def save(db: Session, rows: List[Dict[str, Any]]) -> None:
+        """
+        Upsert feature rows ({"image_id": ..., **features of the stages
+        that ran}) in the session's transaction (the caller commits).
+        Columns a row leaves out keep their stored values.
+        """
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        for row in rows:
+            row = {
+                name: value for name, value in row.items()
+                if name in FEATURE_COLUMNS or name == "image_id"
+            }
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        for names, group in groups.items():
+            stmt = upsert_insert(db.get_bind(), ImageFeatures).values(
+                sorted(group, key=lambda row: row["image_id"])
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[ImageFeatures.image_id],
+                set_={name: stmt.excluded[name] for name in names if name != "image_id"}
+            ))
+
+    @staticmethod
+    def _rescore_chunk(db: Session, rows: list, dry_run: bool) -> Counter:
+        # None (not measured, or NaN on SQLite) becomes NaN
+        data = np.array([row[:-1] for row in rows], dtype=np.float64)
+        ids = data[:, 0].astype(np.int64)
+        features = {name: data[:, i + 1] for i, name in enumerate(FEATURE_COLUMNS)}
+
+        # Only stages that ran (stored code) can change
+        old_quality = features["quality_code"]
+        old_compliance = features["compliance_code"]
+        new_quality = QualityAnalyzer.quality_codes(features)
+        new_compliance = QualityAnalyzer.compliance_codes(features)
+        quality_changed = ~np.isnan(old_quality) & (new_quality != old_quality)
+        compliance_changed = ~np.isnan(old_compliance) & (new_compliance != old_compliance)
+
+        compliance = {
+            code: QualityAnalyzer.describe_compliance(int(code))
+            for code in np.unique(new_compliance[~np.isnan(old_compliance)])
+        }
+        # Flags quote the size thresholds, so their text can change while
+        # the code stays the same
+        for i in np.flatnonzero(~np.isnan(old_compliance) & ~compliance_changed):
+            if rows[i][-1] != compliance[new_compliance[i]][1]:
+                compliance_changed[i] = True
+
+        counts = Counter(
+            images=len(ids),
+            quality_changed=int(quality_changed.sum()),
+            compliance_changed=int(compliance_changed.sum()),
+        )
+        changed = np.flatnonzero(quality_changed | compliance_changed)
+        if dry_run or not len(changed):
+            return counts
+
+        quality = {
+            code: QualityAnalyzer.describe_quality(int(code))
+            for code in np.unique(new_quality[quality_changed])
+        }
+
+        # Grouped by the columns they set, one executemany per group
+        image_updates: Dict[tuple, List[Dict[str, Any]]] = {}
+        feature_updates: Dict[tuple, List[Dict[str, Any]]] = {}
+        for i in changed:
+            values: Dict[str, Any] = {}
+            codes: Dict[str, Any] = {}
+            if quality_changed[i]:
+                values["quality_score"], values["quality_reasons"] = quality[new_quality[i]]
+                codes["quality_code"] = int(new_quality[i])
+            if compliance_changed[i]:
+                values["is_compliant"], values["compliance_flags"] = compliance[new_compliance[i]]
+                codes["compliance_code"] = int(new_compliance[i])
+            image_updates.setdefault(tuple(values), []).append({"id": int(ids[i]), **values})
+            feature_updates.setdefault(tuple(codes), []).append({"image_id": int(ids[i]), **codes})
+
+        changed_ids = [int(ids[i]) for i in changed]
+        states = {
+            row.id: StatsService.state(row)
+            for row in db.execute(
+                select(Image.id, *(getattr(Image, name) for name in STATE_COLUMNS))
+                .where(Image.id.in_(changed_ids))
+            )
+        }
+        for group in image_updates.values():
+            db.execute(update(Image), group)
+        for group in feature_updates.values():
+            db.execute(update(ImageFeatures), group)
+        StatsService.record(db, (
+            (states[u["id"]], {**states[u["id"]], **u})
+            for group in image_updates.values() for u in group if u["id"] in states
+        ))
+        db.commit()
+        return counts
+
+    @classmethod
+    def rescore(
+        cls,
+        engine: Engine,
+        chunk_size: Optional[int] = None,
+        dry_run: bool = False,
+        progress: Optional[Callable[[Counter], None]] = None
+    ) -> Dict[str, int]:
+        """
+        Recompute quality and compliance verdicts of every image with stored
+        features under the current thresholds, without reading any image.
+
+        Works in image_id order in chunks of chunk_size (default
+        RESCORE_CHUNK_SIZE), each read and written in its own transaction,
+        so it can be interrupted and rerun. Images reprocessed while it
+        runs may get verdicts from their previous features; rerun it after.
+
+        Returns:
+            {"images": rows scanned, "quality_changed": n, "compliance_changed": n}
+        """
+        chunk_size = chunk_size or settings.RESCORE_CHUNK_SIZE
+        columns = [getattr(ImageFeatures, name) for name in FEATURE_COLUMNS]
+        totals: Counter = Counter(images=0, quality_changed=0, compliance_changed=0)
+        last_id = 0
+        while True:
+            with Session(engine) as db:
+                rows = db.execute(
+                    select(ImageFeatures.image_id, *columns, Image.compliance_flags)
+                    .join(Image, Image.id == ImageFeatures.image_id)
+                    .where(ImageFeatures.image_id > last_id)
+                    .order_by(ImageFeatures.image_id)
+                    .limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                totals.update(cls._rescore_chunk(db, rows, dry_run))
+            if progress:
+                progress(totals)
+        return dict(totals)
@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import importlib.util
+import os
+import random
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+import aiofiles
+import httpx
+from app.core.config import settings
+
+# Statuses worth retrying: rate limiting and transient upstream failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Called with the bytes received so far until it returns something other
+# than None; raises to abort the download
+HeaderCheck = Callable[[bytes], Optional[Any]]
+
+
+class FetchError(Exception):
+    """Raised when an image URL cannot be downloaded."""
+    pass
+
+
+class URLFetcher:
+    """
+    Downloads images over a shared, pooled HTTP client.
+
+    One client (and connection pool) is kept per event loop for the life of
+    the process, so keep-alive connections and TLS sessions to supplier
+    CDNs are reused across requests. HTTP/2 is used when the h2 package is
+    installed and FETCH_HTTP2 is on. Concurrent downloads from one host are
+    capped at FETCH_MAX_PER_HOST (a host's semaphore is kept only while it
+    has downloads in flight, so arbitrary URL lists cannot grow the table);
+    connection errors and retryable statuses
+    are retried with exponential backoff. Bodies are streamed to disk and
+    the download is aborted as soon as it exceeds the size limit.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # host -> [semaphore, downloads holding or waiting for it]
+        self._host_limits: Dict[str, List[Any]] = {}
+
+    @staticmethod
+    def _create_client() -> httpx.AsyncClient:
+        http2 = settings.FETCH_HTTP2 and importlib.util.find_spec("h2") is not None
+        return httpx.AsyncClient(
+            http2=http2,
+            follow_redirects=True,
+            timeout=httpx.Timeout(settings.FETCH_TIMEOUT, connect=settings.FETCH_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.FETCH_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.FETCH_MAX_KEEPALIVE,
+                keepalive_expiry=settings.FETCH_KEEPALIVE_EXPIRY,
+            ),
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared client for the running event loop, created on first use."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Clients and semaphores are bound to the loop they are used on
+            self._client = self._create_client()
+            self._loop = loop
+            self._host_limits = {}
+        return self._client
+
+    @asynccontextmanager
+    async def _host_limit(self, url: str) -> AsyncIterator[None]:
+        """Hold one of the FETCH_MAX_PER_HOST download slots of url's host."""
+        host = urlsplit(url).netloc.lower()
+        entry = self._host_limits.get(host)
+        if entry is None:
+            entry = self._host_limits[host] = [asyncio.Semaphore(settings.FETCH_MAX_PER_HOST), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._host_limits.get(host) is entry:
+                del self._host_limits[host]
+
+    @staticmethod
+    def _retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Exponential backoff with jitter, or the server's Retry-After if given."""
+        delay = settings.FETCH_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    when = parsedate_to_datetime(retry_after)
+                    delay = (when - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    pass
+        return min(max(delay, 0.0), settings.FETCH_MAX_BACKOFF)
+
+    async def fetch(
+        self,
+        url: str,
+        destination: str,
+        max_bytes: Optional[int] = None,
+        header_check: Optional[HeaderCheck] = None
+    ) -> Tuple[int, str]:
+        """
+        Stream url into the file at destination. header_check (e.g.
+        ImageValidator.check_header) sees the start of the body before
+        anything is written, so bad files are dropped after their first
+        chunk; its exceptions propagate unchanged.
+
+        Returns:
+            (bytes written, SHA-256 hex digest of the body)
+
+        Raises:
+            FetchError: on HTTP errors, exhausted retries or when the body is
+                larger than max_bytes (default MAX_FILE_SIZE_MB); no partial
+                file is left behind
+        """
+        if max_bytes is None:
+            max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+        client = self.client
+
+        async with self._host_limit(url):
+            for attempt in range(settings.FETCH_RETRIES + 1):
+                last_attempt = attempt == settings.FETCH_RETRIES
+                try:
+                    async with client.stream("GET", url) as response:
+                        if response.status_code in RETRY_STATUSES and not last_attempt:
+                            await asyncio.sleep(self._retry_delay(attempt, response))
+                            continue
+                        response.raise_for_status()
+                        return await self._save(response, destination, max_bytes, header_check)
+                except httpx.HTTPStatusError as e:
+                    raise FetchError(f"HTTP {e.response.status_code} from {url}")
+                except httpx.TransportError as e:
+                    if last_attempt:
+                        raise FetchError(f"{type(e).__name__} fetching {url}: {str(e)}")
+                    await asyncio.sleep(self._retry_delay(attempt))
+
+        raise FetchError(f"Giving up on {url}")
+
+    @staticmethod
+    async def _save(
+        response: httpx.Response,
+        destination: str,
+        max_bytes: int,
+        header_check: Optional[HeaderCheck] = None
+    ) -> Tuple[int, str]:
+        """Write a streamed response body to destination, enforcing max_bytes."""
+        declared = response.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise FetchError(f"File size {declared} bytes exceeds maximum {max_bytes} bytes")
+
+        written = 0
+        digest = hashlib.sha256()
+        prefix = bytearray()
+        try:
+            async with aiofiles.open(destination, "wb") as f:
+                async for chunk in response.aiter_bytes(settings.FETCH_CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > max_bytes:
+                        raise FetchError(f"File size exceeds maximum {max_bytes} bytes")
+                    digest.update(chunk)
+                    if header_check is not None:
+                        prefix.extend(chunk)
+                        if header_check(prefix) is None:
+                            continue
+                        chunk = bytes(prefix)
+                        header_check = None
+                        prefix = bytearray()
+                    await f.write(chunk)
+                if prefix:
+                    await f.write(prefix)
+        except BaseException:
+            if os.path.exists(destination):
+                os.remove(destination)
+            raise
+        return written, digest.hexdigest()
+
+    async def aclose(self) -> None:
+        """Close the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_fetcher: Optional[URLFetcher] = None
+
+
+def get_fetcher() -> URLFetcher:
+    """Return the process-wide URL fetcher, creating it on first use."""
+    global _fetcher
+    if _fetcher is None:
+        _fetcher = URLFetcher()
+    return _fetcher
@@ -0,0 +1,236 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from PIL import Image
+from app.services.image_context import ImageContext
+
+ImageSource = Union[Image.Image, ImageContext]
+
+# Number of set bits for every byte value, used to popcount uint64 arrays
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so dct(x) = D @ x."""
+    k = np.arange(size)[:, None]
+    n = np.arange(size)[None, :]
+    matrix = np.cos(np.pi * (2 * n + 1) * k / (2 * size)) * np.sqrt(2.0 / size)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT_32 = _dct_matrix(32)
+
+
+def _pack_bits(bits: np.ndarray) -> int:
+    """Pack 64 booleans (row-major, first bit most significant) into an int."""
+    return int(np.packbits(bits.ravel()).view(">u8")[0])
+
+
+def _grayscale(image: ImageSource, size: Tuple[int, int]) -> np.ndarray:
+    """Grayscale thumbnail of size (width, height) as a read-only float32 array."""
+    return ImageContext.wrap(image).array(size)
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """Number of set bits in each element of a uint64 array."""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def to_signed64(value: int) -> int:
+    """Map an unsigned 64-bit hash onto a signed BIGINT for storage."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def to_unsigned64(value: int) -> int:
+    """Inverse of to_signed64."""
+    return value + (1 << 64) if value < 0 else value
+
+
+class PerceptualHasher:
+    """
+    64-bit perceptual hashes. Visually similar images get hashes that differ
+    in few bits, so near-duplicates are found by Hamming distance.
+
+    Accepts PIL images or an ImageContext, whose cached thumbnails are then
+    shared with the other analysis stages.
+    """
+
+    @staticmethod
+    def ahash(image: ImageSource) -> int:
+        """Average hash: 8x8 thumbnail thresholded at its mean."""
+        pixels = _grayscale(image, (8, 8))
+        return _pack_bits(pixels > pixels.mean())
+
+    @staticmethod
+    def dhash(image: ImageSource) -> int:
+        """Difference hash: sign of horizontal gradients on a 9x8 thumbnail."""
+        pixels = _grayscale(image, (9, 8))
+        return _pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+    @staticmethod
+    def phash(image: ImageSource) -> int:
+        """DCT hash: lowest 8x8 frequencies of a 32x32 thumbnail vs their median."""
+        pixels = _grayscale(image, (32, 32))
+        low = (_DCT_32 @ pixels @ _DCT_32.T)[:8, :8]
+        return _pack_bits(low > np.median(low))
+
+    @staticmethod
+    def whash(image: ImageSource) -> int:
+        """
+        Wavelet hash: Haar LL band at 8x8 (2x2 averaging from 64x64) with the
+        image mean (the coarsest LL coefficient) removed, vs its median.
+        """
+        pixels = _grayscale(image, (64, 64))
+        low = (pixels - pixels.mean()).reshape(8, 8, 8, 8).mean(axis=(1, 3))
+        return _pack_bits(low > np.median(low))
+
+    @classmethod
+    def compute_all(cls, image: ImageSource) -> Dict[str, int]:
+        """Compute every hash, keyed by name."""
+        image = ImageContext.wrap(image)
+        return {
+            "ahash": cls.ahash(image),
+            "dhash": cls.dhash(image),
+            "phash": cls.phash(image),
+            "whash": cls.whash(image),
+        }
+
+
+class HammingIndex:
+    """
+    Multi-index hashing over 64-bit hashes.
+
+    Each hash is split into four 16-bit chunks, and for every chunk the row
+    positions are stored grouped by chunk value (offsets into a bucket
+    array). Two hashes within Hamming distance 3 must agree exactly on at
+    least one chunk, so such queries only verify rows from four buckets.
+    Larger distances fall back to a vectorized scan.
+
+    Hashes added after the buckets were built are kept in a small tail that
+    is always scanned.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(
+        self,
+        ids: Optional[np.ndarray] = None,
+        hashes: Optional[np.ndarray] = None,
+        buckets: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None
+    ):
+        self._ids = np.empty(0, dtype=np.int64) if ids is None else ids
+        self._hashes = np.empty(0, dtype=np.uint64) if hashes is None else hashes
+        if buckets is None or offsets is None:
+            buckets, offsets = self._build_buckets(self._hashes)
+        self._buckets = buckets
+        self._offsets = offsets
+
+        self._tail_ids: List[np.ndarray] = []
+        self._tail_hashes: List[np.ndarray] = []
+
+    @classmethod
+    def _chunk(cls, hashes: np.ndarray, position: int) -> np.ndarray:
+        shift = np.uint64(position * cls.CHUNK_BITS)
+        return ((hashes >> shift) & np.uint64(0xFFFF)).astype(np.int64)
+
+    @classmethod
+    def _build_buckets(cls, hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        size = 1 << cls.CHUNK_BITS
+        position_dtype = np.int32 if len(hashes) < 2 ** 31 else np.int64
+        buckets = np.empty((cls.CHUNKS, len(hashes)), dtype=position_dtype)
+        offsets = np.zeros((cls.CHUNKS, size + 1), dtype=np.int64)
+        for position in range(cls.CHUNKS):
+            chunk = cls._chunk(hashes, position)
+            buckets[position] = np.argsort(chunk, kind="stable")
+            offsets[position, 1:] = np.cumsum(np.bincount(chunk, minlength=size))
+        return buckets, offsets
+
+    def __len__(self) -> int:
+        return len(self._ids) + sum(len(ids) for ids in self._tail_ids)
+
+    def add(self, ids, hashes) -> None:
+        """Add unsigned 64-bit hashes under the given ids."""
+        self._tail_ids.append(np.asarray(ids, dtype=np.int64).reshape(-1))
+        self._tail_hashes.append(np.asarray(hashes, dtype=np.uint64).reshape(-1))
+
+    def _tail(self) -> Tuple[np.ndarray, np.ndarray]:
+        if not self._tail_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.uint64)
+        if len(self._tail_ids) > 1:
+            self._tail_ids = [np.concatenate(self._tail_ids)]
+            self._tail_hashes = [np.concatenate(self._tail_hashes)]
+        return self._tail_ids[0], self._tail_hashes[0]
+
+    def search(self, value: int, max_distance: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find all hashes within max_distance bits of value.
+
+        Returns:
+            (ids, distances) sorted by distance
+        """
+        query = np.uint64(value)
+
+        if max_distance < self.CHUNKS:
+            query_array = np.array([query], dtype=np.uint64)
+            candidates = []
+            for position in range(self.CHUNKS):
+                chunk = int(self._chunk(query_array, position)[0])
+                start = self._offsets[position, chunk]
+                stop = self._offsets[position, chunk + 1]
+                candidates.append(self._buckets[position, start:stop])
+            rows = np.unique(np.concatenate(candidates))
+            base_ids, base_hashes = self._ids[rows], self._hashes[rows]
+        else:
+            base_ids, base_hashes = self._ids, self._hashes
+
+        tail_ids, tail_hashes = self._tail()
+        ids = np.concatenate([base_ids, tail_ids])
+        distances = popcount64(np.concatenate([base_hashes, tail_hashes]) ^ query)
+
+        keep = distances <= max_distance
+        ids, distances = ids[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return ids[order], distances[order]
+
+    def merged(self) -> "HammingIndex":
+        """Return a new index with the tail folded into the buckets."""
+        tail_ids, tail_hashes = self._tail()
+        return HammingIndex(
+            np.concatenate([self._ids, tail_ids]),
+            np.concatenate([self._hashes, tail_hashes])
+        )
+
+    @staticmethod
+    def _paths(directory: Path, stem: str) -> Dict[str, Path]:
+        return {name: directory / f"{stem}.{name}.npy" for name in ("ids", "hashes", "buckets", "offsets")}
+
+    def save(self, directory: Path, stem: str) -> None:
+        """Write the bucketed part of the index as .npy files."""
+        arrays = {
+            "ids": self._ids,
+            "hashes": self._hashes,
+            "buckets": self._buckets,
+            "offsets": self._offsets,
+        }
+        for name, path in self._paths(directory, stem).items():
+            with open(path, "wb") as f:
+                np.save(f, arrays[name])
+
+    @classmethod
+    def load(cls, directory: Path, stem: str) -> Optional["HammingIndex"]:
+        """Memory-map an index written by save(), or None if there is none."""
+        paths = cls._paths(directory, stem)
+        if not all(path.exists() for path in paths.values()):
+            return None
+        arrays = {name: np.load(path, mmap_mode="r") for name, path in paths.items()}
+        return cls(**arrays)
+
+    @classmethod
+    def remove(cls, directory: Path, stem: str) -> None:
+        for path in cls._paths(directory, stem).values():
+            if path.exists():
+                path.unlink()
@@ -0,0 +1,169 @@
+import math
+from typing import BinaryIO, Dict, Optional, Tuple, Union
+import numpy as np
+from PIL import Image
+from app.core.config import settings
+
+# Uploads are validated against MAX_WIDTH x MAX_HEIGHT from their headers;
+# have PIL refuse to decode anything larger (decompression bomb guard)
+Image.MAX_IMAGE_PIXELS = settings.MAX_WIDTH * settings.MAX_HEIGHT
+
+
+class ImageContext:
+    """
+    An image decoded once and shared by every analysis stage.
+
+    Analysis never needs more than ANALYSIS_MAX_SIDE pixels per side, so
+    JPEGs are decoded at reduced scale with draft() and other formats are
+    box-reduced after decoding. Both shrink by integer factors, so JPEG
+    block boundaries stay on a regular grid (see block_period). Derived
+    representations (grayscale image, fixed-size thumbnails, NumPy arrays)
+    are computed on first use and cached. size, mode and format always
+    describe the original file.
+    """
+
+    def __init__(
+        self,
+        image: Image.Image,
+        original_size: Optional[Tuple[int, int]] = None,
+        original_mode: Optional[str] = None,
+        image_format: Optional[str] = None
+    ):
+        self.size = original_size or image.size
+        self.mode = original_mode or image.mode
+        self.format = image_format or image.format
+        self.image = self._normalize(image)
+
+        self._gray: Optional[Image.Image] = None
+        self._thumbnails: Dict[Tuple[int, int, str], Image.Image] = {}
+        self._fitted: Dict[Tuple[int, str], Image.Image] = {}
+        self._arrays: Dict[tuple, np.ndarray] = {}
+
+    @classmethod
+    def open(
+        cls,
+        source: Union[str, BinaryIO],
+        max_side: Optional[int] = None
+    ) -> "ImageContext":
+        """Decode an image file (path or file object) at analysis resolution."""
+        max_side = max_side or settings.ANALYSIS_MAX_SIDE
+        image = Image.open(source)
+        original_size, original_mode, image_format = image.size, image.mode, image.format
+
+        bound = max_side
+        if image_format == "JPEG":
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale (never below max_side);
+            # the result is kept as is unless still far too large
+            image.draft(None, (max_side, max_side))
+            bound = 2 * max_side
+        image.load()
+
+        return cls(
+            cls._bound(image, bound),
+            original_size=original_size,
+            original_mode=original_mode,
+            image_format=image_format
+        )
+
+    @classmethod
+    def wrap(cls, image: Union[Image.Image, "ImageContext"]) -> "ImageContext":
+        """Accept either a context or a plain PIL image."""
+        if isinstance(image, ImageContext):
+            return image
+        return cls(cls._bound(image, settings.ANALYSIS_MAX_SIDE))
+
+    @staticmethod
+    def _bound(image: Image.Image, max_side: int) -> Image.Image:
+        factor = math.ceil(max(image.size) / max_side)
+        if factor <= 1:
+            return image
+        if image.mode not in ("L", "RGB", "RGBA"):
+            image = ImageContext._normalize(image)
+        return image.reduce(factor)
+
+    @staticmethod
+    def _normalize(image: Image.Image) -> Image.Image:
+        """Convert exotic modes (palette, CMYK, ...) to L, RGB or RGBA."""
+        if image.mode in ("L", "RGB", "RGBA"):
+            return image
+        if image.mode in ("LA", "PA") or "transparency" in image.info:
+            return image.convert("RGBA")
+        return image.convert("RGB")
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    @property
+    def block_period(self) -> float:
+        """Spacing in decoded pixels of the original's 8x8 JPEG block grid."""
+        return 8 * self.image.width / self.width
+
+    @property
+    def gray(self) -> Image.Image:
+        """Grayscale version of the decoded image."""
+        if self._gray is None:
+            self._gray = self.image.convert("L")
+        return self._gray
+
+    def thumbnail(self, width: int, height: int, mode: str = "L") -> Image.Image:
+        """Exact-size LANCZOS thumbnail (ignores aspect ratio), cached by size."""
+        key = (width, height, mode)
+        if key not in self._thumbnails:
+            source = self.gray if mode == "L" else self.image.convert(mode)
+            self._thumbnails[key] = source.resize((width, height), Image.LANCZOS)
+        return self._thumbnails[key]
+
+    def fitted(self, max_side: int, mode: str = "L") -> Image.Image:
+        """Aspect-preserving downsample with longest side <= max_side, cached."""
+        key = (max_side, mode)
+        if key not in self._fitted:
+            native = self.image.mode
+            if mode != native:
+                # Downsample once in the decoded mode, convert the small copy
+                self._fitted[key] = self.fitted(max_side, native).convert(mode)
+            else:
+                source = self.image
+                scale = max_side / max(source.size)
+                if scale < 1:
+                    size = (
+                        max(1, round(source.width * scale)),
+                        max(1, round(source.height * scale))
+                    )
+                    # Box-reduce by the largest integer factor first; the
+                    # bilinear pass then only covers the remaining < 2x
+                    factor = int(1 / scale)
+                    if factor > 1:
+                        source = source.reduce(factor)
+                    source = source.resize(size, Image.BILINEAR)
+                self._fitted[key] = source
+        return self._fitted[key]
+
+    def fitted_array(self, max_side: int, mode: str = "L") -> np.ndarray:
+        """float32 array of fitted(max_side, mode). Cached; do not modify."""
+        key = ("fitted", max_side, mode)
+        if key not in self._arrays:
+            array = np.asarray(self.fitted(max_side, mode), dtype=np.float32)
+            array.flags.writeable = False
+            self._arrays[key] = array
+        return self._arrays[key]
+
+    def array(self, size: Optional[Tuple[int, int]] = None, mode: str = "L") -> np.ndarray:
+        """
+        float32 pixel array of the decoded image, or of a thumbnail of the
+        given (width, height). Cached; callers must not modify it.
+        """
+        key = (size, mode)
+        if key not in self._arrays:
+            if size is None:
+                source = self.gray if mode == "L" else self.image.convert(mode)
+            else:
+                source = self.thumbnail(size[0], size[1], mode)
+            array = np.asarray(source, dtype=np.float32)
+            array.flags.writeable = False
+            self._arrays[key] = array
+        return self._arrays[key]
@@ -0,0 +1,271 @@
+import fcntl
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+import faiss
+import numpy as np
+from app.core.config import settings
+from app.services.hashing import HammingIndex
+from app.services.vector_index import VectorIndex, extract_vectors, index_type_of
+
+
+class IndexStore:
+    """
+    On-disk home of the duplicate-detection index, shared by all workers.
+
+    Layout of the store directory:
+    - CURRENT: generation number of the live snapshot
+    - index.<gen>.faiss: snapshot written by compaction or a rebuild
+    - hashes.<gen>.*.npy: perceptual hash index (HammingIndex) for the snapshot
+    - append.<gen>.log: fixed-size (id, hash, vector) records added since that snapshot
+    - .lock: serializes appends with generation switches
+
+    Snapshots are opened read-only with IO_FLAG_MMAP. For IVF indexes the
+    inverted lists stay memory-mapped, so every worker process shares one
+    copy through the page cache and loading takes constant time. Flat and
+    HNSW snapshots are read into process memory by FAISS. Hash indexes are
+    always memory-mapped.
+    """
+
+    def __init__(self, directory: str, dimension: int):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.record_dtype = np.dtype([
+            ("id", "<i8"),
+            ("hash", "<u8"),
+            ("vector", "<f4", (dimension,)),
+        ])
+
+    def snapshot_path(self, generation: int) -> Path:
+        return self.directory / f"index.{generation}.faiss"
+
+    def log_path(self, generation: int) -> Path:
+        return self.directory / f"append.{generation}.log"
+
+    @contextmanager
+    def _locked(self, name: str = ".lock", blocking: bool = True) -> Iterator[bool]:
+        """Hold an exclusive flock on a file in the store directory."""
+        with open(self.directory / name, "a+b") as lock_file:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def compaction_lock(self, blocking: bool = True):
+        """Lock held while a new snapshot is built (compaction or rebuild)."""
+        return self._locked(".compact.lock", blocking=blocking)
+
+    def current_generation(self) -> int:
+        """Generation number of the live snapshot (0 before the first one)."""
+        try:
+            return int((self.directory / "CURRENT").read_text().strip())
+        except FileNotFoundError:
+            return 0
+
+    def load_snapshot(self, generation: int, mmap: bool = True) -> Optional[faiss.Index]:
+        """Open a snapshot, memory-mapped and read-only unless mmap is False."""
+        path = self.snapshot_path(generation)
+        if not path.exists():
+            return None
+        if mmap:
+            return faiss.read_index(str(path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        return faiss.read_index(str(path))
+
+    def load_hashes(self, generation: int) -> Optional[HammingIndex]:
+        """Memory-map a snapshot's hash index."""
+        return HammingIndex.load(self.directory, f"hashes.{generation}")
+
+    def log_size(self, generation: int) -> int:
+        """Number of complete records in a generation's append log."""
+        try:
+            return self.log_path(generation).stat().st_size // self.record_dtype.itemsize
+        except FileNotFoundError:
+            return 0
+
+    def read_log(self, generation: int, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Read records [start, stop) from a generation's append log."""
+        count = self.log_size(generation)
+        stop = count if stop is None else min(stop, count)
+        if stop <= start:
+            return np.empty(0, dtype=self.record_dtype)
+        return np.fromfile(
+            self.log_path(generation),
+            dtype=self.record_dtype,
+            count=stop - start,
+            offset=start * self.record_dtype.itemsize
+        )
+
+    def append(self, ids, vectors, hashes=None) -> None:
+        """Append vectors (and optional perceptual hashes) to the live log."""
+        records = np.empty(len(ids), dtype=self.record_dtype)
+        records["id"] = ids
+        records["hash"] = 0 if hashes is None else hashes
+        records["vector"] = vectors
+
+        with self._locked():
+            path = self.log_path(self.current_generation())
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                # Drop a partial record left behind by a crashed writer so
+                # later records stay aligned
+                size = os.fstat(fd).st_size
+                torn = size % self.record_dtype.itemsize
+                if torn:
+                    os.ftruncate(fd, size - torn)
+                os.write(fd, records.tobytes())
+            finally:
+                os.close(fd)
+
+    def publish(
+        self,
+        index: faiss.Index,
+        hash_index: HammingIndex,
+        base_generation: int,
+        log_offset: int
+    ) -> int:
+        """
+        Write index and hash_index as the next snapshot and make it live.
+
+        Both must contain the base generation's snapshot plus its log records
+        before log_offset; records appended after that are carried over into
+        the new generation's log.
+
+        Returns:
+            the new generation number
+        """
+        generation = base_generation + 1
+        snapshot = self.snapshot_path(generation)
+        tmp_snapshot = snapshot.with_suffix(".tmp")
+        faiss.write_index(index, str(tmp_snapshot))
+        hash_index.save(self.directory, f"hashes.{generation}")
+        os.replace(tmp_snapshot, snapshot)
+
+        with self._locked():
+            if self.current_generation() != base_generation:
+                os.remove(snapshot)
+                HammingIndex.remove(self.directory, f"hashes.{generation}")
+                raise RuntimeError("Index generation changed while building the snapshot")
+
+            tail = self.read_log(base_generation, log_offset)
+            tmp_log = self.log_path(generation).with_suffix(".tmp")
+            tail.tofile(tmp_log)
+            os.replace(tmp_log, self.log_path(generation))
+
+            tmp_current = self.directory / "CURRENT.tmp"
+            with open(tmp_current, "w") as f:
+                f.write(str(generation))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_current, self.directory / "CURRENT")
+
+        # Keep the previous generation for readers that are still opening it
+        for old in range(base_generation - 1, -1, -1):
+            if not self.snapshot_path(old).exists() and not self.log_path(old).exists():
+                break
+            for path in (self.snapshot_path(old), self.log_path(old)):
+                if path.exists():
+                    os.remove(path)
+            HammingIndex.remove(self.directory, f"hashes.{old}")
+
+        return generation
+
+    def compact(self, min_records: int = 1) -> Optional[int]:
+        """
+        Fold the live append log into a new snapshot.
+
+        Returns:
+            the new generation, or None if another compaction is running or
+            fewer than min_records records are pending
+        """
+        with self.compaction_lock(blocking=False) as acquired:
+            if not acquired:
+                return None
+
+            generation = self.current_generation()
+            pending = self.log_size(generation)
+            if pending < max(min_records, 1):
+                return None
+
+            snapshot = self.load_snapshot(generation, mmap=False)
+            if snapshot is None:
+                index = VectorIndex()
+            elif (index_type_of(snapshot) == "flat"
+                  and settings.SIMILARITY_INDEX_TYPE != "flat"):
+                # The catalog may have outgrown the flat index used while an
+                # IVF/HNSW index could not be trained yet; migrate it
+                index = VectorIndex()
+                index.add(*extract_vectors(snapshot))
+            else:
+                index = VectorIndex(index=snapshot)
+
+            index.hash_index = self.load_hashes(generation) or HammingIndex()
+
+            records = self.read_log(generation, 0, pending)
+            index.add(records["id"], records["vector"], records["hash"])
+
+            return self.publish(index.export(), index.hash_index.merged(), generation, pending)
+
+
+class PersistentVectorIndex(VectorIndex):
+    """
+    VectorIndex backed by an IndexStore.
+
+    The live snapshot is the read-only base index; records from the append
+    log, including ones written by other processes, are replayed into the
+    exact buffer. Every search first picks up new log records and switches
+    to a newer snapshot once compaction has published one.
+    """
+
+    def __init__(self, store: IndexStore, **kwargs):
+        super().__init__(read_only=True, **kwargs)
+        self.store = store
+        self.generation = -1
+        self._log_offset = 0
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Catch up with the on-disk store."""
+        generation = self.store.current_generation()
+
+        with self._lock:
+            if generation != self.generation:
+                snapshot = self.store.load_snapshot(generation)
+                if snapshot is not None:
+                    self._index = snapshot
+                    self.index_type = index_type_of(snapshot)
+                else:
+                    self._index = self._create_index(self.index_type)
+                self._buffer = self._create_index("flat")
+                self.hash_index = self.store.load_hashes(generation) or HammingIndex()
+                self.generation = generation
+                self._log_offset = 0
+
+            records = self.store.read_log(generation, self._log_offset)
+            if len(records):
+                super().add(records["id"], records["vector"], records["hash"])
+                self._log_offset += len(records)
+
+    def add(self, ids, vectors, hashes=None) -> None:
+        """Append vectors to the shared log, then pick them up locally."""
+        id_array = np.ascontiguousarray(ids, dtype=np.int64).reshape(-1)
+        self.store.append(id_array, self.prepare(vectors), hashes)
+        self.refresh()
+
+    def search(self, vectors, k: int = 1):
+        self.refresh()
+        return super().search(vectors, k)
+
+    def search_hash(self, value: int, max_distance: int):
+        self.refresh()
+        return super().search_hash(value, max_distance)
+    
+    def search_hashes(self, values, max_distance: int):
+        self.refresh()
+        return super().search_hashes(values, max_distance)
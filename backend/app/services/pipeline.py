@@ -0,0 +1,92 @@
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Iterable, Iterator, Optional, Tuple, TypeVar
+from app.core.config import settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """
+    Return the worker process's thread pool for the I/O stages of image
+    processing (reading originals, storing thumbnails).
+
+    Storage reads and writes release the GIL, so they overlap with the
+    decoding and analysis the task runs on its own thread; the Celery
+    prefork pool (one process per core) is the pool for that CPU stage.
+    Created on first use, i.e. in the forked child. Work is submitted with
+    the submitter's context (see _submit), so trace spans nest under the
+    task's.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PIPELINE_IO_THREADS,
+            thread_name_prefix="pipeline-io"
+        )
+    return _executor
+
+
+def _submit(func: Callable[..., R], *args) -> "Future[R]":
+    """Run func(*args) on the I/O pool in a copy of the caller's context."""
+    return get_io_executor().submit(contextvars.copy_context().run, func, *args)
+
+
+def read_ahead(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    ahead: Optional[int] = None
+) -> Iterator[Tuple[T, "Future[R]"]]:
+    """
+    Run func over items on the I/O pool, at most ahead calls in flight.
+
+    Yields (item, future) in the order of items; the next call starts as
+    each future is handed out, so the consumer works on one item while the
+    following ones are read. The future's result() returns func's value or
+    raises its exception.
+    """
+    ahead = ahead or settings.PIPELINE_PREFETCH
+    items = iter(items)
+    pending: Deque[Tuple[T, Future]] = deque()
+
+    def submit_next() -> None:
+        for item in items:
+            pending.append((item, _submit(func, item)))
+            return
+
+    for _ in range(ahead):
+        submit_next()
+    while pending:
+        item, future = pending.popleft()
+        submit_next()
+        yield item, future
+
+
+class WriteBehind:
+    """
+    Writes handed to the I/O pool, at most `limit` of them unfinished.
+
+    submit() blocks on the oldest write once the limit is reached, which
+    bounds the memory held by queued data, and returns the write's future;
+    a write's error is raised only by its own future's result(), so one
+    failed write does not fail the others. wait() finishes every write.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit or settings.PIPELINE_PREFETCH
+        self._pending: Deque[Future] = deque()
+
+    def submit(self, func: Callable[..., R], *args) -> "Future[R]":
+        while len(self._pending) >= self.limit:
+            wait([self._pending.popleft()])
+        future = _submit(func, *args)
+        self._pending.append(future)
+        return future
+
+    def wait(self) -> None:
+        wait(self._pending)
+        self._pending.clear()
@@ -1,92 +1,348 @@
-from typing import Tuple, List
+import time
+from typing import Dict, Tuple, List, Mapping, Union
+import numpy as np
 from PIL import Image
 from app.core.config import settings
+from app.services.image_context import ImageContext
 
 
+def _sharpness(gray: np.ndarray) -> float:
+    """Variance of the 4-neighbour Laplacian; low values mean blur."""
+    laplacian = (
+        gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1]
+        - 4 * gray[1:-1, 1:-1]
+    )
+    return float(laplacian.var())
+
+
+def _noise_sigma(gray: np.ndarray) -> float:
+    """
+    Noise standard deviation (Immerkaer's method): mean absolute response to
+    a kernel that cancels smooth structure and keeps pixel-level noise.
+    """
+    height, width = gray.shape
+    response = (
+        gray[:-2, :-2] + gray[:-2, 2:] + gray[2:, :-2] + gray[2:, 2:]
+        - 2 * (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:])
+        + 4 * gray[1:-1, 1:-1]
+    )
+    return float(np.abs(response).sum() * np.sqrt(np.pi / 2) / (6 * (width - 2) * (height - 2)))
+
+
+def _grid_crop(image: ImageContext, size: int) -> Tuple[np.ndarray, int]:
+    """
+    Grayscale center crop (up to size x size) of the decoded image, aligned
+    to the JPEG block grid.
+    
+    Returns:
+        (pixels, block_step); block_step is 0 when the grid is not visible
+        at the decoded scale
+    """
+    period = image.block_period
+    step = int(round(period))
+    if step < 2 or abs(period - step) > 0.05:
+        step = 0
+    
+    width, height = image.image.size
+    align = step or 1
+    side = min(size, width, height) // align * align
+    left = (width - side) // 2 // align * align
+    top = (height - side) // 2 // align * align
+    crop = image.image.crop((left, top, left + side, top + side)).convert("L")
+    return np.asarray(crop, dtype=np.float32), step
+
+
+def _compression_artifacts(gray: np.ndarray, step: int) -> float:
+    """
+    Blockiness of the JPEG 8x8 DCT grid: how much larger pixel differences
+    are across block boundaries than inside blocks, as a fraction (0 = none).
+    gray must be aligned to the grid, which repeats every step pixels; NaN
+    when the grid is not visible.
+    """
+    if step < 2 or min(gray.shape) < 2 * step:
+        return float("nan")
+    
+    horizontal = np.abs(np.diff(gray, axis=1))
+    vertical = np.abs(np.diff(gray, axis=0))
+    
+    ratios = []
+    for diffs, boundary in (
+        (horizontal, horizontal[:, step - 1::step]),
+        (vertical, vertical[step - 1::step, :]),
+    ):
+        inside_mean = (diffs.sum() - boundary.sum()) / (diffs.size - boundary.size)
+        # +1 gray level keeps flat regions from producing huge ratios
+        ratios.append((boundary.mean() + 1.0) / (inside_mean + 1.0))
+    return float(max(0.0, np.mean(ratios) - 1.0))
+
+
+def _histogram_stats(gray: np.ndarray) -> Dict[str, float]:
+    """Brightness, RMS contrast, clipping and entropy of the luminance histogram."""
+    histogram = np.bincount(gray.astype(np.uint8).ravel(), minlength=256) / gray.size
+    levels = np.arange(256, dtype=np.float64)
+    mean = float(histogram @ levels)
+    std = float(np.sqrt(histogram @ (levels - mean) ** 2))
+    nonzero = histogram[histogram > 0]
+    return {
+        "brightness": mean / 255.0,
+        "contrast": std / 255.0,
+        "clipped_shadows": float(histogram[:5].sum()),
+        "clipped_highlights": float(histogram[251:].sum()),
+        "entropy": float(-(nonzero * np.log2(nonzero)).sum()),
+    }
+
+
+def _colorfulness(rgb: np.ndarray) -> float:
+    """Hasler-Suesstrunk colorfulness (0 for grayscale, ~100+ very colorful)."""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    rg = r - g
+    yb = 0.5 * (r + g) - b
+    return float(
+        np.sqrt(rg.std() ** 2 + yb.std() ** 2)
+        + 0.3 * np.sqrt(rg.mean() ** 2 + yb.mean() ** 2)
+    )
+
+
+# Verdicts are stored as bitmasks over these lists (image_features), so
+# reorder or remove nothing: append, and bump the stage version
+QUALITY_REASONS = (
+    "Low resolution",
+    "Small dimensions",
+    "High resolution",
+    "Good resolution",
+    "Acceptable resolution",
+    "Blurry",
+    "Noisy",
+    "Visible compression artifacts",
+    "Low contrast",
+    "Underexposed",
+)
+QUALITY_PENALTIES = {
+    "Blurry": 0.2,
+    "Noisy": 0.1,
+    "Visible compression artifacts": 0.15,
+    "Low contrast": 0.1,
+    "Underexposed": 0.1,
+}
+COMPLIANCE_FLAGS = (
+    "Below recommended e-commerce size ({width}x{height})",
+    "Non-square aspect ratio (recommended: 1:1)",
+    "Contains transparency (may need white background)",
+)
+
 class QualityAnalyzer:
     """
-    Placeholder service for image quality analysis.
+    Heuristic image quality analysis.
+    
+    Metrics are computed with NumPy on a downsample no larger than
+    QUALITY_ANALYSIS_MAX_SIDE; noise and compression artifacts use a crop
+    of the same size from the decoded image, where pixel-level detail and
+    the JPEG block grid are still visible.
     
     TODO: Integrate actual IQA models (e.g., BRISQUE, NIQE, or deep learning models).
     """
     
+    # Versions of the quality (measure + score) and compliance stages; bump
+    # when a change alters their results, then run `python -m app.cli
+    # reprocess` (see stages.py). Threshold changes only need `python -m
+    # app.cli rescore`.
+    # 2: raw features and verdict codes stored in image_features
+    VERSION = 2
+    COMPLIANCE_VERSION = 2
+    
     @staticmethod
-    def analyze_quality(image: Image.Image) -> Tuple[float, List[str]]:
+    def measure(
+        image: Union[Image.Image, ImageContext]
+    ) -> Tuple[Dict[str, float], Dict[str, float]]:
         """
-        Analyze image quality (PLACEHOLDER).
+        Compute raw quality metrics.
         
         Returns:
-            (quality_score, reasons_list)
-            quality_score: 0.0 to 1.0, where 1.0 is perfect
-            reasons: list of quality issues or positive attributes
+            (metrics, timings_ms)
+            metrics: metric name -> value
+            timings_ms: metric name -> wall time in milliseconds
+        """
+        image = ImageContext.wrap(image)
+        max_side = settings.QUALITY_ANALYSIS_MAX_SIDE
+        metrics: Dict[str, float] = {}
+        timings: Dict[str, float] = {}
+        
+        def timed(name, compute):
+            started = time.perf_counter()
+            result = compute()
+            timings[name] = (time.perf_counter() - started) * 1000
+            return result
+        
+        gray = timed("downsample", lambda: image.fitted_array(max_side))
+        crop, step = timed("crop", lambda: _grid_crop(image, max_side))
+        
+        metrics["sharpness"] = timed("sharpness", lambda: _sharpness(gray))
+        # Noise and blockiness are pixel-level, so use native-scale pixels
+        metrics["noise"] = timed("noise", lambda: _noise_sigma(crop))
+        metrics["compression_artifacts"] = timed(
+            "compression_artifacts",
+            lambda: _compression_artifacts(crop, step)
+        )
+        metrics.update(timed("histogram", lambda: _histogram_stats(gray)))
+        metrics["colorfulness"] = timed(
+            "colorfulness",
+            lambda: _colorfulness(image.fitted_array(max_side, "RGB"))
+        )
+        
+        return metrics, timings
+    
+    @staticmethod
+    def quality_codes(features: Mapping[str, np.ndarray]) -> np.ndarray:
         """
-        reasons = []
+        Quality verdicts of many images at once, as bitmasks over
+        QUALITY_REASONS.
         
-        # Placeholder: Basic heuristic-based quality assessment
-        width, height = image.size
+        features holds equal-length arrays: width and height (original
+        pixels) and the metrics from measure(). NaN metrics (not measurable)
+        never trigger a penalty.
+        """
+        width = np.asarray(features["width"], dtype=np.float64)
+        height = np.asarray(features["height"], dtype=np.float64)
         total_pixels = width * height
         
-        # Check resolution against minimum threshold (squared to get total pixel count)
-        min_total_pixels = settings.MIN_RESOLUTION_THRESHOLD ** 2  # e.g., 500^2 = 250,000 pixels
-        if total_pixels < min_total_pixels:
-            reasons.append("Low resolution")
-        
-        # Check dimensions
-        if width < 500 or height < 500:
-            reasons.append("Small dimensions")
-        
-        # Placeholder score based on resolution
-        if total_pixels >= 2000 * 2000:
-            base_score = 0.9
-            reasons.append("High resolution")
-        elif total_pixels >= 1000 * 1000:
-            base_score = 0.75
-            reasons.append("Good resolution")
-        elif total_pixels >= 500 * 500:
-            base_score = 0.6
-            reasons.append("Acceptable resolution")
+        def metric(name: str) -> np.ndarray:
+            return np.asarray(features[name], dtype=np.float64)
+        
+        with np.errstate(invalid="ignore"):
+            masks = [
+                # Minimum resolution (squared to get total pixel count)
+                total_pixels < settings.MIN_RESOLUTION_THRESHOLD ** 2,
+                (width < 500) | (height < 500),
+                total_pixels >= 2000 * 2000,
+                (total_pixels >= 1000 * 1000) & (total_pixels < 2000 * 2000),
+                (total_pixels >= 500 * 500) & (total_pixels < 1000 * 1000),
+                metric("sharpness") < settings.MIN_SHARPNESS,
+                metric("noise") > settings.MAX_NOISE_SIGMA,
+                metric("compression_artifacts") > settings.MAX_COMPRESSION_ARTIFACTS,
+                metric("contrast") < settings.MIN_CONTRAST,
+                metric("brightness") < settings.MIN_BRIGHTNESS,
+            ]
+        codes = np.zeros(total_pixels.shape, dtype=np.int32)
+        for bit, mask in enumerate(masks):
+            codes |= mask.astype(np.int32) << bit
+        return codes
+    
+    @staticmethod
+    def describe_quality(code: int) -> Tuple[float, List[str]]:
+        """
+        Score and reasons of a quality code.
+        
+        Returns:
+            (quality_score, reasons_list)
+        """
+        reasons = [reason for bit, reason in enumerate(QUALITY_REASONS) if code >> bit & 1]
+        
+        # Base score from resolution
+        if "High resolution" in reasons:
+            score = 0.9
+        elif "Good resolution" in reasons:
+            score = 0.75
+        elif "Acceptable resolution" in reasons:
+            score = 0.6
         else:
-            base_score = 0.4
+            score = 0.4
         
-        # TODO: Add actual quality metrics
-        # - Blur detection
-        # - Noise analysis
-        # - Compression artifacts
-        # - Color distribution
-        # - Contrast and brightness
+        # Penalties from measured metrics
+        for reason in reasons:
+            score -= QUALITY_PENALTIES.get(reason, 0.0)
         
         if not reasons:
             reasons.append("Basic validation passed")
         
-        return base_score, reasons
+        return round(min(max(score, 0.0), 1.0), 3), reasons
     
-    @staticmethod
-    def check_compliance(image: Image.Image, metadata: dict) -> Tuple[bool, List[str]]:
+    @classmethod
+    def quality_code(cls, metrics: Dict[str, float], width: int, height: int) -> int:
+        """quality_codes() of one image."""
+        features = {name: [value] for name, value in metrics.items()}
+        return int(cls.quality_codes({**features, "width": [width], "height": [height]})[0])
+    
+    @classmethod
+    def score(cls, metrics: Dict[str, float], width: int, height: int) -> Tuple[float, List[str]]:
         """
-        Check compliance with e-commerce guidelines (PLACEHOLDER).
+        Turn image dimensions and metrics from measure() into a quality score.
         
         Returns:
-            (is_compliant, flags_list)
+            (quality_score, reasons_list)
         """
-        flags = []
-        
-        # Placeholder: Basic compliance checks
-        width, height = image.size
-        
-        # Check if image is too small for e-commerce
-        if width < 800 or height < 800:
-            flags.append("Below recommended e-commerce size (800x800)")
+        return cls.describe_quality(cls.quality_code(metrics, width, height))
+    
+    @classmethod
+    def analyze_quality(
+        cls,
+        image: Union[Image.Image, ImageContext]
+    ) -> Tuple[float, List[str]]:
+        """
+        Analyze image quality.
         
-        # Check aspect ratio for product images
-        aspect_ratio = width / height
-        if aspect_ratio < 0.8 or aspect_ratio > 1.2:
-            flags.append("Non-square aspect ratio (recommended: 1:1)")
+        Returns:
+            (quality_score, reasons_list)
+            quality_score: 0.0 to 1.0, where 1.0 is perfect
+            reasons: list of quality issues or positive attributes
+        """
+        image = ImageContext.wrap(image)
+        metrics, _ = cls.measure(image)
+        return cls.score(metrics, image.width, image.height)
+    
+    @staticmethod
+    def transparency(image: Union[Image.Image, ImageContext]) -> float:
+        """Fraction of (decoded) pixels that are not fully opaque; 0 unless RGBA."""
+        image = ImageContext.wrap(image)
+        if image.mode != "RGBA":
+            return 0.0
+        return float((np.asarray(image.image.getchannel("A")) < 255).mean())
+    
+    @staticmethod
+    def compliance_codes(features: Mapping[str, np.ndarray]) -> np.ndarray:
+        """
+        Compliance verdicts of many images at once, as bitmasks over
+        COMPLIANCE_FLAGS, from arrays of width, height (original pixels)
+        and transparency().
+        """
+        width = np.asarray(features["width"], dtype=np.float64)
+        height = np.asarray(features["height"], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            aspect_ratio = width / height
+        masks = [
+            # Too small for e-commerce
+            (width < settings.COMPLIANCE_MIN_WIDTH) | (height < settings.COMPLIANCE_MIN_HEIGHT),
+            # Aspect ratio for product images
+            (aspect_ratio < settings.COMPLIANCE_MIN_ASPECT_RATIO)
+            | (aspect_ratio > settings.COMPLIANCE_MAX_ASPECT_RATIO),
+            np.asarray(features["transparency"], dtype=np.float64)
+            > settings.COMPLIANCE_MAX_TRANSPARENCY,
+        ]
+        codes = np.zeros(width.shape, dtype=np.int32)
+        for bit, mask in enumerate(masks):
+            codes |= mask.astype(np.int32) << bit
+        return codes
+    
+    @classmethod
+    def compliance_code(cls, width: int, height: int, transparency: float) -> int:
+        """compliance_codes() of one image."""
+        return int(cls.compliance_codes({
+            "width": [width],
+            "height": [height],
+            "transparency": [transparency],
+        })[0])
+    
+    @staticmethod
+    def describe_compliance(code: int) -> Tuple[bool, List[str]]:
+        """
+        Verdict and flags of a compliance code.
         
-        # Check if transparency is present (for certain formats)
-        if image.mode == 'RGBA':
-            # Check if alpha channel has transparency
-            if image.getchannel('A').getextrema()[0] < 255:
-                flags.append("Contains transparency (may need white background)")
+        Returns:
+            (is_compliant, flags_list)
+        """
+        flags = [
+            flag.format(width=settings.COMPLIANCE_MIN_WIDTH, height=settings.COMPLIANCE_MIN_HEIGHT)
+            for bit, flag in enumerate(COMPLIANCE_FLAGS) if code >> bit & 1
+        ]
         
         # TODO: Add more compliance checks
         # - Background color detection
@@ -101,3 +357,20 @@ class QualityAnalyzer:
             flags.append("Meets basic compliance requirements")
         
         return is_compliant, flags
+    
+    @classmethod
+    def check_compliance(
+        cls,
+        image: Union[Image.Image, ImageContext],
+        metadata: dict
+    ) -> Tuple[bool, List[str]]:
+        """
+        Check compliance with e-commerce guidelines (PLACEHOLDER).
+        
+        Returns:
+            (is_compliant, flags_list)
+        """
+        image = ImageContext.wrap(image)
+        return cls.describe_compliance(
+            cls.compliance_code(image.width, image.height, cls.transparency(image))
+        )
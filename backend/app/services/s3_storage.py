@@ -0,0 +1,178 @@
+import mimetypes
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Tuple
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import (
+    ClientError,
+    ConnectionClosedError,
+    IncompleteReadError,
+    ReadTimeoutError,
+    ResponseStreamingError,
+)
+from app.core.config import settings
+from app.services.storage import StorageBackend
+
+# Errors while streaming a response body, after botocore's own retries of
+# the request have succeeded; the download is restarted
+STREAMING_ERRORS = (ConnectionClosedError, IncompleteReadError, ReadTimeoutError, ResponseStreamingError)
+
+
+class S3Storage(StorageBackend):
+    """
+    Object storage on S3 or any S3-compatible service (MinIO, moto, R2...).
+
+    One boto3 client, which is thread-safe and keeps a pool of up to
+    S3_MAX_POOL_CONNECTIONS connections, is shared by all threads of a
+    process and recreated after fork, so Celery prefork children never
+    share sockets. botocore retries throttling and transient errors with
+    exponential backoff (S3_RETRY_MODE, S3_MAX_ATTEMPTS). Files larger
+    than S3_MULTIPART_THRESHOLD_MB are sent as multipart uploads with
+    S3_UPLOAD_CONCURRENCY parts in flight. Storage paths are
+    s3://<bucket>/<key>.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._transfer_config = TransferConfig(
+            multipart_threshold=settings.S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+            multipart_chunksize=settings.S3_MULTIPART_CHUNK_MB * 1024 * 1024,
+            max_concurrency=settings.S3_UPLOAD_CONCURRENCY,
+            use_threads=True,
+        )
+
+    @staticmethod
+    def _create_client():
+        config = Config(
+            region_name=settings.AWS_REGION,
+            max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+            connect_timeout=settings.S3_CONNECT_TIMEOUT,
+            read_timeout=settings.S3_READ_TIMEOUT,
+            retries={"mode": settings.S3_RETRY_MODE, "max_attempts": settings.S3_MAX_ATTEMPTS},
+            s3={"addressing_style": settings.AWS_S3_ADDRESSING_STYLE},
+        )
+        # A session per client: the default session is not thread-safe.
+        # Without explicit keys boto3's default credential chain applies
+        # (environment, instance/task role, ...)
+        return boto3.session.Session().client(
+            "s3",
+            endpoint_url=settings.AWS_S3_ENDPOINT_URL or None,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY or None,
+            config=config,
+        )
+
+    @property
+    def client(self):
+        """The shared client for this process, created on first use."""
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    self._client = self._create_client()
+                    self._pid = pid
+        return self._client
+
+    def configured(self) -> bool:
+        return bool(settings.AWS_S3_BUCKET)
+
+    def handles(self, storage_path: str) -> bool:
+        return storage_path.startswith("s3://")
+
+    def path(self, key: str) -> str:
+        return f"s3://{settings.AWS_S3_BUCKET}/{key}"
+
+    @staticmethod
+    def parse(storage_path: str) -> Tuple[str, str]:
+        """(bucket, key) of an s3:// storage path."""
+        bucket, _, key = storage_path[len("s3://"):].partition("/")
+        return bucket, key
+
+    def ensure_bucket(self) -> bool:
+        """
+        Create AWS_S3_BUCKET if it does not exist.
+
+        Returns:
+            True if the bucket was created
+        """
+        try:
+            self.client.head_bucket(Bucket=settings.AWS_S3_BUCKET)
+            return False
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchBucket", "NotFound"):
+                raise
+        options = {}
+        if settings.AWS_REGION != "us-east-1":
+            options["CreateBucketConfiguration"] = {"LocationConstraint": settings.AWS_REGION}
+        self.client.create_bucket(Bucket=settings.AWS_S3_BUCKET, **options)
+        return True
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=settings.AWS_S3_BUCKET, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def save(self, file_path: str, key: str) -> str:
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        self.client.upload_file(
+            file_path,
+            settings.AWS_S3_BUCKET,
+            key,
+            ExtraArgs={"ContentType": content_type},
+            Config=self._transfer_config,
+        )
+        return self.path(key)
+
+    def save_bytes(self, data: bytes, key: str, content_type: str) -> str:
+        self.client.put_object(
+            Bucket=settings.AWS_S3_BUCKET, Key=key, Body=data, ContentType=content_type
+        )
+        return self.path(key)
+
+    @contextmanager
+    def open(self, storage_path: str) -> Iterator[BinaryIO]:
+        """
+        Stream an object into a seekable spool (in memory up to
+        MAX_FILE_SIZE_MB, which every stored image is within).
+        """
+        spool = tempfile.SpooledTemporaryFile(
+            max_size=settings.MAX_FILE_SIZE_MB * 1024 * 1024
+        )
+        try:
+            self.download(storage_path, spool)
+            spool.seek(0)
+            yield spool
+        finally:
+            spool.close()
+
+    def download(self, storage_path: str, destination: BinaryIO) -> None:
+        """Stream an object into destination, restarting on streaming errors."""
+        bucket, key = self.parse(storage_path)
+        for attempt in range(settings.S3_MAX_ATTEMPTS):
+            destination.seek(0)
+            destination.truncate()
+            try:
+                body = self.client.get_object(Bucket=bucket, Key=key)["Body"]
+                for chunk in body.iter_chunks(settings.S3_READ_CHUNK_SIZE):
+                    destination.write(chunk)
+                return
+            except ClientError as e:
+                if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                    raise FileNotFoundError(f"No such object: {storage_path}") from e
+                raise
+            except STREAMING_ERRORS:
+                if attempt == settings.S3_MAX_ATTEMPTS - 1:
+                    raise
+                time.sleep(min(0.1 * (2 ** attempt) * random.uniform(0.5, 1.5), 5.0))
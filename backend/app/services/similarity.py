@@ -1,90 +1,182 @@
-import hashlib
-import json
-from typing import Optional, List, Tuple
-from PIL import Image
+from typing import Dict, List, Optional, Sequence, Tuple
 import numpy as np
-
-# TODO: Replace with actual FAISS/Annoy implementation
-# import faiss
-# import annoy
+from app.core.config import settings
+from app.core.metrics import INDEX_QUERY_SECONDS, INDEX_VECTORS
+from app.services.hashing import ImageSource, PerceptualHasher, popcount64
+from app.services.image_context import ImageContext
+from app.services.vector_index import get_vector_index
 
 
 class SimilarityService:
     """
-    Placeholder service for image similarity and duplicate detection.
-    In production, this would use FAISS or Annoy for efficient similarity search.
+    Image similarity and duplicate detection.
+    Perceptual hashes are checked first; embeddings are then searched through
+    an in-process FAISS index (see vector_index.py).
     """
     
+    # Version of compute_embedding and compute_hashes; bump when a change
+    # alters their results, then run `python -m app.cli reprocess` and
+    # `python -m app.cli rebuild-index`
+    EMBEDDING_VERSION = 1
+    
     @staticmethod
-    def compute_embedding(image: Image.Image) -> List[float]:
+    def compute_embedding(image: ImageSource) -> np.ndarray:
         """
         Compute image embedding (PLACEHOLDER).
         
         TODO: Replace with actual deep learning model (e.g., ResNet, EfficientNet).
-        Currently returns a fake 128-dimensional vector based on image hash.
+        Currently returns a float32 vector built from an 8x8 thumbnail.
         """
-        # Placeholder: use perceptual hash as fake embedding
-        img_small = image.resize((8, 8), Image.LANCZOS)
-        img_gray = img_small.convert('L')
-        pixels = list(img_gray.getdata())
+        # Placeholder: use 8x8 grayscale thumbnail as embedding
+        pixels = ImageContext.wrap(image).array((8, 8)).ravel() / 255.0
         
-        # Normalize to [0, 1] and pad to 128 dimensions
-        normalized = [p / 255.0 for p in pixels]
-        while len(normalized) < 128:
-            normalized.append(0.0)
+        # Center pixels so cosine similarity measures structure rather than
+        # overall brightness, then pad to the configured dimension
+        embedding = np.zeros(settings.EMBEDDING_DIM, dtype=np.float32)
+        embedding[:pixels.size] = pixels - pixels.mean()
         
-        return normalized[:128]
+        return embedding
     
     @staticmethod
-    def compute_hash(image: Image.Image) -> str:
+    def compute_hash(image: ImageSource) -> str:
         """
-        Compute perceptual hash for quick duplicate detection.
+        Compute perceptual hash (pHash) for quick duplicate detection,
+        as 16 hex digits.
         """
-        img_small = image.resize((8, 8), Image.LANCZOS)
-        img_gray = img_small.convert('L')
-        pixels = list(img_gray.getdata())
-        avg = sum(pixels) / len(pixels)
-        bits = ''.join(['1' if p > avg else '0' for p in pixels])
-        return hashlib.sha256(bits.encode()).hexdigest()[:16]
+        return f"{PerceptualHasher.phash(image):016x}"
+    
+    @staticmethod
+    def compute_hashes(image: ImageSource) -> Dict[str, int]:
+        """Compute aHash, dHash, pHash and wHash as unsigned 64-bit ints."""
+        return PerceptualHasher.compute_all(image)
     
     @staticmethod
     def find_duplicates(
-        embedding: List[float],
+        embedding: np.ndarray,
         image_hash: str,
-        threshold: float = 0.95
+        threshold: Optional[float] = None,
+        exclude_id: Optional[int] = None
     ) -> Tuple[bool, Optional[int], Optional[str]]:
         """
-        Search for duplicate images (PLACEHOLDER).
+        Search for a near-duplicate of an image.
         
-        TODO: Implement actual similarity search using FAISS index.
-        Currently returns mock results.
+        Images whose pHash (image_hash) is within HASH_MAX_DISTANCE bits are
+        duplicates without an embedding search. Otherwise the nearest
+        embedding is compared against threshold, which defaults to DUPLICATE_SIMILARITY_THRESHOLD (cosine) or
+        DUPLICATE_L2_THRESHOLD (l2). exclude_id skips the image itself when
+        it is reprocessed.
         
         Returns:
             (is_duplicate, duplicate_of_id, cluster_id)
         """
-        # Placeholder: simulate duplicate detection
-        # In production, this would query FAISS index
-        
-        # Mock: no duplicates found
-        is_duplicate = False
-        duplicate_of_id = None
-        cluster_id = f"cluster_{image_hash[:8]}"
-        
-        return is_duplicate, duplicate_of_id, cluster_id
+        return SimilarityService.find_duplicates_batch(
+            [embedding], [image_hash], [exclude_id], threshold
+        )[0]
     
     @staticmethod
-    def add_to_index(image_id: int, embedding: List[float]) -> None:
+    def find_duplicates_batch(
+        embeddings: Sequence[np.ndarray],
+        image_hashes: Sequence[str],
+        image_ids: Sequence[Optional[int]],
+        threshold: Optional[float] = None
+    ) -> List[Tuple[bool, Optional[int], Optional[str]]]:
         """
-        Add image embedding to search index (PLACEHOLDER).
+        find_duplicates() for a batch of images with one index search.
+        
+        Each image is also checked against the earlier non-duplicate images
+        of the batch, exactly as if the batch had been processed and indexed
+        one image at a time. image_ids are the batch's own ids (skipped in
+        index results, like exclude_id).
         
-        TODO: Implement actual FAISS index update.
+        Returns:
+            one (is_duplicate, duplicate_of_id, cluster_id) per image
         """
-        # Placeholder: no-op
-        pass
-
-
-# Placeholder for FAISS index initialization
-# def initialize_faiss_index(dimension: int = 128):
-#     """Initialize FAISS index for similarity search."""
-#     index = faiss.IndexFlatL2(dimension)
-#     return index
+        count = len(image_hashes)
+        if count == 0:
+            return []
+        index = get_vector_index()
+        hash_values = np.array([int(h, 16) for h in image_hashes], dtype=np.uint64)
+        
+        # Stage 1 and 2 lookups against the index, for the whole batch at once
+        with INDEX_QUERY_SECONDS.labels("hash").time():
+            hash_matches = index.search_hashes(hash_values, settings.HASH_MAX_DISTANCE)
+        # Ask for one extra neighbour in case the closest one is the image itself
+        with INDEX_QUERY_SECONDS.labels("vector").time():
+            scores, ids = index.search(np.stack(embeddings), k=2)
+        INDEX_VECTORS.set(index.ntotal)
+        
+        # The same comparisons within the batch
+        batch_distances = popcount64(
+            (hash_values[:, None] ^ hash_values[None, :]).ravel()
+        ).reshape(count, count)
+        batch_scores = index.pairwise_scores(np.stack(embeddings), np.stack(embeddings))
+        
+        results = []
+        indexed: List[int] = []  # batch positions of images that would be indexed
+        for position in range(count):
+            own_id = image_ids[position]
+            cluster_id = f"cluster_{image_hashes[position][:8]}"
+            duplicate_of = None
+            
+            # Stage 1: perceptual hash lookup
+            for match_id in hash_matches[position][0]:
+                if match_id != own_id:
+                    duplicate_of = int(match_id)
+                    break
+            if duplicate_of is None:
+                close = [
+                    p for p in indexed
+                    if batch_distances[position, p] <= settings.HASH_MAX_DISTANCE
+                ]
+                if close:
+                    duplicate_of = image_ids[min(close, key=lambda p: batch_distances[position, p])]
+            
+            # Stage 2: nearest embedding in the index or the batch
+            if duplicate_of is None:
+                candidates = []
+                for score, match_id in zip(scores[position], ids[position]):
+                    if match_id >= 0 and match_id != own_id:
+                        candidates.append((float(score), int(match_id)))
+                        break
+                candidates.extend(
+                    (float(batch_scores[position, p]), image_ids[p]) for p in indexed
+                )
+                if candidates:
+                    pick = max if index.higher_is_closer else min
+                    best_score, best_id = pick(candidates, key=lambda c: c[0])
+                    if index.is_match(best_score, threshold):
+                        duplicate_of = best_id
+            
+            if duplicate_of is None:
+                indexed.append(position)
+                results.append((False, None, cluster_id))
+            else:
+                results.append((True, duplicate_of, cluster_id))
+        
+        return results
+    
+    @staticmethod
+    def add_to_index(
+        image_id: int,
+        embedding: np.ndarray,
+        image_hash: Optional[str] = None
+    ) -> None:
+        """Add image embedding (and pHash, if given) to the search index."""
+        hashes = None if image_hash is None else [int(image_hash, 16)]
+        index = get_vector_index()
+        index.add([image_id], embedding, hashes)
+        INDEX_VECTORS.set(index.ntotal)
+    
+    @staticmethod
+    def add_to_index_batch(
+        image_ids: Sequence[int],
+        embeddings: Sequence[np.ndarray],
+        image_hashes: Sequence[str]
+    ) -> None:
+        """Add several images to the search index in one call."""
+        if len(image_ids) == 0:
+            return
+        hashes = [int(h, 16) for h in image_hashes]
+        index = get_vector_index()
+        index.add(list(image_ids), np.stack(embeddings), hashes)
+        INDEX_VECTORS.set(index.ntotal)
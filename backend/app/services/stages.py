@@ -0,0 +1,118 @@
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
+from sqlalchemy import and_, func, not_, or_, select
+from sqlalchemy.engine import Engine
+from app.models.image import Image
+from app.services.quality import QualityAnalyzer
+from app.services.similarity import SimilarityService
+
+
+class Stage(NamedTuple):
+    version: int
+    column: str  # Image column holding the version of the stored results
+
+
+# Analysis stages with results stored on the image, in the order they run
+STAGES: Dict[str, Stage] = {
+    "quality": Stage(QualityAnalyzer.VERSION, "quality_version"),
+    "compliance": Stage(QualityAnalyzer.COMPLIANCE_VERSION, "compliance_version"),
+    "embedding": Stage(SimilarityService.EMBEDDING_VERSION, "embedding_version"),
+}
+
+# Results stored before versions were recorded (NULL version) came from
+# version 1 of every stage
+BASELINE_VERSION = 1
+
+
+class AnalysisStages:
+    """
+    Versioned analysis stages, so an algorithm change only recomputes the
+    results it made stale.
+
+    Every stage run stores its version next to its results. Results are
+    stale when stored with a version lower than the stage's current one.
+    Stale images are found per stored version value through the
+    (<stage>_version, id) indexes, so each chunk is an index range scan in
+    id order whatever the size of the catalog.
+    """
+
+    @staticmethod
+    def versions(stages: Sequence[str] = tuple(STAGES)) -> Dict[str, int]:
+        """Image column values recording that stages ran at their current versions."""
+        return {STAGES[name].column: STAGES[name].version for name in stages}
+
+    @staticmethod
+    def stale(row: Any, stages: Sequence[str] = tuple(STAGES)) -> List[str]:
+        """Stages whose results on row (an Image, or a row with its version columns) are stale."""
+        stale = []
+        for name in stages:
+            stored = getattr(row, STAGES[name].column)
+            if (BASELINE_VERSION if stored is None else stored) < STAGES[name].version:
+                stale.append(name)
+        return stale
+
+    @staticmethod
+    def stale_filter(name: str):
+        """SQL condition: the stage's results on an image are stale."""
+        stage = STAGES[name]
+        column = getattr(Image, stage.column)
+        if stage.version <= BASELINE_VERSION:
+            return and_(column.isnot(None), column < stage.version)
+        return or_(column.is_(None), column < stage.version)
+
+    @staticmethod
+    def _stale_values(name: str) -> List[Optional[int]]:
+        """Stored version values of stale results."""
+        values: List[Optional[int]] = list(range(BASELINE_VERSION, STAGES[name].version))
+        if values:
+            values.insert(0, None)
+        return values
+
+    @classmethod
+    def count_stale(cls, engine: Engine, name: str) -> int:
+        """Number of completed images with stale results of a stage."""
+        with engine.connect() as conn:
+            return conn.scalar(
+                select(func.count())
+                .select_from(Image)
+                .where(Image.status == "completed", cls.stale_filter(name))
+            )
+
+    @classmethod
+    def iter_stale_ids(
+        cls,
+        engine: Engine,
+        stages: Sequence[str],
+        chunk_size: int
+    ) -> Iterator[List[int]]:
+        """
+        Ids of completed images with stale results in any of stages, in
+        chunks of up to chunk_size, each read in its own short transaction.
+
+        An image stale in several stages is yielded once, under the first
+        of them, so its consumer should recompute every stale stage of the
+        image (see stale()).
+        """
+        earlier = []
+        for name in stages:
+            column = getattr(Image, STAGES[name].column)
+            for value in cls._stale_values(name):
+                last_id = 0
+                while True:
+                    with engine.connect() as conn:
+                        ids = conn.scalars(
+                            select(Image.id)
+                            .where(
+                                column.is_(None) if value is None else column == value,
+                                Image.id > last_id,
+                                Image.status == "completed",
+                                *(not_(condition) for condition in earlier)
+                            )
+                            .order_by(Image.id)
+                            .limit(chunk_size)
+                        ).all()
+                    if not ids:
+                        break
+                    yield list(ids)
+                    last_id = ids[-1]
+            if cls._stale_values(name):
+                earlier.append(cls.stale_filter(name))
@@ -0,0 +1,217 @@
+import random
+from collections import Counter
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import upsert_insert
+from app.models.image import Image
+from app.models.stats import ClusterSize, ImageStat
+
+# Columns of an image that its counters depend on
+STATE_COLUMNS = ("status", "is_compliant", "is_duplicate", "quality_score", "cluster_id")
+
+# The quality histogram has buckets of 1/QUALITY_BUCKETS; changing this
+# needs `python -m app.cli rebuild-stats`
+QUALITY_BUCKETS = 10
+
+# Counter-relevant values of one image; None for an image that does not exist
+State = Optional[Mapping[str, Any]]
+
+# (before, after) of an image in a transaction
+Transition = Tuple[State, State]
+
+
+def _quality_bucket(score: Optional[float]) -> str:
+    if score is None:
+        return "none"
+    return str(min(max(int(score * QUALITY_BUCKETS), 0), QUALITY_BUCKETS - 1))
+
+
+def _flag(value: Optional[bool]) -> str:
+    return "none" if value is None else str(bool(value)).lower()
+
+
+class StatsService:
+    """
+    Catalog statistics from counters kept up to date incrementally.
+
+    Every change to an image's status or analysis results is turned into
+    counter deltas (the difference between what the image contributed
+    before and after) that are written in the same transaction as the
+    change, so the counters are exactly as consistent as the images table.
+    Reading them costs a few hundred rows whatever the size of the catalog.
+
+    Counters: status:<status> for every image; for completed images also
+    compliance:<true|false|none>, duplicate:<true|false> and
+    quality:<bucket|none>, plus per-cluster sizes.
+    """
+
+    @staticmethod
+    def state(image: Any) -> Dict[str, Any]:
+        """Counter-relevant values of an Image (or any row with those attributes)."""
+        return {name: getattr(image, name) for name in STATE_COLUMNS}
+
+    @staticmethod
+    def contributions(state: State) -> Tuple[Counter, Optional[str]]:
+        """
+        Returns:
+            (counters, cluster_id): counters the image adds 1 to, and the
+            cluster it counts towards, if any
+        """
+        counters: Counter = Counter()
+        if state is None:
+            return counters, None
+        counters[f"status:{state['status']}"] += 1
+        if state["status"] != "completed":
+            return counters, None
+        counters[f"compliance:{_flag(state['is_compliant'])}"] += 1
+        counters[f"duplicate:{_flag(bool(state['is_duplicate']))}"] += 1
+        counters[f"quality:{_quality_bucket(state['quality_score'])}"] += 1
+        return counters, state["cluster_id"]
+
+    @classmethod
+    def record(cls, db: Session, transitions: Iterable[Transition]) -> None:
+        """
+        Add the counter deltas of transitions to the session's transaction
+        (the caller commits).
+        """
+        deltas: Counter = Counter()
+        cluster_deltas: Counter = Counter()
+        for before, after in transitions:
+            old, old_cluster = cls.contributions(before)
+            new, new_cluster = cls.contributions(after)
+            deltas.update(new)
+            deltas.subtract(old)
+            if old_cluster:
+                cluster_deltas[old_cluster] -= 1
+            if new_cluster:
+                cluster_deltas[new_cluster] += 1
+
+        # Rows are upserted in sorted order, so concurrent transactions lock
+        # them in the same order and cannot deadlock
+        shard = random.randrange(settings.STATS_COUNTER_SHARDS)
+        counters = [
+            {"name": name, "shard": shard, "value": value}
+            for name, value in sorted(deltas.items()) if value
+        ]
+        if counters:
+            stmt = upsert_insert(db.get_bind(), ImageStat).values(counters)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[ImageStat.name, ImageStat.shard],
+                set_={"value": ImageStat.value + stmt.excluded.value}
+            ))
+
+        clusters = [
+            {"cluster_id": cluster_id, "size": size}
+            for cluster_id, size in sorted(cluster_deltas.items()) if size
+        ]
+        if clusters:
+            stmt = upsert_insert(db.get_bind(), ClusterSize).values(clusters)
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[ClusterSize.cluster_id],
+                set_={"size": ClusterSize.size + stmt.excluded.size}
+            ))
+
+    @staticmethod
+    def read(db: Session, top_clusters: int = 10) -> Dict[str, Any]:
+        """Current statistics, shaped like StatsResponse."""
+        counters: Dict[str, int] = {
+            name: int(value)
+            for name, value in db.execute(
+                select(ImageStat.name, func.sum(ImageStat.value)).group_by(ImageStat.name)
+            )
+        }
+
+        def group(prefix: str) -> Dict[str, int]:
+            return {
+                name[len(prefix):]: value
+                for name, value in counters.items()
+                if name.startswith(prefix) and value
+            }
+
+        by_status = group("status:")
+        compliance = group("compliance:")
+        duplicates = group("duplicate:")
+        quality = group("quality:")
+        completed = by_status.get("completed", 0)
+        checked = compliance.get("true", 0) + compliance.get("false", 0)
+
+        clusters = db.execute(
+            select(ClusterSize.cluster_id, ClusterSize.size)
+            .where(ClusterSize.size > 1)
+            .order_by(ClusterSize.size.desc())
+            .limit(top_clusters)
+        ).all() if top_clusters else []
+
+        return {
+            "total": sum(by_status.values()),
+            "by_status": by_status,
+            "compliance_rate": compliance.get("true", 0) / checked if checked else None,
+            "duplicate_rate": duplicates.get("true", 0) / completed if completed else None,
+            "quality_histogram": [
+                {
+                    "min_score": bucket / QUALITY_BUCKETS,
+                    "max_score": (bucket + 1) / QUALITY_BUCKETS,
+                    "count": quality.get(str(bucket), 0),
+                }
+                for bucket in range(QUALITY_BUCKETS)
+            ],
+            "unscored": quality.get("none", 0),
+            "top_clusters": [
+                {"cluster_id": cluster_id, "size": size} for cluster_id, size in clusters
+            ],
+        }
+
+    @classmethod
+    def rebuild(cls, engine: Engine) -> Dict[str, int]:
+        """
+        Recompute every counter from the images table (one full scan), e.g.
+        for tables that predate the counters, or after changing
+        QUALITY_BUCKETS.
+
+        Runs in one transaction; images changed by workers while it runs
+        may be miscounted, so run it while processing is stopped or rerun
+        it afterwards.
+
+        Returns:
+            {"counters": rows written, "clusters": rows written}
+        """
+        bucket = func.floor(Image.quality_score * QUALITY_BUCKETS)
+        groups = (
+            select(Image.status, Image.is_compliant, Image.is_duplicate, bucket, func.count())
+            .group_by(Image.status, Image.is_compliant, Image.is_duplicate, bucket)
+        )
+        with engine.begin() as conn:
+            totals: Counter = Counter()
+            for status, is_compliant, is_duplicate, floor, count in conn.execute(groups):
+                counters, _ = cls.contributions({
+                    "status": status,
+                    "is_compliant": is_compliant,
+                    "is_duplicate": is_duplicate,
+                    # Middle of the bucket the database put the score in
+                    "quality_score": None if floor is None else (floor + 0.5) / QUALITY_BUCKETS,
+                    "cluster_id": None,
+                })
+                for name in counters:
+                    totals[name] += count
+
+            conn.execute(delete(ImageStat))
+            if totals:
+                conn.execute(insert(ImageStat), [
+                    {"name": name, "shard": 0, "value": value}
+                    for name, value in sorted(totals.items())
+                ])
+
+            conn.execute(delete(ClusterSize))
+            clusters = conn.execute(
+                insert(ClusterSize).from_select(
+                    ["cluster_id", "size"],
+                    select(Image.cluster_id, func.count())
+                    .where(Image.status == "completed", Image.cluster_id.isnot(None))
+                    .group_by(Image.cluster_id)
+                )
+            ).rowcount
+
+        return {"counters": len(totals), "clusters": clusters}
@@ -1,88 +1,249 @@
 import os
+from abc import ABC, abstractmethod
 import shutil
+import tempfile
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, ContextManager, Dict, Optional
 from app.core.config import settings
+from app.services.disk_cache import get_storage_cache
 
 
-class StorageService:
+class StorageBackend(ABC):
     """
-    Handle image storage (local, Cloudinary, or S3).
-    Currently implements local storage with placeholders for cloud services.
+    Interface for one storage mode.
+    
+    Files are written under a key (e.g. a content-addressed filename) and
+    save() returns the storage path/URL recorded on the Image; open() takes
+    that path back and returns a readable, seekable file. A backend missing
+    one of the abstract methods cannot be instantiated.
     """
     
-    @staticmethod
-    def save_local(file_path: str, filename: str) -> str:
-        """Save file to local storage."""
-        upload_dir = Path(settings.UPLOAD_DIR)
-        upload_dir.mkdir(parents=True, exist_ok=True)
+    def configured(self) -> bool:
+        """Whether the settings this backend needs are present."""
+        return True
+    
+    @abstractmethod
+    def handles(self, storage_path: str) -> bool:
+        """Whether storage_path was produced by this backend."""
+    
+    @abstractmethod
+    def path(self, key: str) -> str:
+        """Storage path/URL of key."""
+    
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Whether a file is stored under key."""
+    
+    @abstractmethod
+    def save(self, file_path: str, key: str) -> str:
+        """Store a local file under key. Returns storage path/URL."""
+    
+    @abstractmethod
+    def open(self, storage_path: str) -> ContextManager[BinaryIO]:
+        """Open a stored file for reading (context manager)."""
+    
+    def save_bytes(self, data: bytes, key: str, content_type: str) -> str:
+        """Store small in-memory content (e.g. a thumbnail) under key."""
+        fd, tmp_path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            return self.save(tmp_path, key)
+        finally:
+            os.remove(tmp_path)
+    
+    def download(self, storage_path: str, destination: BinaryIO) -> None:
+        """Write a stored file's content to destination."""
+        with self.open(storage_path) as source:
+            shutil.copyfileobj(source, destination)
+
+
+class LocalStorage(StorageBackend):
+    """Files under UPLOAD_DIR; the storage path is the filesystem path."""
+    
+    def handles(self, storage_path: str) -> bool:
+        return "://" not in storage_path
+    
+    def path(self, key: str) -> str:
+        return str(Path(settings.UPLOAD_DIR) / key)
+    
+    def exists(self, key: str) -> bool:
+        return Path(self.path(key)).exists()
+    
+    def save(self, file_path: str, key: str) -> str:
+        destination = Path(settings.UPLOAD_DIR) / key
+        destination.parent.mkdir(parents=True, exist_ok=True)
         
-        destination = upload_dir / filename
         shutil.copy2(file_path, destination)
         
         return str(destination)
     
-    @staticmethod
-    def save_to_cloudinary(file_path: str, filename: str) -> Optional[str]:
-        """
-        Upload to Cloudinary (PLACEHOLDER).
-        
-        TODO: Implement actual Cloudinary upload.
-        """
-        if not all([
+    def save_bytes(self, data: bytes, key: str, content_type: str) -> str:
+        # Written next to the destination and renamed, so readers never
+        # see a partial file
+        destination = Path(self.path(key))
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=destination.parent, prefix=".")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, destination)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return str(destination)
+    
+    def move(self, file_path: str, key: str) -> str:
+        """Rename a file on the same filesystem into place (no copy)."""
+        destination = Path(settings.UPLOAD_DIR) / key
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(file_path, destination)
+        return str(destination)
+    
+    def open(self, storage_path: str) -> ContextManager[BinaryIO]:
+        return open(storage_path, "rb")
+
+
+class CloudinaryStorage(StorageBackend):
+    """
+    Cloudinary (PLACEHOLDER).
+    
+    TODO: Implement actual Cloudinary upload.
+    """
+    
+    def configured(self) -> bool:
+        return all([
             settings.CLOUDINARY_CLOUD_NAME,
             settings.CLOUDINARY_API_KEY,
             settings.CLOUDINARY_API_SECRET
-        ]):
-            return None
-        
+        ])
+    
+    def handles(self, storage_path: str) -> bool:
+        return storage_path.startswith("placeholder://cloudinary/")
+    
+    def path(self, key: str) -> str:
+        return f"placeholder://cloudinary/{key}"
+    
+    def exists(self, key: str) -> bool:
+        return False
+    
+    def save(self, file_path: str, key: str) -> str:
         # TODO: Implement actual Cloudinary upload
         # import cloudinary
         # import cloudinary.uploader
-        # 
+        #
         # cloudinary.config(
         #     cloud_name=settings.CLOUDINARY_CLOUD_NAME,
         #     api_key=settings.CLOUDINARY_API_KEY,
         #     api_secret=settings.CLOUDINARY_API_SECRET
         # )
-        # 
-        # result = cloudinary.uploader.upload(file_path, public_id=filename)
+        #
+        # result = cloudinary.uploader.upload(file_path, public_id=key)
         # return result['secure_url']
         
         # PLACEHOLDER: Return mock URL until Cloudinary is implemented
         # Using placeholder:// scheme to prevent accidental use as valid URL
-        return f"placeholder://cloudinary/{filename}"
+        return self.path(key)
+    
+    def open(self, storage_path: str) -> ContextManager[BinaryIO]:
+        raise FileNotFoundError(f"Cloudinary storage is not implemented: {storage_path}")
+
+
+_backends: Dict[str, StorageBackend] = {}
+
+
+def get_backend(mode: str) -> StorageBackend:
+    """Return the process-wide backend for a storage mode, created on first use."""
+    if mode not in _backends:
+        if mode == "s3":
+            # boto3 is only imported when S3 storage is used
+            from app.services.s3_storage import S3Storage
+            _backends[mode] = S3Storage()
+        elif mode == "cloudinary":
+            _backends[mode] = CloudinaryStorage()
+        elif mode == "local":
+            _backends[mode] = LocalStorage()
+        else:
+            raise ValueError(f"Unknown storage mode {mode}")
+    return _backends[mode]
+
+
+class StorageService:
+    """
+    Handle image storage (local, Cloudinary, or S3).
+    
+    STORAGE_MODE picks the backend new files are written to; it falls back
+    to local storage when that backend is not configured. Reads go to
+    whichever backend produced the storage path, so records stored before a
+    mode change stay readable.
+    """
+    
+    @staticmethod
+    def backend() -> StorageBackend:
+        """The backend new files are written to."""
+        backend = get_backend(settings.STORAGE_MODE)
+        if backend.configured():
+            return backend
+        return get_backend("local")
+    
+    @staticmethod
+    def save_local(file_path: str, filename: str) -> str:
+        """Save file to local storage."""
+        return get_backend("local").save(file_path, filename)
+    
+    @staticmethod
+    def save_to_cloudinary(file_path: str, filename: str) -> Optional[str]:
+        """Upload to Cloudinary (placeholder). None if not configured."""
+        backend = get_backend("cloudinary")
+        if not backend.configured():
+            return None
+        return backend.save(file_path, filename)
     
     @staticmethod
     def save_to_s3(file_path: str, filename: str) -> Optional[str]:
+        """Upload to S3 or an S3-compatible store. None if not configured."""
+        backend = get_backend("s3")
+        if not backend.configured():
+            return None
+        return backend.save(file_path, filename)
+    
+    @staticmethod
+    def staging_path(filename: str) -> str:
         """
-        Upload to S3 (PLACEHOLDER).
-        
-        TODO: Implement actual S3 upload using boto3.
+        Path to write an incoming file to before it is committed. It lives in
+        UPLOAD_DIR, so committing to local storage is a rename, not a copy.
         """
-        if not all([
-            settings.AWS_ACCESS_KEY_ID,
-            settings.AWS_SECRET_ACCESS_KEY,
-            settings.AWS_S3_BUCKET
-        ]):
-            return None
-        
-        # TODO: Implement actual S3 upload
-        # import boto3
-        # 
-        # s3_client = boto3.client(
-        #     's3',
-        #     aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        #     aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        #     region_name=settings.AWS_REGION
-        # )
-        # 
-        # s3_client.upload_file(file_path, settings.AWS_S3_BUCKET, filename)
-        # return f"s3://{settings.AWS_S3_BUCKET}/{filename}"
+        upload_dir = Path(settings.UPLOAD_DIR)
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        return str(upload_dir / f".{filename}.part")
+    
+    @staticmethod
+    def content_key(filename: str) -> str:
+        """
+        Storage key for a content-addressed filename ("<sha256>.<ext>"),
+        sharded into 256 directories by its first two hex digits.
+        """
+        return f"{filename[:2]}/{filename}"
+    
+    @classmethod
+    def commit_staged(cls, staged_path: str, key: str) -> str:
+        """
+        Move a file written to staging_path() into configured storage under
+        key. The staged file is consumed. Returns storage path/URL.
         
-        # PLACEHOLDER: Return mock URL until S3 is implemented
-        # Using placeholder:// scheme to prevent accidental use as valid URL
-        return f"placeholder://s3/{filename}"
+        Keys are content addresses, so a key that already exists holds the
+        same bytes and the staged copy is simply dropped.
+        """
+        backend = cls.backend()
+        try:
+            if backend.exists(key):
+                return backend.path(key)
+            if isinstance(backend, LocalStorage):
+                return backend.move(staged_path, key)
+            return backend.save(staged_path, key)
+        finally:
+            if os.path.exists(staged_path):
+                os.remove(staged_path)
     
     @classmethod
     def save_image(cls, file_path: str, filename: str) -> str:
@@ -90,14 +251,36 @@ class StorageService:
         Save image based on configured storage mode.
         Returns storage path/URL.
         """
-        if settings.STORAGE_MODE == "cloudinary":
-            storage_path = cls.save_to_cloudinary(file_path, filename)
-            if storage_path:
-                return storage_path
-        elif settings.STORAGE_MODE == "s3":
-            storage_path = cls.save_to_s3(file_path, filename)
-            if storage_path:
-                return storage_path
+        return cls.backend().save(file_path, filename)
+    
+    @staticmethod
+    def backend_for(storage_path: str) -> StorageBackend:
+        """The backend holding a stored file."""
+        for mode in ("local", "s3", "cloudinary"):
+            backend = get_backend(mode)
+            if backend.handles(storage_path):
+                return backend
+        raise FileNotFoundError(f"No storage backend for {storage_path}")
+    
+    @classmethod
+    def open(cls, storage_path: str) -> ContextManager[BinaryIO]:
+        """
+        Open a stored image for reading, whichever backend holds it, e.g.
+        
+            with StorageService.open(record.storage_path) as f:
+                img = ImageContext.open(f)
         
-        # Fallback to local storage
-        return cls.save_local(file_path, filename)
+        Remote files go through the node's disk cache (STORAGE_CACHE_DIR),
+        so reprocessing does not download them again.
+        
+        Raises:
+            FileNotFoundError: if there is no such file
+        """
+        backend = cls.backend_for(storage_path)
+        cache = get_storage_cache()
+        if isinstance(backend, LocalStorage) or cache is None:
+            return backend.open(storage_path)
+        return cache.fetch(
+            f"storage:{storage_path}",
+            lambda destination: backend.download(storage_path, destination)
+        )
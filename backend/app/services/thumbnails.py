@@ -0,0 +1,102 @@
+from io import BytesIO
+from pathlib import Path
+from typing import Dict
+from PIL import Image
+from app.core.config import settings
+from app.services.image_context import ImageContext
+from app.services.storage import StorageService
+
+
+class ThumbnailService:
+    """
+    WebP thumbnails at THUMBNAIL_WIDTHS.
+
+    Thumbnails are stored in the same backend as their original, under keys
+    derived from the original's filename (its content hash for
+    content-addressed uploads) and THUMBNAIL_VERSION, so they never change
+    once written and can be cached by clients and the disk cache alike.
+    """
+
+    MEDIA_TYPE = "image/webp"
+
+    @staticmethod
+    def key(filename: str, width: int) -> str:
+        stem = Path(filename).stem
+        return f"thumbnails/v{settings.THUMBNAIL_VERSION}/{width}/{stem[:2]}/{stem}.webp"
+
+    @staticmethod
+    def etag(filename: str, width: int) -> str:
+        """Strong ETag, known without reading the thumbnail."""
+        return f'"{Path(filename).stem}-{width}-v{settings.THUMBNAIL_VERSION}"'
+
+    @staticmethod
+    def _scale(image: Image.Image, width: int) -> Image.Image:
+        """Scale to width, keeping the aspect ratio; never upscales."""
+        if image.width <= width:
+            return image
+        height = max(1, round(image.height * width / image.width))
+        # reducing_gap box-reduces first, then LANCZOS for the last 2x
+        return image.resize((width, height), Image.LANCZOS, reducing_gap=2.0)
+
+    @staticmethod
+    def _encode(image: Image.Image) -> bytes:
+        buffer = BytesIO()
+        image.save(buffer, "WEBP", quality=settings.THUMBNAIL_QUALITY)
+        return buffer.getvalue()
+
+    @classmethod
+    def render(cls, img: ImageContext) -> Dict[int, bytes]:
+        """
+        Render every configured width from the decoded image, largest
+        first, each scaled from the previous one rather than from the full
+        image.
+
+        Returns:
+            {width: WebP bytes}
+        """
+        thumbnails = {}
+        image = img.image
+        for width in sorted(settings.THUMBNAIL_WIDTHS, reverse=True):
+            image = cls._scale(image, width)
+            thumbnails[width] = cls._encode(image)
+        return thumbnails
+
+    @classmethod
+    def store(cls, storage_path: str, filename: str, thumbnails: Dict[int, bytes]) -> None:
+        """Store rendered thumbnails next to their original."""
+        backend = StorageService.backend_for(storage_path)
+        for width, data in thumbnails.items():
+            backend.save_bytes(data, cls.key(filename, width), cls.MEDIA_TYPE)
+
+    @classmethod
+    def generate(cls, img: ImageContext, storage_path: str, filename: str) -> Dict[int, bytes]:
+        """
+        Render and store every configured width.
+
+        Returns:
+            {width: WebP bytes}
+        """
+        thumbnails = cls.render(img)
+        cls.store(storage_path, filename, thumbnails)
+        return thumbnails
+
+    @classmethod
+    def load(cls, storage_path: str, filename: str, width: int) -> bytes:
+        """
+        Read a stored thumbnail. Images not processed since thumbnails were
+        introduced (or since THUMBNAIL_VERSION changed), and images still
+        pending, get all widths rendered from the original first.
+
+        Raises:
+            FileNotFoundError: if the original is missing too
+        """
+        path = StorageService.backend_for(storage_path).path(cls.key(filename, width))
+        try:
+            with StorageService.open(path) as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+
+        with StorageService.open(storage_path) as source:
+            img = ImageContext.open(source)
+        return cls.generate(img, storage_path, filename)[width]
@@ -0,0 +1,249 @@
+import hashlib
+import os
+import uuid
+from typing import Any, AsyncIterator, List, Optional, Tuple
+import aiofiles
+import multipart
+from multipart.multipart import parse_options_header
+from starlette.requests import Request
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.core.metrics import INGESTED_BYTES, INGESTED_IMAGES, stage
+from app.services.storage import StorageService
+from app.services.validation import ImageInfo, ImageValidator, ValidationError
+
+# File extension for each probed format; content-addressed filenames use
+# these rather than whatever name the file was uploaded under
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif"}
+
+# Events produced by iter_multipart:
+# ("part", (field_name, filename)), ("data", bytes), ("end", None)
+PartEvent = Tuple[str, Any]
+
+
+def new_filename(suffix: str = "") -> str:
+    """Unique filename keeping the original extension."""
+    return f"{uuid.uuid4()}{suffix}"
+
+
+def content_filename(content_hash: str, image_format: str) -> str:
+    """Content-addressed filename: the SHA-256 hex digest plus extension."""
+    return f"{content_hash}{FORMAT_EXTENSIONS.get(image_format, '')}"
+
+
+def record_values(
+    storage_path: str,
+    file_size: int,
+    info: ImageInfo,
+    content_hash: str,
+    original_url: Optional[str] = None
+) -> dict:
+    """Column values for the Image record of a stored upload."""
+    image_format, width, height = info
+    source = "url" if original_url else "file"
+    INGESTED_BYTES.labels(source).inc(file_size)
+    INGESTED_IMAGES.labels(source).inc()
+    return {
+        "filename": content_filename(content_hash, image_format),
+        "original_url": original_url,
+        "storage_path": storage_path,
+        "file_size": file_size,
+        "width": width,
+        "height": height,
+        "format": image_format,
+        "content_hash": content_hash,
+        "status": "pending",
+    }
+
+
+def store_content(staged_path: str, info: ImageInfo, content_hash: str) -> str:
+    """
+    Commit a staged file to its content-addressed storage key.
+
+    Returns:
+        storage path/URL
+    """
+    key = StorageService.content_key(content_filename(content_hash, info[0]))
+    with stage("store"):
+        return StorageService.commit_staged(staged_path, key)
+
+
+async def iter_multipart(request: Request) -> AsyncIterator[PartEvent]:
+    """
+    Parse a multipart/form-data request body as it arrives.
+
+    Unlike request.form(), parts are not spooled to temporary files first:
+    file data is yielded chunk by chunk as it is received.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise ValidationError("Expected a multipart/form-data body")
+
+    events: List[PartEvent] = []
+    headers = {}
+    header_field = bytearray()
+    header_value = bytearray()
+
+    def on_part_begin() -> None:
+        headers.clear()
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header_value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished() -> None:
+        _, options = parse_options_header(headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        filename = options.get(b"filename")
+        if filename is not None:
+            filename = filename.decode("utf-8", errors="replace")
+        events.append(("part", (name, filename)))
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        events.append(("data", data[start:end]))
+
+    def on_part_end() -> None:
+        events.append(("end", None))
+
+    parser = multipart.MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    async for chunk in request.stream():
+        parser.write(chunk)
+        pending = events[:]
+        events.clear()
+        for event in pending:
+            yield event
+    parser.finalize()
+    for event in events:
+        yield event
+
+
+class UploadWriter:
+    """
+    Streams one incoming image file into storage.
+
+    The first bytes are held in memory until the format and dimensions can
+    be read from the header, so disallowed, oversized and decompression-bomb
+    images are rejected after a few KB, before anything is written to disk.
+    The body then goes straight to a staging file next to local storage,
+    with MAX_FILE_SIZE_MB enforced and the SHA-256 digest computed as bytes
+    arrive. finish() completes the staging file once the last chunk is in;
+    commit() then moves it to its content-addressed key with a single
+    rename (or drops it if those bytes are already stored). Memory use is
+    bounded by UPLOAD_PROBE_BYTES plus one chunk.
+    """
+
+    def __init__(self):
+        self.staging_path = StorageService.staging_path(new_filename())
+        self.size = 0
+        self.info: Optional[ImageInfo] = None
+        self._digest = hashlib.sha256()
+        self._prefix = bytearray()
+        self._file = None
+
+    async def write(self, chunk: bytes) -> None:
+        """
+        Add the next chunk of the file.
+
+        Raises:
+            ValidationError: as soon as the file is known to be invalid
+        """
+        self.size += len(chunk)
+        ImageValidator.validate_size(self.size)
+        self._digest.update(chunk)
+
+        if self.info is None:
+            self._prefix.extend(chunk)
+            with stage("validate"):
+                info = ImageValidator.check_header(self._prefix)
+            if info is None:
+                return
+            self.info = info
+            chunk = bytes(self._prefix)
+            self._prefix = bytearray()
+
+        if self._file is None:
+            self._file = await aiofiles.open(self.staging_path, "wb")
+        await self._file.write(chunk)
+
+    async def finish(self) -> None:
+        """
+        Complete the staging file after the last chunk.
+
+        Raises:
+            ValidationError: if the file is invalid
+        """
+        if self.info is None:
+            # The whole file fit in the probe buffer
+            with stage("validate"):
+                self.info = ImageValidator.check_header(self._prefix, complete=True)
+            self._file = await aiofiles.open(self.staging_path, "wb")
+            await self._file.write(bytes(self._prefix))
+            self._prefix = bytearray()
+
+        await self._file.close()
+        self._file = None
+
+    async def commit(self, original_url: Optional[str] = None) -> dict:
+        """
+        Move the finished upload into configured storage.
+
+        Returns:
+            column values for the new Image record
+        """
+        content_hash = self._digest.hexdigest()
+        storage_path = await run_blocking(
+            store_content, self.staging_path, self.info, content_hash
+        )
+        return record_values(storage_path, self.size, self.info, content_hash, original_url)
+
+    async def abort(self) -> None:
+        """Discard whatever has been written."""
+        if self._file is not None:
+            await self._file.close()
+            self._file = None
+        if os.path.exists(self.staging_path):
+            os.remove(self.staging_path)
+
+
+def store_staged_file(
+    staged_path: str,
+    file_size: int,
+    content_hash: str,
+    original_url: Optional[str] = None
+) -> dict:
+    """
+    Validate a complete file written to StorageService.staging_path()
+    (e.g. a download) from its header and move it into content-addressed
+    storage. The staged file is removed if validation fails.
+
+    Returns:
+        column values for the new Image record
+    """
+    try:
+        with stage("validate"):
+            ImageValidator.validate_size(file_size)
+            with open(staged_path, "rb") as f:
+                prefix = f.read(settings.UPLOAD_PROBE_BYTES)
+            info = ImageValidator.check_header(prefix, complete=True)
+        storage_path = store_content(staged_path, info, content_hash)
+    except BaseException:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+        raise
+    return record_values(storage_path, file_size, info, content_hash, original_url)
@@ -1,24 +1,125 @@
+import struct
 from PIL import Image
 from typing import Tuple, Optional
 from app.core.config import settings
 
+# (format, width, height) read from an image header
+ImageInfo = Tuple[str, int, int]
+
+# (width, height), or None if the prefix ends before the dimensions
+Dimensions = Optional[Tuple[int, int]]
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+GIF_SIGNATURES = (b"GIF87a", b"GIF89a")
+
+# Bytes needed to tell the formats apart ("RIFF" + size + "WEBP")
+SIGNATURE_BYTES = 12
+
+# JPEG start-of-frame markers: 0xC0-0xCF except DHT, JPG and DAC
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field (TEM, RST0-7)
+JPEG_STANDALONE_MARKERS = frozenset([0x01, *range(0xD0, 0xD8)])
+
 
 class ValidationError(Exception):
     """Custom exception for validation errors."""
     pass
 
 
+def _corrupt(image_format: str) -> ValidationError:
+    return ValidationError(f"Corrupt {image_format} header")
+
+
+def _png_size(data: bytes) -> Dimensions:
+    # Signature, then the IHDR chunk: length, type, width, height
+    if len(data) < 24:
+        return None
+    if data[12:16] != b"IHDR":
+        raise _corrupt("PNG")
+    return struct.unpack(">II", data[16:24])
+
+
+def _gif_size(data: bytes) -> Dimensions:
+    # Logical screen descriptor right after the signature
+    if len(data) < 10:
+        return None
+    return struct.unpack("<HH", data[6:10])
+
+
+def _webp_size(data: bytes) -> Dimensions:
+    # RIFF header, then the first chunk's FourCC and size at 12-20
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        # Lossy: 3-byte frame tag, start code, 14-bit width and height
+        if data[23:26] != b"\x9d\x01\x2a":
+            raise _corrupt("WEBP")
+        width, height = struct.unpack("<HH", data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        # Lossless: signature byte, then (width - 1) and (height - 1) in 14 bits each
+        if data[20] != 0x2F:
+            raise _corrupt("WEBP")
+        bits = int.from_bytes(data[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        # Extended: flags, then 24-bit (canvas width - 1) and (canvas height - 1)
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return width, height
+    raise _corrupt("WEBP")
+
+
+def _jpeg_size(data: bytes) -> Dimensions:
+    # Walk the marker segments after SOI, skipping APPn (EXIF, ICC, XMP),
+    # tables etc. by their length, until the start-of-frame segment
+    position, end = 2, len(data)
+    while position + 4 <= end:
+        if data[position] != 0xFF:
+            # Stray bytes between segments; skipped like PIL does
+            position += 1
+            continue
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            position += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            position += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan before any frame header
+            raise _corrupt("JPEG")
+        length = int.from_bytes(data[position + 2:position + 4], "big")
+        if length < 2:
+            raise _corrupt("JPEG")
+        if marker in JPEG_SOF_MARKERS:
+            # Length, precision, height, width
+            if position + 9 > end:
+                return None
+            height, width = struct.unpack(">HH", data[position + 5:position + 9])
+            return width, height
+        position += 2 + length
+    return None
+
+
 class ImageValidator:
     """Validates images based on configured thresholds."""
     
     @staticmethod
-    def validate_format(image: Image.Image) -> None:
-        """Validate image format."""
-        if image.format not in settings.ALLOWED_FORMATS:
+    def validate_format_name(image_format: Optional[str]) -> None:
+        """Validate a format name as reported by PIL (e.g. "JPEG")."""
+        if image_format not in settings.ALLOWED_FORMATS:
             raise ValidationError(
-                f"Invalid format {image.format}. Allowed: {', '.join(settings.ALLOWED_FORMATS)}"
+                f"Invalid format {image_format}. Allowed: {', '.join(settings.ALLOWED_FORMATS)}"
             )
     
+    @classmethod
+    def validate_format(cls, image: Image.Image) -> None:
+        """Validate image format."""
+        cls.validate_format_name(image.format)
+    
     @staticmethod
     def validate_size(file_size: int) -> None:
         """Validate file size."""
@@ -64,9 +165,8 @@ class ImageValidator:
         warnings = []
         
         try:
-            cls.validate_format(image)
             cls.validate_size(file_size)
-            cls.validate_dimensions(image.width, image.height)
+            cls.validate_info((image.format, image.width, image.height))
             
             # Check aspect ratio (non-blocking)
             _, aspect_warning = cls.validate_aspect_ratio(image.width, image.height)
@@ -77,3 +177,68 @@ class ImageValidator:
             
         except ValidationError as e:
             raise e
+    
+    @staticmethod
+    def probe(prefix: bytes, complete: bool = False) -> Optional[ImageInfo]:
+        """
+        Read format and dimensions of a JPEG, PNG, WebP or GIF from the first
+        bytes of the file. Only the header is parsed (no PIL, no pixel
+        data), so this takes microseconds and can run on each chunk as an
+        upload arrives.
+        
+        Returns:
+            (format, width, height), or None if more bytes are needed to
+            tell; complete means prefix is the whole file
+        
+        Raises:
+            ValidationError: if the bytes are not a supported image, or no
+                header was found within UPLOAD_PROBE_BYTES
+        """
+        if len(prefix) < SIGNATURE_BYTES and not complete:
+            return None
+        
+        if prefix.startswith(b"\xff\xd8"):
+            image_format, size = "JPEG", _jpeg_size(prefix)
+        elif prefix.startswith(PNG_SIGNATURE):
+            image_format, size = "PNG", _png_size(prefix)
+        elif prefix[:4] == b"RIFF" and prefix[8:12] == b"WEBP":
+            image_format, size = "WEBP", _webp_size(prefix)
+        elif prefix[:6] in GIF_SIGNATURES:
+            image_format, size = "GIF", _gif_size(prefix)
+        else:
+            raise ValidationError(
+                f"Unrecognized image format. Allowed: {', '.join(settings.ALLOWED_FORMATS)}"
+            )
+        
+        if size is None:
+            if complete or len(prefix) >= settings.UPLOAD_PROBE_BYTES:
+                raise ValidationError(f"Truncated or corrupt {image_format} header")
+            return None
+        return (image_format, *size)
+    
+    @classmethod
+    def validate_info(cls, info: ImageInfo) -> None:
+        """
+        Validate format and dimensions read by probe().
+        
+        Header dimensions are what a decoder allocates for, so checking them
+        against MAX_WIDTH/MAX_HEIGHT before decoding also rejects
+        decompression bombs (tiny files declaring huge images).
+        """
+        image_format, width, height = info
+        cls.validate_format_name(image_format)
+        cls.validate_dimensions(width, height)
+    
+    @classmethod
+    def check_header(cls, prefix: bytes, complete: bool = False) -> Optional[ImageInfo]:
+        """
+        probe() followed by validate_info().
+        
+        Returns:
+            (format, width, height) once the header is read and valid, or
+            None if more bytes are needed
+        """
+        info = cls.probe(prefix, complete)
+        if info is not None:
+            cls.validate_info(info)
+        return info
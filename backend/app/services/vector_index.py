@@ -0,0 +1,295 @@
+import threading
+from typing import List, Optional, Tuple
+import faiss
+import numpy as np
+from app.core.config import settings
+from app.services.hashing import HammingIndex
+
+
+class VectorIndex:
+    """
+    In-process nearest-neighbour index over image embeddings.
+
+    Wraps a FAISS index selected by SIMILARITY_INDEX_TYPE:
+    - "flat": exact search, best for small catalogs
+    - "ivf": inverted-file index, trained once enough vectors are available
+    - "hnsw": graph index, fastest queries on large in-memory catalogs
+
+    With the "cosine" metric vectors are L2-normalized and searched by inner
+    product, so scores are similarities (higher is closer). With the "l2"
+    metric scores are squared euclidean distances (lower is closer).
+
+    Perceptual hashes of the same images are kept alongside in hash_index,
+    a cheap first-stage filter before embedding search.
+    """
+
+    def __init__(
+        self,
+        dimension: Optional[int] = None,
+        metric: Optional[str] = None,
+        index_type: Optional[str] = None,
+        index: Optional[faiss.Index] = None,
+        read_only: bool = False
+    ):
+        self.dimension = dimension or settings.EMBEDDING_DIM
+        self.metric = metric or settings.SIMILARITY_METRIC
+        self.index_type = index_type or settings.SIMILARITY_INDEX_TYPE
+
+        if self.metric not in ("cosine", "l2"):
+            raise ValueError(f"Unknown similarity metric: {self.metric}")
+
+        faiss.omp_set_num_threads(settings.SIMILARITY_SEARCH_THREADS)
+
+        self._lock = threading.RLock()
+        if index is not None:
+            self._index = index
+            self.index_type = index_type_of(index)
+        else:
+            self._index = self._create_index(self.index_type)
+
+        # A read-only main index (e.g. a memory-mapped snapshot) is never
+        # modified; new vectors always go to the buffer below
+        self.read_only = read_only
+
+        # Exact index holding vectors that are not yet searchable through the
+        # main index (e.g. while an IVF index is still waiting to be trained)
+        self._buffer = self._create_index("flat")
+        self._buffer_vectors: List[np.ndarray] = []
+
+        self.hash_index = HammingIndex()
+
+    @property
+    def ntotal(self) -> int:
+        """Number of vectors in the index."""
+        return self._index.ntotal + self._buffer.ntotal
+
+    @property
+    def higher_is_closer(self) -> bool:
+        return self.metric == "cosine"
+
+    def _create_index(self, index_type: str) -> faiss.Index:
+        """Create an empty FAISS index of the given type."""
+        faiss_metric = (
+            faiss.METRIC_INNER_PRODUCT if self.metric == "cosine" else faiss.METRIC_L2
+        )
+
+        if index_type == "flat":
+            return faiss.index_factory(self.dimension, "IDMap2,Flat", faiss_metric)
+
+        if index_type == "hnsw":
+            index = faiss.index_factory(
+                self.dimension, f"IDMap2,HNSW{settings.HNSW_M}", faiss_metric
+            )
+            hnsw = faiss.downcast_index(index.index)
+            hnsw.hnsw.efConstruction = settings.HNSW_EF_CONSTRUCTION
+            hnsw.hnsw.efSearch = settings.HNSW_EF_SEARCH
+            return index
+
+        if index_type == "ivf":
+            index = faiss.index_factory(
+                self.dimension, f"IVF{settings.IVF_NLIST},Flat", faiss_metric
+            )
+            index.nprobe = settings.IVF_NPROBE
+            return index
+
+        raise ValueError(f"Unknown similarity index type: {index_type}")
+
+    def prepare(self, vectors) -> np.ndarray:
+        """Convert vectors to a contiguous float32 (n, dimension) array."""
+        array = np.ascontiguousarray(vectors, dtype=np.float32)
+        if array.ndim == 1:
+            array = array.reshape(1, -1)
+        if array.shape[1] != self.dimension:
+            raise ValueError(
+                f"Expected {self.dimension}-dimensional vectors, got {array.shape[1]}"
+            )
+        if self.metric == "cosine":
+            # normalize_L2 works in place; never modify the caller's array
+            if isinstance(vectors, np.ndarray) and np.may_share_memory(array, vectors):
+                array = array.copy()
+            faiss.normalize_L2(array)
+        return array
+
+    def train(self, vectors) -> None:
+        """Train the main index (no-op for index types that need no training)."""
+        with self._lock:
+            if not self._index.is_trained:
+                self._index.train(self.prepare(vectors))
+
+    def add(self, ids, vectors, hashes=None) -> None:
+        """
+        Add vectors under the given integer ids.
+
+        hashes are optional unsigned 64-bit perceptual hashes; 0 marks a
+        missing hash (only completely uniform images hash to 0).
+        """
+        array = self.prepare(vectors)
+        id_array = np.ascontiguousarray(ids, dtype=np.int64).reshape(-1)
+
+        with self._lock:
+            if hashes is not None:
+                hash_array = np.asarray(hashes, dtype=np.uint64).reshape(-1)
+                present = hash_array != 0
+                self.hash_index.add(id_array[present], hash_array[present])
+
+            if self.read_only:
+                self._buffer.add_with_ids(array, id_array)
+                return
+
+            if self._index.is_trained:
+                self._index.add_with_ids(array, id_array)
+                return
+
+            self._buffer.add_with_ids(array, id_array)
+            self._buffer_vectors.append(array)
+            if self._buffer.ntotal >= settings.IVF_NLIST * settings.IVF_TRAINING_FACTOR:
+                self._flush_buffer()
+
+    def _flush_buffer(self) -> None:
+        """Train the main index on buffered vectors and move them into it."""
+        vectors = np.concatenate(self._buffer_vectors)
+        id_map = faiss.downcast_index(self._buffer)
+        ids = faiss.vector_to_array(id_map.id_map).astype(np.int64)
+
+        # Vectors are already normalized, so bypass prepare()
+        self._index.train(vectors)
+        self._index.add_with_ids(vectors, ids)
+
+        self._buffer = self._create_index("flat")
+        self._buffer_vectors = []
+
+    def export(self) -> faiss.Index:
+        """
+        Return a single FAISS index holding every vector, for snapshotting.
+        
+        An IVF index that is still untrained is trained on the buffer once
+        it holds the same IVF_NLIST * IVF_TRAINING_FACTOR vectors add() waits
+        for; until then the exact buffer is returned. Training on fewer
+        leaves clusters of a point or two that later adds pile into.
+        """
+        with self._lock:
+            if self._buffer.ntotal == 0:
+                return self._index
+            if self.read_only or self._index.ntotal > 0:
+                raise RuntimeError("Cannot export an index with a read-only base")
+            if self._buffer.ntotal >= settings.IVF_NLIST * settings.IVF_TRAINING_FACTOR:
+                self._flush_buffer()
+                return self._index
+            return self._buffer
+
+    def search(self, vectors, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest neighbours of each query vector.
+
+        Returns:
+            (scores, ids) arrays of shape (n, k); missing neighbours have id -1
+        """
+        queries = self.prepare(vectors)
+
+        with self._lock:
+            parts = []
+            for index in (self._index, self._buffer):
+                if index.ntotal > 0:
+                    parts.append(index.search(queries, k))
+
+        if not parts:
+            empty_scores = np.full((len(queries), k), np.nan, dtype=np.float32)
+            return empty_scores, np.full((len(queries), k), -1, dtype=np.int64)
+        if len(parts) == 1:
+            return parts[0]
+
+        scores = np.concatenate([p[0] for p in parts], axis=1)
+        ids = np.concatenate([p[1] for p in parts], axis=1)
+        # Unfilled slots come back as -1 ids with sentinel scores; rank them last
+        ranking = np.where(ids >= 0, scores, -np.inf if self.higher_is_closer else np.inf)
+        if self.higher_is_closer:
+            ranking = -ranking
+        order = np.argsort(ranking, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(scores, order, 1), np.take_along_axis(ids, order, 1)
+
+    def search_hash(self, value: int, max_distance: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find indexed images whose hash is within max_distance bits of value.
+
+        Returns:
+            (ids, distances) sorted by distance
+        """
+        with self._lock:
+            return self.hash_index.search(value, max_distance)
+    
+    def search_hashes(
+        self,
+        values,
+        max_distance: int
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """search_hash() for several hashes under a single lock acquisition."""
+        with self._lock:
+            return [self.hash_index.search(int(value), max_distance) for value in values]
+    
+    def pairwise_scores(self, queries, vectors) -> np.ndarray:
+        """
+        Score every query against every vector with the index metric, the
+        way search() would (used for vectors that are not indexed yet).
+        
+        Returns:
+            (len(queries), len(vectors)) array of scores
+        """
+        a = self.prepare(queries)
+        b = self.prepare(vectors)
+        if self.higher_is_closer:
+            return a @ b.T
+        return faiss.pairwise_distances(a, b)
+
+    def is_match(self, score: float, threshold: Optional[float] = None) -> bool:
+        """Check whether a search score is within the duplicate threshold."""
+        if self.higher_is_closer:
+            limit = settings.DUPLICATE_SIMILARITY_THRESHOLD if threshold is None else threshold
+            return score >= limit
+        limit = settings.DUPLICATE_L2_THRESHOLD if threshold is None else threshold
+        return score <= limit
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """Return the SIMILARITY_INDEX_TYPE name matching an existing FAISS index."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    if isinstance(index, faiss.IndexIDMap):
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexHNSW):
+            return "hnsw"
+        if isinstance(inner, faiss.IndexFlat):
+            return "flat"
+    raise ValueError(f"Unsupported FAISS index: {type(index).__name__}")
+
+
+def extract_vectors(index: faiss.Index) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (ids, vectors) stored in a flat index."""
+    index = faiss.downcast_index(index)
+    if index_type_of(index) != "flat":
+        raise ValueError("Vectors can only be extracted from flat indexes")
+    ids = faiss.vector_to_array(index.id_map).astype(np.int64)
+    vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+    return ids, vectors
+
+
+_vector_index: Optional[VectorIndex] = None
+
+
+def get_vector_index() -> VectorIndex:
+    """
+    Return the process-wide vector index, creating it on first use.
+    
+    When SIMILARITY_INDEX_DIR is set the index is loaded from the shared
+    on-disk store; otherwise it lives only in this process.
+    """
+    global _vector_index
+    if _vector_index is None:
+        if settings.SIMILARITY_INDEX_DIR:
+            # Imported here to avoid a circular import
+            from app.services.index_store import IndexStore, PersistentVectorIndex
+            store = IndexStore(settings.SIMILARITY_INDEX_DIR, settings.EMBEDDING_DIM)
+            _vector_index = PersistentVectorIndex(store)
+        else:
+            _vector_index = VectorIndex()
+    return _vector_index
@@ -1,3 +1,16 @@
-from .image_processing import process_image
+from .image_processing import (
+    process_image,
+    process_image_batch,
+    drain_pending_images,
+    enqueue_for_batch,
+)
+from .index_maintenance import compact_similarity_index, rebuild_similarity_index
 
-__all__ = ["process_image"]
+__all__ = [
+    "process_image",
+    "process_image_batch",
+    "drain_pending_images",
+    "enqueue_for_batch",
+    "compact_similarity_index",
+    "rebuild_similarity_index",
+]
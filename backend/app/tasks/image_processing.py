@@ -1,105 +1,555 @@
 from datetime import datetime
-from PIL import Image
+from io import BytesIO
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from app.worker import celery_app
+from app.core.config import settings
 from app.core.database import SessionLocal
+from app.core.metrics import stage
+from app.core.redis_client import get_redis
 from app.models.image import Image as ImageModel
 from app.services.quality import QualityAnalyzer
 from app.services.similarity import SimilarityService
+from app.services.embeddings import encode_embedding
+from app.services.hashing import to_signed64, to_unsigned64
+from app.services.image_context import ImageContext
+from app.services.storage import StorageService
+from app.services.disk_cache import get_storage_cache
+from app.services.events import publish_status
+from app.services.features import FeatureService
+from app.services.pipeline import WriteBehind, read_ahead
+from app.services.stages import STAGES, AnalysisStages
+from app.services.stats import STATE_COLUMNS, StatsService
+from app.services.thumbnails import ThumbnailService
 
 
-@celery_app.task(name="app.tasks.process_image")
+def _analyze(
+    img: ImageContext,
+    stages: Sequence[str] = tuple(STAGES)
+) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[np.ndarray], Dict[str, Any]]:
+    """
+    Run analysis stages (quality, compliance, embedding with hashes); by
+    default all of them.
+    
+    Returns:
+        (values, features, embedding, report)
+        values: column values for the image record, including the version
+            of each stage that ran
+        features: image_features values the verdicts were computed from
+        embedding: float32 embedding vector (None without the embedding stage)
+        report: quality metrics and timings for the task result
+    """
+    values: Dict[str, Any] = AnalysisStages.versions(stages)
+    features: Dict[str, Any] = {"width": img.width, "height": img.height}
+    embedding = None
+    report: Dict[str, Any] = {}
+    
+    if "quality" in stages:
+        with stage("quality"):
+            quality_metrics, quality_timings = QualityAnalyzer.measure(img)
+            code = QualityAnalyzer.quality_code(quality_metrics, img.width, img.height)
+            values["quality_score"], values["quality_reasons"] = QualityAnalyzer.describe_quality(code)
+        features.update(quality_metrics, quality_code=code)
+        report = {
+            "quality_metrics": quality_metrics,
+            "quality_timings_ms": quality_timings,
+        }
+    
+    if "compliance" in stages:
+        with stage("compliance"):
+            transparency = QualityAnalyzer.transparency(img)
+            code = QualityAnalyzer.compliance_code(img.width, img.height, transparency)
+            values["is_compliant"], values["compliance_flags"] = QualityAnalyzer.describe_compliance(code)
+        features.update(transparency=transparency, compliance_code=code)
+    
+    if "embedding" in stages:
+        with stage("embedding"):
+            embedding = SimilarityService.compute_embedding(img)
+        values["embedding"] = encode_embedding(embedding)
+        with stage("hashes"):
+            hashes = SimilarityService.compute_hashes(img)
+        for name, value in hashes.items():
+            values[name] = to_signed64(value)
+    
+    return values, features, embedding, report
+
+
+def _image_hash(values: Dict[str, Any]) -> str:
+    """pHash from analysis values as the hex string used for duplicate search."""
+    return f"{to_unsigned64(values['phash']):016x}"
+
+
+def _read_original(record: Any) -> bytes:
+    """Read a record's stored original into memory (runs on the I/O pool)."""
+    with stage("read"), StorageService.open(record.storage_path) as source:
+        return source.read()
+
+
+def _decode(source: Any) -> ImageContext:
+    """Decode an original once for every stage."""
+    with stage("decode"):
+        return ImageContext.open(source)
+
+
+def _render_thumbnails(img: ImageContext) -> Dict[int, bytes]:
+    """Render thumbnails from the decoded image."""
+    with stage("thumbnails_render"):
+        return ThumbnailService.render(img)
+
+
+def _store_thumbnails(storage_path: str, filename: str, thumbnails: Dict[int, bytes]) -> None:
+    """Store rendered thumbnails (runs on the I/O pool)."""
+    with stage("thumbnails_store"):
+        ThumbnailService.store(storage_path, filename, thumbnails)
+
+
+def _commit(db: Session, image_record: ImageModel, before: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Commit changes to image_record together with the statistics counter
+    deltas they imply, then announce its status.
+    
+    Returns:
+        the record's counter state as committed (the next change's before)
+    """
+    image_id = image_record.id
+    after = StatsService.state(image_record)
+    StatsService.record(db, [(before, after)])
+    db.commit()
+    publish_status([(image_id, after["status"])])
+    return after
+
+
+@celery_app.task(name="app.tasks.process_image", acks_late=True)
 def process_image(image_id: int) -> dict:
     """
     Background task to process an uploaded image.
     
     Steps:
-    1. Load image from storage
-    2. Compute quality analysis (placeholder)
+    1. Read the file from storage (local or S3) and decode it once
+       (shared by every stage)
+    2. Compute quality metrics and score
     3. Check compliance (placeholder)
-    4. Compute similarity/embedding (placeholder)
-    5. Check for duplicates (placeholder)
-    6. Update database with results
+    4. Compute embedding (placeholder) and perceptual hashes
+    5. Store WebP thumbnails rendered from the decoded image
+    6. Check for duplicates against the vector index
+    7. Update database with results
+    8. Add it to the vector index (unless a duplicate) once committed
     """
     db: Session = SessionLocal()
+    image_record = None
     
     try:
         # Fetch image record
         image_record = db.query(ImageModel).filter(ImageModel.id == image_id).first()
         if not image_record:
             return {"error": f"Image {image_id} not found"}
+        state = StatsService.state(image_record)
         
         # Update status to processing
         image_record.status = "processing"
-        db.commit()
+        state = _commit(db, image_record, state)
         
         # Load image file
         if not image_record.storage_path:
             image_record.status = "failed"
             image_record.error_message = "Storage path not found"
-            db.commit()
+            _commit(db, image_record, state)
             return {"error": "Storage path not found"}
         
         try:
-            img = Image.open(image_record.storage_path)
+            img = _decode(BytesIO(_read_original(image_record)))
         except Exception as e:
             image_record.status = "failed"
             image_record.error_message = f"Failed to open image: {str(e)}"
-            db.commit()
+            _commit(db, image_record, state)
             return {"error": str(e)}
         
-        # 1. Quality Analysis (placeholder)
-        quality_score, quality_reasons = QualityAnalyzer.analyze_quality(img)
-        image_record.quality_score = quality_score
-        image_record.quality_reasons = quality_reasons
-        
-        # 2. Compliance Check (placeholder)
-        is_compliant, compliance_flags = QualityAnalyzer.check_compliance(
-            img, 
-            {"filename": image_record.filename}
-        )
-        image_record.is_compliant = is_compliant
-        image_record.compliance_flags = compliance_flags
-        
-        # 3. Compute embedding (placeholder)
-        embedding = SimilarityService.compute_embedding(img)
-        image_hash = SimilarityService.compute_hash(img)
-        image_record.embedding_vector = embedding  # Store as JSON
-        
-        # 4. Check for duplicates (placeholder)
-        is_duplicate, duplicate_of_id, cluster_id = SimilarityService.find_duplicates(
-            embedding,
-            image_hash
+        # 1-3. Quality, compliance, embedding and perceptual hashes; the
+        # thumbnails are stored while the index is searched
+        values, features, embedding, report = _analyze(img)
+        thumbnails = WriteBehind()
+        stored = thumbnails.submit(
+            _store_thumbnails,
+            image_record.storage_path, image_record.filename, _render_thumbnails(img)
         )
+        for name, value in values.items():
+            setattr(image_record, name, value)
+        image_hash = _image_hash(values)
+        
+        # 4. Check for duplicates
+        with stage("duplicate_search"):
+            is_duplicate, duplicate_of_id, cluster_id = SimilarityService.find_duplicates(
+                embedding,
+                image_hash,
+                exclude_id=image_id
+            )
+        if is_duplicate:
+            # Duplicates join the cluster of the image they duplicate
+            original_cluster = db.query(ImageModel.cluster_id).filter(
+                ImageModel.id == duplicate_of_id
+            ).scalar()
+            cluster_id = original_cluster or cluster_id
         image_record.is_duplicate = is_duplicate
         image_record.duplicate_of_id = duplicate_of_id
         image_record.cluster_id = cluster_id
         
-        # 5. Add to search index (placeholder)
-        if not is_duplicate:
-            SimilarityService.add_to_index(image_id, embedding)
+        stored.result()
         
         # Update status to completed
         image_record.status = "completed"
         image_record.processed_at = datetime.utcnow()
-        db.commit()
+        with stage("db_write"):
+            FeatureService.save(db, [{"image_id": image_id, **features}])
+            state = _commit(db, image_record, state)
+        
+        # 5. Add to search index, once committed: the index has no removal,
+        # so an image that fails must never become a duplicate target
+        if not is_duplicate:
+            with stage("index_add"):
+                SimilarityService.add_to_index(image_id, embedding, image_hash)
         
         return {
             "image_id": image_id,
             "status": "completed",
-            "quality_score": quality_score,
-            "is_compliant": is_compliant,
+            "quality_score": values["quality_score"],
+            **report,
+            "is_compliant": values["is_compliant"],
             "is_duplicate": is_duplicate
         }
         
     except Exception as e:
-        # Handle any unexpected errors
-        if image_record:
+        # Handle any unexpected errors; an image committed as completed
+        # stays so (only its index entry is missing)
+        db.rollback()
+        if image_record and state["status"] != "completed":
             image_record.status = "failed"
             image_record.error_message = str(e)
+            _commit(db, image_record, state)
+        
+        return {"error": str(e)}
+    
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.process_image_batch", acks_late=True)
+def process_image_batch(image_ids: List[int]) -> dict:
+    """
+    Process many uploaded images in one task.
+    
+    Produces the same results as process_image for each image, with
+    per-batch rather than per-image database and index round trips:
+    1. Load all records in one query and mark them processing in one UPDATE
+    2. Decode and analyze each image and render its thumbnails, while the
+       I/O pool reads the next originals and stores finished thumbnails
+    3. Check the images that got this far for duplicates with one index search
+    4. Write every result with one bulk UPDATE
+    5. Add the committed non-duplicates to the index in one call
+    """
+    db: Session = SessionLocal()
+    cache = get_storage_cache()
+    cache_before = cache.stats() if cache else {}
+    
+    try:
+        records = db.query(
+            ImageModel.id, ImageModel.storage_path, ImageModel.filename,
+            *(getattr(ImageModel, name) for name in STATE_COLUMNS)
+        ).filter(ImageModel.id.in_(image_ids)).all()
+        found_ids = [record.id for record in records]
+        missing_ids = sorted(set(image_ids) - set(found_ids))
+        
+        # Counter states as of each commit, for the statistics deltas
+        states = {record.id: StatsService.state(record) for record in records}
+        processing = {
+            image_id: {**state, "status": "processing"} for image_id, state in states.items()
+        }
+        db.execute(
+            update(ImageModel)
+            .where(ImageModel.id.in_(found_ids))
+            .values(status="processing")
+        )
+        StatsService.record(db, ((states[i], processing[i]) for i in found_ids))
+        db.commit()
+        states = processing
+        publish_status((image_id, "processing") for image_id in found_ids)
+        
+        # Per-image stages; a failing image fails alone, never the batch. This
+        # process only decodes, analyzes and renders: originals are read
+        # ahead and thumbnails written behind on the I/O pool
+        updates: List[Dict[str, Any]] = []
+        analyzed: List[Tuple[int, Dict[str, Any], np.ndarray]] = []
+        feature_rows: List[Dict[str, Any]] = []
+        readable = []
+        for record in records:
+            if record.storage_path:
+                readable.append(record)
+            else:
+                updates.append({
+                    "id": record.id,
+                    "status": "failed",
+                    "error_message": "Storage path not found",
+                })
+        thumbnails = WriteBehind()
+        stored = {}
+        for record, original in read_ahead(_read_original, readable):
+            img = None
+            try:
+                img = _decode(BytesIO(original.result()))
+                values, features, embedding, _ = _analyze(img)
+                stored[record.id] = thumbnails.submit(
+                    _store_thumbnails,
+                    record.storage_path, record.filename, _render_thumbnails(img)
+                )
+            except Exception as e:
+                updates.append({
+                    "id": record.id,
+                    "status": "failed",
+                    "error_message": str(e) if img else f"Failed to open image: {str(e)}",
+                })
+                continue
+            analyzed.append((record.id, values, embedding))
+            feature_rows.append({"image_id": record.id, **features})
+        
+        # Images whose thumbnails could not be stored fail on their own,
+        # before they can become duplicate targets
+        thumbnails.wait()
+        failed_stores = set()
+        for image_id, future in stored.items():
+            error = future.exception()
+            if error is not None:
+                failed_stores.add(image_id)
+                updates.append({
+                    "id": image_id,
+                    "status": "failed",
+                    "error_message": f"Failed to store thumbnails: {str(error)}",
+                })
+        analyzed = [item for item in analyzed if item[0] not in failed_stores]
+        feature_rows = [row for row in feature_rows if row["image_id"] not in failed_stores]
+        
+        # Duplicate detection for the whole batch
+        analyzed_ids = [image_id for image_id, _, _ in analyzed]
+        embeddings = [embedding for _, _, embedding in analyzed]
+        image_hashes = [_image_hash(values) for _, values, _ in analyzed]
+        with stage("duplicate_search"):
+            duplicates = SimilarityService.find_duplicates_batch(
+                embeddings, image_hashes, analyzed_ids
+            )
+        
+        # Duplicates join the cluster of the image they duplicate, which is
+        # either an earlier image of this batch or already in the database
+        clusters = {
+            image_id: cluster_id
+            for image_id, (is_duplicate, _, cluster_id) in zip(analyzed_ids, duplicates)
+            if not is_duplicate
+        }
+        outside_ids = {
+            duplicate_of_id for is_duplicate, duplicate_of_id, _ in duplicates
+            if is_duplicate and duplicate_of_id not in clusters
+        }
+        if outside_ids:
+            clusters.update(db.query(ImageModel.id, ImageModel.cluster_id).filter(
+                ImageModel.id.in_(outside_ids),
+                ImageModel.cluster_id.isnot(None)
+            ).all())
+        
+        processed_at = datetime.utcnow()
+        originals = []
+        for (image_id, values, embedding), image_hash, duplicate in zip(
+            analyzed, image_hashes, duplicates
+        ):
+            is_duplicate, duplicate_of_id, cluster_id = duplicate
+            if is_duplicate:
+                cluster_id = clusters.get(duplicate_of_id) or cluster_id
+            else:
+                originals.append((image_id, embedding, image_hash))
+            updates.append({
+                "id": image_id,
+                **values,
+                "is_duplicate": is_duplicate,
+                "duplicate_of_id": duplicate_of_id,
+                "cluster_id": cluster_id,
+                "status": "completed",
+                "processed_at": processed_at,
+            })
+        
+        with stage("db_write"):
+            if updates:
+                db.execute(update(ImageModel), updates)
+            FeatureService.save(db, feature_rows)
+            StatsService.record(db, (
+                (states[u["id"]], {**states[u["id"]], **u}) for u in updates
+            ))
             db.commit()
+        publish_status((u["id"], u["status"]) for u in updates)
+        
+        # Indexed only once committed as completed: the index has no
+        # removal, so an image that fails must never become a duplicate target
+        if originals:
+            with stage("index_add"):
+                SimilarityService.add_to_index_batch(*zip(*originals))
+        
+        completed = [u for u in updates if u["status"] == "completed"]
+        return {
+            "processed": len(completed),
+            "failed": len(updates) - len(completed),
+            "duplicates": sum(1 for u in completed if u["is_duplicate"]),
+            "missing": missing_ids,
+            # Remote originals served from / added to the node's disk cache
+            "storage_cache": {
+                name: value - cache_before[name]
+                for name, value in (cache.stats() if cache else {}).items()
+            },
+        }
+        
+    except Exception as e:
+        # Handle any unexpected errors
+        db.rollback()
+        failed_ids = db.scalars(
+            update(ImageModel)
+            .where(ImageModel.id.in_(image_ids), ImageModel.status == "processing")
+            .values(status="failed", error_message=str(e))
+            .returning(ImageModel.id)
+        ).all()
+        StatsService.record(db, (
+            ({"status": "processing"}, {"status": "failed"}) for _ in failed_ids
+        ))
+        db.commit()
+        publish_status((image_id, "failed") for image_id in failed_ids)
         
         return {"error": str(e)}
     
     finally:
         db.close()
+
+
+@celery_app.task(name="app.tasks.reprocess_images", acks_late=True)
+def reprocess_images(image_ids: List[int], stages: List[str]) -> dict:
+    """
+    Recompute the stale results (see AnalysisStages) among stages of
+    completed images, leaving every other result as stored.
+    
+    Duplicate decisions and the similarity index are not revisited: after
+    the embedding stage changes, rebuild the index once reprocessing is
+    done. An image that cannot be read or analyzed is marked failed, like
+    in process_image_batch, and the rest of the batch carries on.
+    """
+    db: Session = SessionLocal()
+    
+    try:
+        records = db.query(
+            ImageModel.id, ImageModel.storage_path, ImageModel.filename,
+            *(getattr(ImageModel, stage.column) for stage in STAGES.values()),
+            *(getattr(ImageModel, name) for name in STATE_COLUMNS)
+        ).filter(
+            ImageModel.id.in_(image_ids),
+            ImageModel.status == "completed",
+            ImageModel.storage_path.isnot(None)
+        ).all()
+        stale = {record.id: AnalysisStages.stale(record, stages) for record in records}
+        
+        updates: List[Dict[str, Any]] = []
+        feature_rows: List[Dict[str, Any]] = []
+        failed: List[int] = []
+        for record, original in read_ahead(
+            _read_original, [record for record in records if stale[record.id]]
+        ):
+            img = None
+            try:
+                img = _decode(BytesIO(original.result()))
+                values, features, _, _ = _analyze(img, stale[record.id])
+            except Exception as e:
+                failed.append(record.id)
+                updates.append({
+                    "id": record.id,
+                    "status": "failed",
+                    "error_message": str(e) if img else f"Failed to open image: {str(e)}",
+                })
+                continue
+            updates.append({"id": record.id, **values})
+            feature_rows.append({"image_id": record.id, **features})
+        
+        if updates:
+            with stage("db_write"):
+                db.execute(update(ImageModel), updates)
+                FeatureService.save(db, feature_rows)
+                states = {record.id: StatsService.state(record) for record in records}
+                StatsService.record(db, (
+                    (states[u["id"]], {**states[u["id"]], **u}) for u in updates
+                ))
+                db.commit()
+            publish_status((image_id, "failed") for image_id in failed)
+        
+        return {
+            "reprocessed": {
+                name: sum(
+                    1 for u in updates if u.get("status") != "failed" and name in stale[u["id"]]
+                )
+                for name in stages
+            },
+            "current": sum(1 for names in stale.values() if not names),
+            "failed": failed,
+        }
+    
+    finally:
+        db.close()
+
+
+def _dispatch_pending(full_only: bool) -> int:
+    """
+    Pop queued image ids in batches of PROCESS_BATCH_SIZE and start a
+    process_image_batch task for each.
+    
+    Returns:
+        the number of batches dispatched
+    """
+    client = get_redis()
+    key = settings.PENDING_IMAGES_KEY
+    size = settings.PROCESS_BATCH_SIZE
+    batches = 0
+    
+    while not full_only or client.llen(key) >= size:
+        # LRANGE + LTRIM in one MULTI/EXEC, so concurrent drains never
+        # pop the same ids
+        with client.pipeline() as pipe:
+            pipe.lrange(key, 0, size - 1)
+            pipe.ltrim(key, size, -1)
+            popped, _ = pipe.execute()
+        if not popped:
+            break
+        
+        batch = [int(image_id) for image_id in popped]
+        try:
+            process_image_batch.delay(batch)
+        except Exception:
+            # Put the ids back for the next drain
+            client.lpush(key, *reversed(popped))
+            raise
+        batches += 1
+    
+    return batches
+
+
+def enqueue_for_batch(image_ids: Iterable[int]) -> int:
+    """
+    Queue images for batched processing (for bulk imports).
+    
+    Full batches are dispatched immediately; the rest is picked up by the
+    periodic drain_pending_images task.
+    
+    Returns:
+        the number of batches dispatched now
+    """
+    ids = list(image_ids)
+    if not ids:
+        return 0
+    if get_redis().rpush(settings.PENDING_IMAGES_KEY, *ids) < settings.PROCESS_BATCH_SIZE:
+        return 0
+    return _dispatch_pending(full_only=True)
+
+
+@celery_app.task(name="app.tasks.drain_pending_images")
+def drain_pending_images() -> dict:
+    """Dispatch every queued image id, including a final partial batch."""
+    return {"batches": _dispatch_pending(full_only=False)}
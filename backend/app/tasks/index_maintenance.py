@@ -0,0 +1,167 @@
+from typing import Callable, Iterator, Optional, Tuple
+import numpy as np
+from celery.utils.log import get_task_logger
+from sqlalchemy import func, or_, select
+from app.worker import celery_app
+from app.core.config import settings
+from app.core.database import engine
+from app.models.image import Image as ImageModel
+from app.services.embeddings import decode_embeddings
+from app.services.index_store import IndexStore
+from app.services.vector_index import VectorIndex
+
+logger = get_task_logger(__name__)
+
+
+def _indexable_images():
+    """Filter for images whose embeddings belong in the similarity index."""
+    return (
+        ImageModel.status == "completed",
+        ImageModel.is_duplicate.isnot(True),
+        or_(ImageModel.embedding.isnot(None), ImageModel.embedding_vector.isnot(None)),
+    )
+
+
+def iter_embedding_batches(
+    batch_size: int
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Stream (ids, vectors, hashes) batches of indexable embeddings.
+    
+    Rows are read through a server-side cursor, so memory stays bounded by
+    batch_size regardless of table size. vectors is a contiguous float32
+    (n, EMBEDDING_DIM) array; packed embeddings are decoded per batch
+    without creating Python floats. hashes holds unsigned pHash values, 0
+    where an image has none yet.
+    """
+    query = (
+        select(
+            ImageModel.id,
+            ImageModel.embedding,
+            ImageModel.embedding_vector,
+            ImageModel.phash
+        )
+        .where(*_indexable_images())
+        .order_by(ImageModel.id)
+    )
+    
+    with engine.connect() as conn:
+        result = conn.execution_options(
+            stream_results=True,
+            yield_per=batch_size
+        ).execute(query)
+        
+        for rows in result.partitions():
+            packed = [row for row in rows if row[1]]
+            ids = np.fromiter((row[0] for row in packed), dtype=np.int64)
+            vectors = decode_embeddings([row[1] for row in packed])
+            
+            # Rows not yet converted by migrate_embeddings
+            legacy = [
+                row for row in rows
+                if not row[1] and row[2] and len(row[2]) == settings.EMBEDDING_DIM
+            ]
+            if legacy:
+                ids = np.concatenate([ids, [row[0] for row in legacy]]).astype(np.int64)
+                vectors = np.concatenate(
+                    [vectors, np.asarray([row[2] for row in legacy], dtype=np.float32)]
+                )
+            
+            # Signed BIGINT -> unsigned 64-bit, through the same bytes
+            hashes = np.fromiter(
+                (row[3] or 0 for row in packed + legacy), dtype=np.int64
+            ).view(np.uint64)
+            
+            if len(ids):
+                yield ids, vectors, hashes
+
+
+def rebuild_index(
+    batch_size: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None
+) -> dict:
+    """
+    Rebuild the shared similarity index from the images table in one pass.
+    
+    IVF indexes are trained on the first vectors streamed in (see
+    VectorIndex.add), then every remaining batch is added directly. The new
+    snapshot replaces the live one; vectors appended by workers while the
+    rebuild was running are carried over.
+    """
+    batch_size = batch_size or settings.SIMILARITY_INDEX_REBUILD_BATCH_SIZE
+    store = IndexStore(settings.SIMILARITY_INDEX_DIR, settings.EMBEDDING_DIM)
+    
+    # Block compaction so the generation we build on stays live
+    with store.compaction_lock():
+        base_generation = store.current_generation()
+        log_offset = store.log_size(base_generation)
+        
+        with engine.connect() as conn:
+            total = conn.execute(
+                select(func.count()).select_from(ImageModel).where(*_indexable_images())
+            ).scalar()
+        
+        index = VectorIndex()
+        indexed = 0
+        for ids, vectors, hashes in iter_embedding_batches(batch_size):
+            index.add(ids, vectors, hashes)
+            indexed += len(ids)
+            if progress:
+                progress(indexed, total)
+        
+        generation = store.publish(
+            index.export(),
+            index.hash_index.merged(),
+            base_generation,
+            log_offset
+        )
+    
+    return {"status": "rebuilt", "generation": generation, "indexed": indexed}
+
+
+@celery_app.task(name="app.tasks.compact_similarity_index")
+def compact_similarity_index(min_records: Optional[int] = None) -> dict:
+    """
+    Fold the similarity index append log into a new memory-mappable snapshot.
+    
+    Scheduled periodically by celery beat; skipped when another compaction
+    is running or too few vectors have been appended since the last one.
+    """
+    if not settings.SIMILARITY_INDEX_DIR:
+        return {"status": "skipped", "reason": "SIMILARITY_INDEX_DIR not set"}
+    
+    if min_records is None:
+        min_records = settings.SIMILARITY_INDEX_COMPACT_MIN_RECORDS
+    
+    store = IndexStore(settings.SIMILARITY_INDEX_DIR, settings.EMBEDDING_DIM)
+    generation = store.compact(min_records=min_records)
+    if generation is None:
+        return {"status": "skipped", "generation": store.current_generation()}
+    
+    return {"status": "compacted", "generation": generation}
+
+
+@celery_app.task(
+    bind=True,
+    name="app.tasks.rebuild_similarity_index",
+    # Not the global 5-minute limit: a large catalog takes far longer, and
+    # the rebuild holds the compaction lock throughout
+    time_limit=settings.SIMILARITY_INDEX_REBUILD_TIME_LIMIT,
+    soft_time_limit=settings.SIMILARITY_INDEX_REBUILD_TIME_LIMIT - 60,
+)
+def rebuild_similarity_index(self, batch_size: Optional[int] = None) -> dict:
+    """
+    Rebuild the shared similarity index from stored embeddings.
+    
+    Progress is reported through the PROGRESS task state. Limited to
+    SIMILARITY_INDEX_REBUILD_TIME_LIMIT; `python -m app.cli rebuild-index`
+    has no limit.
+    """
+    if not settings.SIMILARITY_INDEX_DIR:
+        return {"status": "skipped", "reason": "SIMILARITY_INDEX_DIR not set"}
+    
+    def report(indexed: int, total: int) -> None:
+        self.update_state(state="PROGRESS", meta={"indexed": indexed, "total": total})
+        logger.info("Similarity index rebuild: %d/%d vectors", indexed, total)
+    
+    return rebuild_index(batch_size=batch_size, progress=report)
@@ -1,13 +1,41 @@
+import os
 from celery import Celery
+from celery.signals import (
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+)
+from kombu import Queue
+from app.core import metrics, tracing
 from app.core.config import settings
 
 celery_app = Celery(
     "image_analysis",
     broker=settings.celery_broker_url,
     backend=settings.celery_result_backend,
-    include=["app.tasks.image_processing"]
+    include=["app.tasks.image_processing", "app.tasks.index_maintenance"]
 )
 
+# Queues with the priority of their messages (0 is served first). A worker
+# started with several queues (-Q) always takes the highest-priority waiting
+# message, so a bulk import delays a dashboard upload by at most the tasks
+# already running; workers on the interactive queue alone keep capacity
+# for it whatever the size of the bulk backlog.
+QUEUE_PRIORITIES = {
+    settings.CELERY_INTERACTIVE_QUEUE: 0,
+    settings.CELERY_MAINTENANCE_QUEUE: 3,
+    settings.CELERY_BULK_QUEUE: 6,
+    settings.CELERY_REPROCESS_QUEUE: 9,
+}
+
+
+def route_for(queue: str) -> dict:
+    """apply_async() options sending a task to queue."""
+    return {"queue": queue, "priority": QUEUE_PRIORITIES[queue]}
+
+
 celery_app.conf.update(
     task_serializer="json",
     accept_content=["json"],
@@ -17,4 +45,61 @@ celery_app.conf.update(
     task_track_started=True,
     task_time_limit=300,  # 5 minutes
     task_soft_time_limit=240,  # 4 minutes
+    task_queues=[Queue(name, routing_key=name) for name in QUEUE_PRIORITIES],
+    task_default_queue=settings.CELERY_MAINTENANCE_QUEUE,
+    task_routes={
+        "app.tasks.process_image": route_for(settings.CELERY_INTERACTIVE_QUEUE),
+        "app.tasks.process_image_batch": route_for(settings.CELERY_BULK_QUEUE),
+        "app.tasks.reprocess_images": route_for(settings.CELERY_REPROCESS_QUEUE),
+        "app.tasks.*": route_for(settings.CELERY_MAINTENANCE_QUEUE),
+    },
+    # Redis keeps one list per queue and priority step; "priority" polls
+    # the queues of a worker in -Q order rather than round robin
+    broker_transport_options={
+        "priority_steps": sorted(set(QUEUE_PRIORITIES.values())),
+        "queue_order_strategy": "priority",
+    },
+    # The image processing tasks are acknowledged when they finish
+    # (acks_late on each), so with a multiplier of 1 a worker process never
+    # holds a bulk batch while an interactive task waits, and a worker crash
+    # redelivers them. Maintenance tasks are acknowledged on receipt: beat
+    # schedules them again anyway, and a rebuild should not rerun
+    worker_prefetch_multiplier=settings.CELERY_PREFETCH_MULTIPLIER,
+    beat_schedule={
+        "compact-similarity-index": {
+            "task": "app.tasks.compact_similarity_index",
+            "schedule": settings.SIMILARITY_INDEX_COMPACT_INTERVAL,
+        },
+        "drain-pending-images": {
+            "task": "app.tasks.drain_pending_images",
+            "schedule": settings.PENDING_DRAIN_INTERVAL,
+        },
+    },
 )
+
+
+@worker_init.connect
+def start_metrics_server(**kwargs) -> None:
+    """Serve the metrics of this worker and its pool processes."""
+    metrics.start_worker_server()
+
+
+@worker_process_init.connect
+def start_tracing(**kwargs) -> None:
+    """Export trace spans from each pool process."""
+    tracing.setup("image-analysis-worker")
+
+
+@worker_process_shutdown.connect
+def drop_process_metrics(pid=None, **kwargs) -> None:
+    metrics.mark_process_dead(pid or os.getpid())
+
+
+@task_prerun.connect
+def count_task_started(task_id=None, task=None, **kwargs) -> None:
+    metrics.task_started(task_id, task.name)
+
+
+@task_postrun.connect
+def count_task_finished(task_id=None, task=None, state=None, **kwargs) -> None:
+    metrics.task_finished(task_id, task.name, state)
@@ -0,0 +1,192 @@
+"""
+Load test for the upload endpoints: latency of GET /health and of
+POST /upload/file while uploads run concurrently.
+
+A blocking call on the event loop shows up as /health latency, since the
+probe waits behind it. Against a running API (docker compose up):
+
+    python scripts/load_upload.py --url http://localhost:8000/api/v1
+
+With --local the API is started in a subprocess on a temporary SQLite
+database and local storage. Enqueueing is replaced by a sleep of
+--broker-ms and status events are dropped, so neither Redis nor a worker
+is needed:
+
+    python scripts/load_upload.py --local [--concurrency 8] [--rounds 3]
+
+Every upload is a distinct image, so none is answered by content-hash
+dedup.
+"""
+import argparse
+import asyncio
+import io
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+import httpx
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_payloads(count: int, side: int) -> List[bytes]:
+    """count distinct PNGs of side x side noise (about 1 MB at 600)."""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (side, side, 3), dtype=np.uint8)
+    payloads = []
+    for i in range(count):
+        pixels[0, 0] = (i % 256, i // 256 % 256, i // 65536 % 256)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, "PNG", compress_level=1)
+        payloads.append(buffer.getvalue())
+    return payloads
+
+
+def percentiles(samples: List[float]) -> str:
+    ms = np.asarray(samples) * 1000
+    return (
+        f"p50 {np.percentile(ms, 50):.1f} ms, p99 {np.percentile(ms, 99):.1f} ms, "
+        f"max {ms.max():.1f} ms (n={len(ms)})"
+    )
+
+
+async def run(url: str, concurrency: int, rounds: int, payloads: List[bytes]) -> None:
+    limits = httpx.Limits(max_connections=concurrency + 4)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        for _ in range(100):
+            try:
+                await client.get("/health")
+                break
+            except httpx.HTTPError:
+                await asyncio.sleep(0.1)
+        else:
+            sys.exit(f"API not reachable at {url}")
+
+        health: List[float] = []
+        uploads: List[float] = []
+        done = asyncio.Event()
+
+        async def probe() -> None:
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/health")
+                health.append(time.perf_counter() - start)
+                await asyncio.sleep(0.005)
+
+        async def upload(payload: bytes) -> None:
+            start = time.perf_counter()
+            response = await client.post(
+                "/upload/file", files={"file": ("load.png", payload, "image/png")}
+            )
+            uploads.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                raise RuntimeError(f"Upload failed: {response.status_code} {response.text}")
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        for r in range(rounds):
+            batch = payloads[r * concurrency:(r + 1) * concurrency]
+            await asyncio.gather(*(upload(payload) for payload in batch))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+    size_mb = sum(map(len, payloads)) / len(payloads) / 1e6
+    print(f"{len(uploads)} uploads of {size_mb:.1f} MB, {concurrency} at a time, in {elapsed:.2f} s")
+    print(f"POST /upload/file: {percentiles(uploads)}")
+    print(f"GET /health:       {percentiles(health)}")
+
+
+def serve_local(port: int, broker_ms: float) -> None:
+    """Run the API on a temporary SQLite database (the --local server)."""
+    import uvicorn
+    from fastapi import FastAPI
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.config import settings
+
+    directory = tempfile.mkdtemp(prefix="load_upload_")
+    settings.STORAGE_MODE = "local"
+    settings.UPLOAD_DIR = os.path.join(directory, "uploads")
+
+    from app import models  # noqa: F401
+    from app.api import routes
+    from app.core.database import Base, get_db
+
+    engine = create_engine(
+        f"sqlite:///{directory}/db.sqlite", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(engine)
+    make_session = sessionmaker(bind=engine)
+
+    def get_local_db():
+        session = make_session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    # Stand-ins for the broker round trip
+    def enqueue(*args, **kwargs):
+        time.sleep(broker_ms / 1000)
+
+    routes.process_image.delay = enqueue
+    routes.enqueue_for_batch = enqueue
+    routes.publish_status = lambda changes: None
+
+    app = FastAPI()
+    app.include_router(routes.router, prefix=settings.API_V1_STR)
+    app.dependency_overrides[get_db] = get_local_db
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8000/api/v1", help="API base URL")
+    parser.add_argument("--local", action="store_true", help="start a local API on SQLite")
+    parser.add_argument("--concurrency", type=int, default=8, help="uploads in flight")
+    parser.add_argument("--rounds", type=int, default=3, help="waves of uploads")
+    parser.add_argument("--side", type=int, default=600, help="image width and height")
+    parser.add_argument("--broker-ms", type=float, default=10, help="--local enqueue delay")
+    parser.add_argument("--serve-local", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_local:
+        serve_local(args.serve_local, args.broker_ms)
+        return
+
+    payloads = make_payloads(args.concurrency * args.rounds, args.side)
+    server = None
+    url = args.url
+    if args.local:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}/api/v1"
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve-local", str(port),
+             "--broker-ms", str(args.broker_ms)],
+            cwd=BACKEND_DIR,
+            env={**os.environ, "PYTHONPATH": BACKEND_DIR},
+        )
+    try:
+        asyncio.run(run(url, args.concurrency, args.rounds, payloads))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models  # noqa: F401  (registers the tables on Base)
+from app.core.config import settings
+from app.core.database import Base, get_db
+
+
+@pytest.fixture
+def engine():
+    """An in-memory SQLite database with the application's tables."""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(engine):
+    """The API router on the test database."""
+    from app.api.routes import router
+    
+    app = FastAPI()
+    app.include_router(router, prefix=settings.API_V1_STR)
+    make_session = sessionmaker(bind=engine, autoflush=False)
+    
+    def get_test_db():
+        session = make_session()
+        try:
+            yield session
+        finally:
+            session.close()
+    
+    app.dependency_overrides[get_db] = get_test_db
+    with TestClient(app) as client:
+        yield client
@@ -0,0 +1,50 @@
+import io
+import os
+
+import pytest
+from PIL import Image as PILImage
+
+from app.api import routes
+from app.core.config import settings
+
+BULK_URL = f"{settings.API_V1_STR}/upload/bulk"
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_MODE", "local")
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(routes, "publish_status", lambda changes: None)
+    monkeypatch.setattr(routes, "enqueue_for_batch", lambda ids: 0)
+    return tmp_path
+
+
+def _png(seed):
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (320, 240), (seed, 80, 160)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _files(count):
+    return [("files", (f"{i}.png", _png(i), "image/png")) for i in range(count)]
+
+
+def _stored(directory):
+    return [name for _, _, names in os.walk(directory) for name in names]
+
+
+def test_accepted_files_are_stored(client, upload_dir):
+    response = client.post(BULK_URL, files=_files(2))
+    
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 2
+    assert len(_stored(upload_dir)) == 2
+
+
+def test_too_many_files_leaves_nothing_in_storage(client, upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_UPLOAD_MAX_ITEMS", 2)
+    
+    response = client.post(BULK_URL, files=_files(3))
+    
+    assert response.status_code == 413
+    assert _stored(upload_dir) == []
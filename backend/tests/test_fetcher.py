@@ -0,0 +1,38 @@
+import asyncio
+from collections import Counter
+
+import httpx
+
+from app.core.config import settings
+from app.services.fetcher import URLFetcher
+
+
+def test_host_limits_cap_concurrency_and_are_released(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "FETCH_MAX_PER_HOST", 2)
+    active = Counter()
+    peak = Counter()
+    
+    async def handler(request):
+        host = request.url.host
+        active[host] += 1
+        peak[host] = max(peak[host], active[host])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return httpx.Response(200, content=b"image bytes")
+    
+    fetcher = URLFetcher()
+    monkeypatch.setattr(
+        fetcher, "_create_client", lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    urls = [f"http://host{i % 10}.example/{i}.jpg" for i in range(60)]
+    
+    async def fetch_all():
+        await asyncio.gather(*(
+            fetcher.fetch(url, str(tmp_path / f"{i}.jpg")) for i, url in enumerate(urls)
+        ))
+        await fetcher.aclose()
+    
+    asyncio.run(fetch_all())
+    
+    assert max(peak.values()) == 2
+    assert fetcher._host_limits == {}
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from PIL import Image as PILImage, ImageEnhance
+
+from app.services.hashing import HammingIndex, PerceptualHasher, to_signed64, to_unsigned64
+
+
+def _flip_bits(rng, value, count):
+    for bit in rng.choice(64, size=count, replace=False):
+        value ^= 1 << int(bit)
+    return value
+
+
+@pytest.fixture
+def hashes():
+    """Random hashes plus near neighbours of a query, 0 to 6 bits away."""
+    rng = np.random.default_rng(7)
+    query = int(rng.integers(0, 2 ** 63)) << 1 | 1
+    values = [int(v) for v in rng.integers(0, 2 ** 63, size=2000, dtype=np.int64)]
+    values += [_flip_bits(rng, query, distance) for distance in range(7) for _ in range(3)]
+    return query, np.arange(1, len(values) + 1), np.array(values, dtype=np.uint64)
+
+
+def _brute_force(query, ids, values, max_distance):
+    found = {
+        int(image_id): bin(int(value) ^ query).count("1")
+        for image_id, value in zip(ids, values)
+    }
+    return {image_id: d for image_id, d in found.items() if d <= max_distance}
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 2, 3, 4, 6])
+def test_search_matches_brute_force(hashes, max_distance):
+    query, ids, values = hashes
+    index = HammingIndex(ids, values)
+    
+    found_ids, distances = index.search(query, max_distance)
+    
+    assert dict(zip(found_ids.tolist(), distances.tolist())) == _brute_force(
+        query, ids, values, max_distance
+    )
+    assert list(distances) == sorted(distances)
+
+
+def test_tail_and_merged_index_find_the_same(hashes):
+    query, ids, values = hashes
+    index = HammingIndex(ids[:1000], values[:1000])
+    index.add(ids[1000:], values[1000:])
+    expected = _brute_force(query, ids, values, 3)
+    
+    for candidate in (index, index.merged()):
+        found_ids, distances = candidate.search(query, 3)
+        assert dict(zip(found_ids.tolist(), distances.tolist())) == expected
+    assert len(index) == len(index.merged()) == len(ids)
+
+
+def test_save_and_load_round_trip(hashes, tmp_path):
+    query, ids, values = hashes
+    HammingIndex(ids, values).save(tmp_path, "hashes.1")
+    
+    loaded = HammingIndex.load(tmp_path, "hashes.1")
+    
+    assert sorted(loaded.search(query, 2)[0]) == sorted(_brute_force(query, ids, values, 2))
+    assert HammingIndex.load(tmp_path, "hashes.2") is None
+
+
+def test_signed_storage_round_trip():
+    for value in (0, 1, 2 ** 63 - 1, 2 ** 63, 2 ** 64 - 1):
+        signed = to_signed64(value)
+        assert -2 ** 63 <= signed < 2 ** 63
+        assert to_unsigned64(signed) == value
+
+
+def test_near_duplicates_hash_close():
+    rng = np.random.default_rng(3)
+    blocks = rng.integers(0, 256, (6, 6, 3), dtype=np.uint8)
+    image = PILImage.fromarray(blocks).resize((256, 256), PILImage.BILINEAR)
+    edited = ImageEnhance.Brightness(image.resize((200, 200))).enhance(1.1)
+    other = PILImage.fromarray(rng.integers(0, 256, (256, 256, 3), dtype=np.uint8))
+    
+    for name in ("ahash", "dhash", "phash", "whash"):
+        method = getattr(PerceptualHasher, name)
+        original = method(image)
+        assert bin(original ^ method(edited)).count("1") <= 6, name
+        assert bin(original ^ method(other)).count("1") > 10, name
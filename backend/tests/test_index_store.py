@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.hashing import HammingIndex
+from app.services.index_store import IndexStore, PersistentVectorIndex
+from app.services.vector_index import VectorIndex
+
+DIM = 8
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_DIM", DIM)
+    monkeypatch.setattr(settings, "SIMILARITY_METRIC", "l2")
+    monkeypatch.setattr(settings, "SIMILARITY_INDEX_TYPE", "flat")
+    return IndexStore(str(tmp_path), DIM)
+
+
+def _vectors(ids):
+    return np.stack([np.full(DIM, float(i), dtype=np.float32) for i in ids])
+
+
+def _append(store, ids):
+    ids = np.asarray(ids, dtype=np.int64)
+    store.append(ids, _vectors(ids), ids.astype(np.uint64) << np.uint64(8))
+
+
+def _found(index, image_id):
+    _, ids = index.search(_vectors([image_id]), k=1)
+    return int(ids[0, 0])
+
+
+def test_readers_see_appends_from_other_processes(store):
+    reader = PersistentVectorIndex(store)
+    _append(store, [1, 2, 3])
+    
+    reader.refresh()
+    
+    assert reader.ntotal == 3
+    assert _found(reader, 2) == 2
+    assert list(reader.search_hash(2 << 8, 0)[0]) == [2]
+
+
+def test_compaction_publishes_the_log_as_a_snapshot(store):
+    _append(store, range(1, 11))
+    reader = PersistentVectorIndex(store)
+    
+    assert store.compact(min_records=1) == 1
+    
+    assert store.current_generation() == 1
+    assert store.load_snapshot(1).ntotal == 10
+    assert store.log_size(1) == 0
+    assert len(store.load_hashes(1)) == 10
+    # Readers switch over on their next refresh, and keep appending
+    _append(store, [11])
+    reader.refresh()
+    assert reader.generation == 1 and reader.ntotal == 11
+    assert _found(reader, 11) == 11 and _found(reader, 4) == 4
+
+
+def test_compaction_waits_for_min_records(store):
+    _append(store, [1, 2])
+    
+    assert store.compact(min_records=3) is None
+    assert store.current_generation() == 0
+
+
+def test_publish_carries_over_records_appended_meanwhile(store):
+    _append(store, [1, 2, 3])
+    offset = store.log_size(0)
+    index = VectorIndex()
+    records = store.read_log(0, 0, offset)
+    index.add(records["id"], records["vector"], records["hash"])
+    _append(store, [4, 5])
+    
+    generation = store.publish(index.export(), index.hash_index.merged(), 0, offset)
+    
+    assert list(store.read_log(generation)["id"]) == [4, 5]
+    reader = PersistentVectorIndex(store)
+    assert reader.ntotal == 5 and _found(reader, 5) == 5
+
+
+def test_publish_on_a_stale_generation_is_refused(store):
+    _append(store, [1])
+    store.compact()
+    index = VectorIndex()
+    index.add([9], _vectors([9]))
+    
+    with pytest.raises(RuntimeError):
+        store.publish(index.export(), HammingIndex(), 0, 0)
+    
+    assert store.current_generation() == 1
+    assert not store.snapshot_path(2).exists()
+
+
+def test_old_generations_are_removed(store):
+    for image_id in (1, 2, 3):
+        _append(store, [image_id])
+        store.compact()
+    
+    assert store.current_generation() == 3
+    # The previous generation stays for readers still opening it
+    assert store.snapshot_path(2).exists()
+    assert not store.snapshot_path(1).exists()
+    assert HammingIndex.load(store.directory, "hashes.1") is None
+
+
+def test_torn_record_is_dropped_on_append(store):
+    _append(store, [1])
+    with open(store.log_path(0), "ab") as log:
+        log.write(b"\x01\x02\x03")
+    
+    _append(store, [2])
+    
+    assert list(store.read_log(0)["id"]) == [1, 2]
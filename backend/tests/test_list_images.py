@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import insert, text, update
+
+from app.core.config import settings
+from app.core.migrations import ensure_schema
+from app.models.image import Image
+
+IMAGES_URL = f"{settings.API_V1_STR}/images"
+
+
+def _walk(client, limit, **params):
+    """Ids of every page of GET /images, following X-Next-Cursor."""
+    ids = []
+    cursor = None
+    for _ in range(100):
+        query = dict(params, limit=limit)
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get(IMAGES_URL, params=query)
+        assert response.status_code == 200
+        ids.extend(image["id"] for image in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+    raise AssertionError("pagination did not terminate")
+
+
+def _insert(db, count, **values):
+    db.execute(insert(Image), [dict(values, filename=f"{i}.jpg") for i in range(count)])
+    db.commit()
+
+
+def test_pages_cover_every_image_once(client, db):
+    _insert(db, 23)
+    
+    ids = _walk(client, limit=5)
+    
+    assert len(ids) == len(set(ids)) == 23
+    assert ids == sorted(ids, reverse=True)
+
+
+def test_equal_created_at_is_broken_by_id(client, db):
+    same = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    _insert(db, 7, created_at=same)
+    _insert(db, 4, created_at=same + timedelta(microseconds=1))
+    
+    ids = _walk(client, limit=3)
+    
+    assert ids == list(range(11, 0, -1))
+
+
+def test_whole_second_timestamps_are_normalized(client, db, engine):
+    # Rows written by the old server default: CURRENT_TIMESTAMP, no fraction
+    with engine.begin() as conn:
+        for i in range(12):
+            conn.execute(text(
+                "INSERT INTO images (filename, status, is_duplicate, created_at) "
+                "VALUES (:name, 'pending', 0, CURRENT_TIMESTAMP)"
+            ), {"name": f"{i}.jpg"})
+    
+    changes = ensure_schema(engine)
+    
+    assert any("images.created_at" in change for change in changes)
+    ids = _walk(client, limit=5)
+    assert ids == list(range(12, 0, -1))
+
+
+def test_updated_since_compares_instants(client, db):
+    base = datetime(2026, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    _insert(db, 1, created_at=base - timedelta(hours=1))
+    _insert(db, 1, created_at=base)
+    _insert(db, 1, created_at=base + timedelta(seconds=1, microseconds=500))
+    _insert(db, 1, created_at=base - timedelta(hours=2))
+    db.execute(update(Image).where(Image.id == 4).values(updated_at=base + timedelta(minutes=5)))
+    db.commit()
+    
+    # The same instant as base, given in another zone
+    since = (base.astimezone(timezone(timedelta(hours=2)))).isoformat()
+    ids = _walk(client, limit=10, updated_since=since)
+    
+    assert sorted(ids) == [2, 3, 4]
@@ -0,0 +1,77 @@
+import pytest
+from PIL import Image as PILImage
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from app.models.image import Image
+from app.tasks import image_processing
+
+
+@pytest.fixture
+def task_db(engine, db, monkeypatch):
+    monkeypatch.setattr(image_processing, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(image_processing, "publish_status", lambda changes: None)
+    return db
+
+
+def _completed(db, paths):
+    db.execute(insert(Image), [
+        {
+            "filename": f"{i}.png",
+            "storage_path": str(path),
+            "status": "completed",
+            "is_duplicate": False,
+            "quality_version": 0,
+        }
+        for i, path in enumerate(paths)
+    ])
+    db.commit()
+
+
+def _png(path, shade):
+    PILImage.new("RGB", (320, 240), (shade, 90, 30)).save(path)
+    return path
+
+
+def _statuses(db):
+    db.expire_all()
+    return {image.id: (image.status, image.quality_version) for image in db.query(Image)}
+
+
+def test_unreadable_image_fails_alone(task_db, tmp_path):
+    corrupt = tmp_path / "corrupt.png"
+    corrupt.write_bytes(b"\x89PNG\r\n\x1a\nnot really")
+    _completed(task_db, [
+        _png(tmp_path / "a.png", 10), corrupt, tmp_path / "missing.png", _png(tmp_path / "b.png", 200),
+    ])
+    
+    result = image_processing.reprocess_images([1, 2, 3, 4], ["quality"])
+    
+    assert result["failed"] == [2, 3]
+    assert result["reprocessed"] == {"quality": 2}
+    statuses = _statuses(task_db)
+    assert statuses[2][0] == statuses[3][0] == "failed"
+    assert statuses[1] == statuses[4] == ("completed", image_processing.STAGES["quality"].version)
+
+
+def test_analysis_error_fails_alone(task_db, tmp_path, monkeypatch):
+    _completed(task_db, [_png(tmp_path / f"{i}.png", 40 * i) for i in range(3)])
+    analyze = image_processing._analyze
+    calls = []
+    
+    def flaky_analyze(img, *args):
+        calls.append(img)
+        if len(calls) == 2:
+            raise ValueError("analysis blew up")
+        return analyze(img, *args)
+    
+    monkeypatch.setattr(image_processing, "_analyze", flaky_analyze)
+    
+    result = image_processing.reprocess_images([1, 2, 3], ["quality"])
+    
+    assert result["failed"] == [2]
+    assert result["reprocessed"] == {"quality": 2}
+    failed = task_db.get(Image, 2)
+    task_db.refresh(failed)
+    assert (failed.status, failed.error_message) == ("failed", "analysis blew up")
+    assert _statuses(task_db)[3][0] == "completed"
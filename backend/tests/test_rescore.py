@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+from PIL import Image as PILImage, ImageFilter
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.models.features import ImageFeatures
+from app.models.image import Image
+from app.services.features import FeatureService
+from app.services.image_context import ImageContext
+from app.services.stats import StatsService
+from app.tasks.image_processing import _analyze
+
+VERDICTS = ("quality_score", "quality_reasons", "is_compliant", "compliance_flags")
+
+
+def _images():
+    rng = np.random.default_rng(11)
+    images = []
+    for i, (width, height) in enumerate([
+        (300, 300), (640, 480), (820, 820), (900, 1000), (1000, 700), (850, 850),
+    ]):
+        pixels = rng.integers(0, 256, (height // 20 + 1, width // 20 + 1, 3), dtype=np.uint8)
+        image = PILImage.fromarray(pixels).resize((width, height), PILImage.NEAREST)
+        if i % 2:
+            image = image.filter(ImageFilter.GaussianBlur(4))
+        if i % 3 == 2:
+            image = image.point(lambda v: v // 4)
+        images.append(image)
+    return images
+
+
+def _analyze_all(images):
+    return [_analyze(ImageContext(image), ("quality", "compliance"))[:2] for image in images]
+
+
+@pytest.fixture
+def catalog(db):
+    images = _images()
+    analyzed = _analyze_all(images)
+    for image_id, (values, features) in enumerate(analyzed, start=1):
+        db.execute(insert(Image).values(
+            id=image_id, filename=f"{image_id}.png", status="completed", is_duplicate=False,
+            **{name: values[name] for name in VERDICTS},
+        ))
+        StatsService.record(db, [(None, {
+            "status": "completed", "is_duplicate": False, "cluster_id": None,
+            "quality_score": values["quality_score"], "is_compliant": values["is_compliant"],
+        })])
+    FeatureService.save(db, [
+        {"image_id": image_id, **features}
+        for image_id, (_, features) in enumerate(analyzed, start=1)
+    ])
+    # An image analyzed before features were stored is left alone
+    db.execute(insert(Image).values(
+        id=99, filename="old.png", status="completed", quality_score=0.5, is_compliant=True
+    ))
+    db.commit()
+    return images
+
+
+def _stored(db):
+    db.expire_all()
+    return {image.id: tuple(getattr(image, name) for name in VERDICTS) for image in db.query(Image)}
+
+
+def _stricter(monkeypatch):
+    monkeypatch.setattr(settings, "COMPLIANCE_MIN_WIDTH", 500)
+    monkeypatch.setattr(settings, "COMPLIANCE_MIN_HEIGHT", 500)
+    monkeypatch.setattr(settings, "MIN_BRIGHTNESS", 0.3)
+    monkeypatch.setattr(settings, "MIN_SHARPNESS", 1000.0)
+
+
+def test_unchanged_thresholds_change_nothing(catalog, engine):
+    result = FeatureService.rescore(engine)
+    
+    assert result == {"images": 6, "quality_changed": 0, "compliance_changed": 0}
+
+
+def test_rescore_matches_a_full_reanalysis(catalog, db, engine, monkeypatch):
+    before = _stored(db)
+    _stricter(monkeypatch)
+    
+    result = FeatureService.rescore(engine, chunk_size=4)
+    
+    stored = _stored(db)
+    expected = [tuple(values[name] for name in VERDICTS) for values, _ in _analyze_all(catalog)]
+    assert [stored[image_id] for image_id in range(1, 7)] == expected
+    assert stored[99] == before[99]
+    assert result["quality_changed"] > 0 and result["compliance_changed"] > 0
+    assert result["quality_changed"] == sum(
+        stored[i][:2] != before[i][:2] for i in range(1, 7)
+    )
+    # Codes were updated too, so a second pass finds nothing to do
+    assert FeatureService.rescore(engine)["quality_changed"] == 0
+    assert db.query(ImageFeatures).count() == 6
+
+
+def test_rescore_keeps_counters_consistent(catalog, db, engine, monkeypatch):
+    _stricter(monkeypatch)
+    
+    FeatureService.rescore(engine)
+    
+    stats = StatsService.read(db)
+    compliant = sum(1 for v in _stored(db).values() if v[2] is True) - 1  # minus id 99
+    assert stats["compliance_rate"] == compliant / 6
+
+
+def test_dry_run_writes_nothing(catalog, db, engine, monkeypatch):
+    before = _stored(db)
+    _stricter(monkeypatch)
+    
+    result = FeatureService.rescore(engine, dry_run=True)
+    
+    assert result["quality_changed"] + result["compliance_changed"] > 0
+    assert _stored(db) == before
@@ -0,0 +1,108 @@
+import math
+import random
+
+import pytest
+from sqlalchemy import func, insert, select, update
+
+from app.core.config import settings
+from app.models.image import Image
+from app.models.stats import ImageStat
+from app.services.stats import StatsService
+
+
+@pytest.fixture
+def stats_db(db, engine, monkeypatch):
+    monkeypatch.setattr(settings, "STATS_COUNTER_SHARDS", 4)
+    # The pysqlite dialect's floor() does not accept NULL, unlike the
+    # databases the service runs on
+    engine.raw_connection().driver_connection.create_function(
+        "floor", 1, lambda x: None if x is None else math.floor(x)
+    )
+    return db
+
+
+def _set(db, image_id, before, **values):
+    """Apply values to an image and record its transition, like the tasks do."""
+    after = {**before, **values}
+    db.execute(update(Image).where(Image.id == image_id).values(**values))
+    StatsService.record(db, [(before, after)])
+    db.commit()
+    return after
+
+
+def _new(db, count):
+    rows = [{"filename": f"{i}.jpg", "status": "pending", "is_duplicate": False} for i in range(count)]
+    ids = list(db.scalars(insert(Image).returning(Image.id, sort_by_parameter_order=True), rows))
+    StatsService.record(db, ((None, row) for row in rows))
+    db.commit()
+    states = {
+        image_id: {
+            "status": "pending", "is_compliant": None, "is_duplicate": False,
+            "quality_score": None, "cluster_id": None,
+        }
+        for image_id in ids
+    }
+    return states
+
+
+def test_lifecycle_counts(stats_db):
+    states = _new(stats_db, 3)
+    for image_id, cluster, score, compliant, duplicate in (
+        (1, "c1", 0.95, True, False),
+        (2, "c1", 0.42, False, True),
+    ):
+        states[image_id] = _set(stats_db, image_id, states[image_id], status="processing")
+        states[image_id] = _set(
+            stats_db, image_id, states[image_id], status="completed", quality_score=score,
+            is_compliant=compliant, is_duplicate=duplicate, cluster_id=cluster,
+        )
+    _set(stats_db, 3, states[3], status="failed")
+    
+    stats = StatsService.read(stats_db)
+    
+    assert stats["total"] == 3
+    assert stats["by_status"] == {"completed": 2, "failed": 1}
+    assert stats["compliance_rate"] == 0.5
+    assert stats["duplicate_rate"] == 0.5
+    histogram = {b["min_score"]: b["count"] for b in stats["quality_histogram"] if b["count"]}
+    assert histogram == {0.4: 1, 0.9: 1}
+    assert stats["top_clusters"] == [{"cluster_id": "c1", "size": 2}]
+
+
+def test_deltas_are_spread_over_shards(stats_db):
+    _new(stats_db, 1)
+    for _ in range(40):
+        _new(stats_db, 1)
+    
+    shards = stats_db.scalars(
+        select(func.count()).select_from(ImageStat).where(ImageStat.name == "status:pending")
+    ).one()
+    
+    assert 1 < shards <= settings.STATS_COUNTER_SHARDS
+    assert StatsService.read(stats_db)["by_status"] == {"pending": 41}
+
+
+def test_counters_match_a_rebuild_after_random_transitions(stats_db, engine):
+    rng = random.Random(5)
+    states = _new(stats_db, 60)
+    for _ in range(300):
+        image_id = rng.choice(list(states))
+        status = rng.choice(["pending", "processing", "completed", "completed", "failed"])
+        values = {"status": status}
+        if status == "completed":
+            values.update(
+                quality_score=rng.choice([None, rng.random()]),
+                is_compliant=rng.choice([None, True, False]),
+                is_duplicate=rng.random() < 0.3,
+                cluster_id=rng.choice(["a", "b", "c", None]),
+            )
+        states[image_id] = _set(stats_db, image_id, states[image_id], **values)
+    incremental = StatsService.read(stats_db, top_clusters=10)
+    
+    StatsService.rebuild(engine)
+    
+    rebuilt = StatsService.read(stats_db, top_clusters=10)
+    # Clusters of equal size may come back in either order
+    for stats in (incremental, rebuilt):
+        stats["top_clusters"].sort(key=lambda c: c["cluster_id"])
+    assert rebuilt == incremental
@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import update
+
+from app.api import routes
+from app.models.image import Image
+
+
+@pytest.fixture(autouse=True)
+def no_events(monkeypatch):
+    monkeypatch.setattr(routes, "publish_status", lambda changes: None)
+
+
+def _row(content_hash):
+    return {
+        "filename": f"{content_hash}.png",
+        "storage_path": f"/uploads/{content_hash}.png",
+        "content_hash": content_hash,
+        "status": "pending",
+    }
+
+
+def test_new_bytes_are_inserted_once(db):
+    refs = routes._insert_records(db, [_row("a"), _row("b"), _row("a")])
+    
+    assert [ref[1:] for ref in refs] == [("pending", False), ("pending", False), ("pending", True)]
+    assert refs[0][0] == refs[2][0] != refs[1][0]
+    assert db.query(Image).count() == 2
+
+
+def test_completed_record_is_returned_as_existing(db):
+    [(image_id, _, _)] = routes._insert_records(db, [_row("a")])
+    db.execute(update(Image).values(status="completed"))
+    db.commit()
+    
+    assert routes._insert_records(db, [_row("a")]) == [(image_id, "completed", True)]
+
+
+def test_failed_record_is_reset_and_queued_again(db):
+    [(image_id, _, _)] = routes._insert_records(db, [_row("a")])
+    db.execute(update(Image).values(status="failed", error_message="storage timeout"))
+    db.commit()
+    
+    refs = routes._insert_records(db, [_row("a"), _row("a")])
+    
+    # Queued once: the repeat resolves to the same, now pending, record
+    assert refs == [(image_id, "pending", False), (image_id, "pending", True)]
+    image = db.get(Image, image_id)
+    db.refresh(image)
+    assert (image.status, image.error_message) == ("pending", None)
+    assert db.query(Image).count() == 1
@@ -0,0 +1,104 @@
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image as PILImage
+
+from app.core.config import settings
+from app.services.validation import ImageValidator, ValidationError
+
+
+def _encode(size, image_format, mode="RGB", **options):
+    buffer = io.BytesIO()
+    PILImage.new(mode, size, (200, 100, 50, 255)[:len(mode)]).save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def _exif():
+    exif = PILImage.Exif()
+    exif[0x010F] = "Camera maker " * 200  # a few KB of APP1 before the frame header
+    return exif
+
+
+SAMPLES = {
+    "jpeg": (_encode((640, 480), "JPEG"), "JPEG"),
+    "jpeg_progressive_exif": (
+        _encode((641, 479), "JPEG", progressive=True, exif=_exif()), "JPEG"
+    ),
+    "png": (_encode((333, 222), "PNG"), "PNG"),
+    "webp_lossy": (_encode((500, 301), "WEBP", quality=80), "WEBP"),
+    "webp_lossless": (_encode((257, 129), "WEBP", lossless=True), "WEBP"),
+    "webp_extended": (_encode((300, 200), "WEBP", mode="RGBA", exif=_exif()), "WEBP"),
+    "gif": (_encode((320, 240), "GIF", mode="P"), "GIF"),
+}
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_probe_matches_pil(name):
+    data, image_format = SAMPLES[name]
+    
+    assert ImageValidator.probe(data, complete=True) == (
+        image_format, *PILImage.open(io.BytesIO(data)).size
+    )
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_probe_waits_for_the_header(name):
+    data, _ = SAMPLES[name]
+    expected = ImageValidator.probe(data, complete=True)
+    
+    # Every shorter prefix either needs more bytes or already has the answer
+    results = [ImageValidator.probe(data[:end]) for end in range(0, min(len(data), 8192), 7)]
+    
+    assert set(results) <= {None, expected}
+    assert results[-1] == expected
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_truncated_header_is_rejected_when_complete(name):
+    data, _ = SAMPLES[name]
+    first = next(
+        end for end in range(len(data)) if ImageValidator.probe(data[:end]) is not None
+    )
+    
+    # A whole file that ends inside its header is an error, not "need more"
+    for end in range(0, first - 1, 3):
+        try:
+            result = ImageValidator.probe(data[:end], complete=True)
+        except ValidationError:
+            continue
+        assert result == ImageValidator.probe(data, complete=True)
+
+
+def test_unrecognized_bytes_are_rejected():
+    with pytest.raises(ValidationError, match="Unrecognized"):
+        ImageValidator.probe(b"%PDF-1.7\n" + b"\0" * 100)
+
+
+def test_corrupt_header_is_rejected():
+    data = bytearray(SAMPLES["png"][0])
+    data[12:16] = b"IDAT"
+    
+    with pytest.raises(ValidationError, match="Corrupt PNG"):
+        ImageValidator.probe(bytes(data))
+
+
+def test_decompression_bomb_is_rejected_from_its_header():
+    # A few dozen bytes declaring a 100000 x 100000 image
+    ihdr = struct.pack(">IIBBBBB", 100000, 100000, 8, 2, 0, 0, 0)
+    data = (
+        b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(ihdr)) + b"IHDR" + ihdr
+        + struct.pack(">I", zlib.crc32(b"IHDR" + ihdr))
+    )
+    
+    with pytest.raises(ValidationError):
+        ImageValidator.check_header(data)
+
+
+def test_header_beyond_probe_limit_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_PROBE_BYTES", 1024)
+    data, _ = SAMPLES["jpeg_progressive_exif"]
+    
+    with pytest.raises(ValidationError, match="Truncated or corrupt JPEG"):
+        ImageValidator.probe(data[:1024])
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.vector_index import VectorIndex, index_type_of
+
+DIM = 8
+
+
+@pytest.fixture
+def small_ivf(monkeypatch):
+    monkeypatch.setattr(settings, "IVF_NLIST", 4)
+    monkeypatch.setattr(settings, "IVF_TRAINING_FACTOR", 10)
+    return VectorIndex(dimension=DIM, metric="l2", index_type="ivf")
+
+
+def _vectors(n, seed=0):
+    return np.random.default_rng(seed).random((n, DIM), dtype=np.float32)
+
+
+def test_export_stays_exact_below_training_size(small_ivf):
+    # More than IVF_NLIST, fewer than IVF_NLIST * IVF_TRAINING_FACTOR
+    small_ivf.add(np.arange(1, 21), _vectors(20))
+    
+    exported = small_ivf.export()
+    
+    assert index_type_of(exported) == "flat"
+    assert exported.ntotal == 20
+
+
+def test_export_is_trained_ivf_at_training_size(small_ivf):
+    small_ivf.add(np.arange(1, 41), _vectors(40))
+    
+    exported = small_ivf.export()
+    
+    assert index_type_of(exported) == "ivf"
+    assert exported.is_trained and exported.ntotal == 40
@@ -1,5 +1,6 @@
 import React from 'react';
 import { Image } from '../types';
+import { thumbnailUrl } from '../utils/api';
 
 interface ImageDetailsModalProps {
   image: Image | null;
@@ -23,6 +24,12 @@ export const ImageDetailsModal: React.FC<ImageDetailsModalProps> = ({ image, onC
         </div>
         
         <div className="p-6 space-y-4">
+          <img
+            src={thumbnailUrl(image.id, 480)}
+            alt={image.filename}
+            className="mx-auto max-h-80 rounded bg-gray-100"
+          />
+          
           {/* Basic Info */}
           <div className="border-b pb-4">
             <h3 className="text-lg font-semibold mb-3">Basic Information</h3>
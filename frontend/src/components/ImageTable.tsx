@@ -1,5 +1,6 @@
 import React from 'react';
 import { Image } from '../types';
+import { thumbnailUrl } from '../utils/api';
 
 interface ImageTableProps {
   images: Image[];
@@ -38,6 +39,9 @@ export const ImageTable: React.FC<ImageTableProps> = ({ images, onSelectImage })
               <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">
                 ID
               </th>
+              <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">
+                Preview
+              </th>
               <th className="px-6 py-3 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">
                 Filename
               </th>
@@ -64,7 +68,7 @@ export const ImageTable: React.FC<ImageTableProps> = ({ images, onSelectImage })
           <tbody className="bg-white divide-y divide-gray-200">
             {images.length === 0 ? (
               <tr>
-                <td colSpan={8} className="px-6 py-4 text-center text-gray-500">
+                <td colSpan={9} className="px-6 py-4 text-center text-gray-500">
                   No images found. Upload your first image!
                 </td>
               </tr>
@@ -74,6 +78,15 @@ export const ImageTable: React.FC<ImageTableProps> = ({ images, onSelectImage })
                   <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
                     {image.id}
                   </td>
+                  <td className="px-6 py-2 whitespace-nowrap">
+                    <img
+                      src={thumbnailUrl(image.id)}
+                      alt=""
+                      loading="lazy"
+                      decoding="async"
+                      className="h-12 w-16 object-cover rounded bg-gray-100"
+                    />
+                  </td>
                   <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900">
                     <div className="max-w-xs truncate" title={image.filename}>
                       {image.filename}
@@ -33,7 +33,9 @@ export const UploadForm: React.FC<UploadFormProps> = ({ onUploadSuccess }) => {
           return;
         }
         const response = await uploadImageFile(selectedFile);
-        setSuccess(`File uploaded successfully! ID: ${response.id}`);
+        setSuccess(response.existing
+          ? `Identical image already uploaded. ID: ${response.id}`
+          : `File uploaded successfully! ID: ${response.id}`);
         setSelectedFile(null);
         // Reset file input
         const fileInput = document.getElementById('file-input') as HTMLInputElement;
@@ -44,7 +46,9 @@ export const UploadForm: React.FC<UploadFormProps> = ({ onUploadSuccess }) => {
           return;
         }
         const response = await uploadImageUrl(url);
-        setSuccess(`Image uploaded successfully! ID: ${response.id}`);
+        setSuccess(response.existing
+          ? `Identical image already uploaded. ID: ${response.id}`
+          : `Image uploaded successfully! ID: ${response.id}`);
         setUrl('');
       }
       
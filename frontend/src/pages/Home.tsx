@@ -1,20 +1,52 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { UploadForm } from '../components/UploadForm';
 import { ImageTable } from '../components/ImageTable';
 import { ImageDetailsModal } from '../components/ImageDetailsModal';
-import { listImages } from '../utils/api';
-import { Image } from '../types';
+import { getStats, listImages, subscribeImageEvents } from '../utils/api';
+import { Image, ImageFilters, Stats, StatusChange } from '../types';
+
+// Changed rows are fetched at most this often while events keep arriving
+const SYNC_INTERVAL_MS = 2000;
+// Timestamps are taken at transaction start, so a row can commit with one
+// slightly older than rows already seen
+const SYNC_OVERLAP_MS = 10000;
 
 export const Home: React.FC = () => {
   const [images, setImages] = useState<Image[]>([]);
   const [selectedImage, setSelectedImage] = useState<Image | null>(null);
   const [loading, setLoading] = useState(false);
+  const [filters, setFilters] = useState<ImageFilters>({});
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [stats, setStats] = useState<Stats | null>(null);
+  // Newest created_at/updated_at seen; changes after it are fetched on events
+  const watermark = useRef<string | null>(null);
+  const syncTimer = useRef<number | undefined>(undefined);
+
+  const advanceWatermark = (rows: Image[]) => {
+    for (const row of rows) {
+      const changed = row.updated_at ?? row.created_at;
+      if (!watermark.current || Date.parse(changed) > Date.parse(watermark.current)) {
+        watermark.current = changed;
+      }
+    }
+  };
+
+  const fetchStats = async () => {
+    try {
+      setStats(await getStats());
+    } catch (error) {
+      console.error('Failed to fetch stats:', error);
+    }
+  };
 
   const fetchImages = async () => {
     setLoading(true);
     try {
-      const data = await listImages();
-      setImages(data);
+      const page = await listImages(filters);
+      setImages(page.images);
+      setNextCursor(page.nextCursor);
+      watermark.current = null;
+      advanceWatermark(page.images);
     } catch (error) {
       console.error('Failed to fetch images:', error);
     } finally {
@@ -22,12 +54,85 @@ export const Home: React.FC = () => {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoading(true);
+    try {
+      const page = await listImages(filters, nextCursor);
+      setImages((current) => [...current, ...page.images]);
+      setNextCursor(page.nextCursor);
+      advanceWatermark(page.images);
+    } catch (error) {
+      console.error('Failed to fetch images:', error);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // Fetch only what changed since the watermark and merge it in
+  const syncChanges = async () => {
+    if (!watermark.current) {
+      await fetchImages();
+      return;
+    }
+    const since = new Date(Date.parse(watermark.current) - SYNC_OVERLAP_MS).toISOString();
+    try {
+      // In large bursts only the newest changes are merged; every row's
+      // status is still kept current by the events themselves
+      const page = await listImages({ ...filters, updated_since: since });
+      advanceWatermark(page.images);
+      setImages((current) => {
+        const changed = new Map(page.images.map((image) => [image.id, image]));
+        const merged = current.map((image) => changed.get(image.id) ?? image);
+        // New rows, unless they belong to pages further down
+        const known = new Set(current.map((image) => image.id));
+        const oldest = current.length
+          ? Date.parse(current[current.length - 1].created_at)
+          : -Infinity;
+        const added = page.images.filter(
+          (image) => !known.has(image.id) && Date.parse(image.created_at) >= oldest
+        );
+        return [...added, ...merged].sort(
+          (a, b) => Date.parse(b.created_at) - Date.parse(a.created_at) || b.id - a.id
+        );
+      });
+    } catch (error) {
+      console.error('Failed to fetch image changes:', error);
+    }
+  };
+
+  // Coalesce bursts of events (e.g. a bulk import) into one fetch
+  const scheduleSync = () => {
+    if (syncTimer.current !== undefined) return;
+    syncTimer.current = window.setTimeout(() => {
+      syncTimer.current = undefined;
+      syncChanges();
+      fetchStats();
+    }, SYNC_INTERVAL_MS);
+  };
+
+  const applyStatusChanges = (changes: StatusChange[]) => {
+    const statuses = new Map(changes.map((change) => [change.id, change.status]));
+    setImages((current) =>
+      current
+        .map((image) =>
+          statuses.has(image.id) ? { ...image, status: statuses.get(image.id)! } : image
+        )
+        .filter((image) => !filters.status || image.status === filters.status)
+    );
+    scheduleSync();
+  };
+
   useEffect(() => {
     fetchImages();
-    // Poll for updates every 5 seconds
-    const interval = setInterval(fetchImages, 5000);
-    return () => clearInterval(interval);
-  }, []);
+    fetchStats();
+    const close = subscribeImageEvents(applyStatusChanges, scheduleSync);
+    return () => {
+      close();
+      window.clearTimeout(syncTimer.current);
+      syncTimer.current = undefined;
+    };
+  }, [filters]);
 
   return (
     <div className="min-h-screen bg-gray-100">
@@ -50,24 +155,24 @@ export const Home: React.FC = () => {
               <h2 className="text-xl font-bold mb-4">Quick Stats</h2>
               <div className="grid grid-cols-2 md:grid-cols-4 gap-4">
                 <div className="text-center">
-                  <div className="text-3xl font-bold text-blue-600">{images.length}</div>
+                  <div className="text-3xl font-bold text-blue-600">{stats?.total ?? 0}</div>
                   <div className="text-sm text-gray-600">Total Images</div>
                 </div>
                 <div className="text-center">
                   <div className="text-3xl font-bold text-green-600">
-                    {images.filter(img => img.status === 'completed').length}
+                    {stats?.by_status.completed ?? 0}
                   </div>
                   <div className="text-sm text-gray-600">Processed</div>
                 </div>
                 <div className="text-center">
                   <div className="text-3xl font-bold text-yellow-600">
-                    {images.filter(img => img.status === 'processing' || img.status === 'pending').length}
+                    {(stats?.by_status.pending ?? 0) + (stats?.by_status.processing ?? 0)}
                   </div>
                   <div className="text-sm text-gray-600">In Progress</div>
                 </div>
                 <div className="text-center">
                   <div className="text-3xl font-bold text-red-600">
-                    {images.filter(img => img.status === 'failed').length}
+                    {stats?.by_status.failed ?? 0}
                   </div>
                   <div className="text-sm text-gray-600">Failed</div>
                 </div>
@@ -78,16 +183,55 @@ export const Home: React.FC = () => {
 
         <div className="mb-4 flex justify-between items-center">
           <h2 className="text-2xl font-bold text-gray-900">Images</h2>
-          <button
-            onClick={fetchImages}
-            disabled={loading}
-            className="px-4 py-2 bg-blue-600 text-white rounded-md hover:bg-blue-700 disabled:bg-gray-400"
-          >
-            {loading ? 'Refreshing...' : 'Refresh'}
-          </button>
+          <div className="flex gap-2">
+            <select
+              value={filters.status ?? ''}
+              onChange={(e) => setFilters({ ...filters, status: e.target.value || undefined })}
+              className="px-3 py-2 border border-gray-300 rounded-md text-sm"
+            >
+              <option value="">All statuses</option>
+              <option value="pending">Pending</option>
+              <option value="processing">Processing</option>
+              <option value="completed">Completed</option>
+              <option value="failed">Failed</option>
+            </select>
+            <select
+              value={filters.is_duplicate === undefined ? '' : String(filters.is_duplicate)}
+              onChange={(e) =>
+                setFilters({
+                  ...filters,
+                  is_duplicate: e.target.value === '' ? undefined : e.target.value === 'true',
+                })
+              }
+              className="px-3 py-2 border border-gray-300 rounded-md text-sm"
+            >
+              <option value="">All images</option>
+              <option value="true">Duplicates</option>
+              <option value="false">Unique</option>
+            </select>
+            <button
+              onClick={fetchImages}
+              disabled={loading}
+              className="px-4 py-2 bg-blue-600 text-white rounded-md hover:bg-blue-700 disabled:bg-gray-400"
+            >
+              {loading ? 'Refreshing...' : 'Refresh'}
+            </button>
+          </div>
         </div>
 
         <ImageTable images={images} onSelectImage={setSelectedImage} />
+
+        {nextCursor && (
+          <div className="mt-4 text-center">
+            <button
+              onClick={loadMore}
+              disabled={loading}
+              className="px-4 py-2 bg-white border border-gray-300 rounded-md hover:bg-gray-50 disabled:text-gray-400"
+            >
+              Load more
+            </button>
+          </div>
+        )}
       </div>
 
       <ImageDetailsModal image={selectedImage} onClose={() => setSelectedImage(null)} />
@@ -21,6 +21,36 @@ export interface Image {
   error_message?: string;
 }
 
+export interface StatusChange {
+  id: number;
+  status: string;
+}
+
+export interface ImageFilters {
+  status?: string;
+  is_compliant?: boolean;
+  is_duplicate?: boolean;
+  cluster_id?: string;
+  min_quality?: number;
+  max_quality?: number;
+  updated_since?: string;
+}
+
+export interface ImagePage {
+  images: Image[];
+  nextCursor: string | null;
+}
+
+export interface Stats {
+  total: number;
+  by_status: Record<string, number>;
+  compliance_rate: number | null;
+  duplicate_rate: number | null;
+  quality_histogram: { min_score: number; max_score: number; count: number }[];
+  unscored: number;
+  top_clusters: { cluster_id: string; size: number }[];
+}
+
 export interface Config {
   max_file_size_mb: number;
   min_width: number;
@@ -37,5 +67,6 @@ export interface UploadResponse {
   id: number;
   filename: string;
   status: string;
+  existing: boolean;
   message: string;
 }
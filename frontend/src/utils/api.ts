@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Image, Config, UploadResponse } from '../types';
+import { Image, ImageFilters, ImagePage, Config, Stats, StatusChange, UploadResponse } from '../types';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 const API_V1 = `${API_BASE_URL}/api/v1`;
@@ -11,6 +11,10 @@ const api = axios.create({
   },
 });
 
+// Uploads from the dashboard are processed on the interactive queue, ahead
+// of bulk imports
+const UPLOAD_ORIGIN = { 'X-Upload-Origin': 'dashboard' };
+
 export const uploadImageFile = async (file: File): Promise<UploadResponse> => {
   const formData = new FormData();
   formData.append('file', file);
@@ -18,6 +22,7 @@ export const uploadImageFile = async (file: File): Promise<UploadResponse> => {
   const response = await api.post<UploadResponse>('/upload/file', formData, {
     headers: {
       'Content-Type': 'multipart/form-data',
+      ...UPLOAD_ORIGIN,
     },
   });
 
@@ -25,13 +30,40 @@ export const uploadImageFile = async (file: File): Promise<UploadResponse> => {
 };
 
 export const uploadImageUrl = async (url: string): Promise<UploadResponse> => {
-  const response = await api.post<UploadResponse>('/upload/url', { url });
+  const response = await api.post<UploadResponse>('/upload/url', { url }, {
+    headers: UPLOAD_ORIGIN,
+  });
   return response.data;
 };
 
-export const listImages = async (): Promise<Image[]> => {
-  const response = await api.get<Image[]>('/images');
-  return response.data;
+// Keyset-paginated: pass the previous page's nextCursor to get the next one
+export const listImages = async (
+  filters: ImageFilters = {},
+  cursor?: string,
+  limit = 100
+): Promise<ImagePage> => {
+  const response = await api.get<Image[]>('/images', {
+    params: { ...filters, cursor, limit },
+  });
+  return {
+    images: response.data,
+    nextCursor: response.headers['x-next-cursor'] ?? null,
+  };
+};
+
+// Server-sent status transitions. onResync means events may have been missed
+// (also sent on every (re)connect); catch up with updated_since. Returns a
+// function that closes the stream.
+export const subscribeImageEvents = (
+  onStatus: (changes: StatusChange[]) => void,
+  onResync: () => void
+): (() => void) => {
+  const source = new EventSource(`${API_V1}/events`);
+  source.addEventListener('status', (event) =>
+    onStatus(JSON.parse((event as MessageEvent).data))
+  );
+  source.addEventListener('resync', onResync);
+  return () => source.close();
 };
 
 export const getImage = async (id: number): Promise<Image> => {
@@ -39,6 +71,15 @@ export const getImage = async (id: number): Promise<Image> => {
   return response.data;
 };
 
+// Served with a long max-age and an ETag, so <img> tags can point at it directly
+export const thumbnailUrl = (id: number, width: 160 | 480 = 160): string =>
+  `${API_V1}/images/${id}/thumbnail?width=${width}`;
+
+export const getStats = async (): Promise<Stats> => {
+  const response = await api.get<Stats>('/stats');
+  return response.data;
+};
+
 export const getConfig = async (): Promise<Config> => {
   const response = await api.get<Config>('/config');
   return response.data;
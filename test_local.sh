@@ -32,7 +32,11 @@ print(f'✓ FastAPI app created: {app.title}')
 print(f'✓ API routes registered: {len(app.routes)} routes')
 "
 
-# Test 3: Validate requirements.txt
+# Test 3: Run the backend test suite (needs pytest)
+echo "Running backend tests..."
+python3 -m pytest -q
+
+# Test 4: Validate requirements.txt
 echo "Testing requirements.txt..."
 python3 -c "
 with open('requirements.txt', 'r') as f:
@@ -46,12 +50,12 @@ cd ..
 echo ""
 echo "=== Testing Frontend Components ==="
 
-# Test 4: Check frontend structure
+# Test 5: Check frontend structure
 echo "Testing frontend structure..."
 cd frontend
 ls -1 src/components/*.tsx src/pages/*.tsx src/utils/*.ts src/types/*.ts | wc -l | xargs echo "✓ Found components and modules:"
 
-# Test 5: Check package.json
+# Test 6: Check package.json
 echo "Testing package.json..."
 node -e "
 const pkg = require('./package.json');
@@ -59,7 +63,7 @@ console.log('✓ Frontend project:', pkg.name);
 console.log('✓ Key dependencies:', Object.keys(pkg.dependencies).join(', '));
 "
 
-# Test 6: Check TypeScript configuration
+# Test 7: Check TypeScript configuration
 echo "Testing TypeScript configuration..."
 if [ -f tsconfig.json ]; then
     echo "✓ TypeScript configuration exists"
@@ -70,7 +74,7 @@ cd ..
 echo ""
 echo "=== Testing Configuration ==="
 
-# Test 7: Check .env.example
+# Test 8: Check .env.example
 echo "Testing .env.example..."
 if [ -f .env.example ]; then
     echo "✓ .env.example exists"
@@ -79,7 +83,7 @@ if [ -f .env.example ]; then
     grep -c "CLOUDINARY\|AWS" .env.example | xargs echo "✓ Storage config variables:"
 fi
 
-# Test 8: Check docker-compose.yml
+# Test 9: Check docker-compose.yml
 echo "Testing docker-compose.yml..."
 if [ -f docker-compose.yml ]; then
     echo "✓ docker-compose.yml exists"